@@ -1,19 +1,45 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import multiprocessing
+import time
 from app.agents.base_agent import BaseAgent
+from app.core.config import Settings
+from app.core.database import RecordStore
+from app.core.log import capped
 from app.utils.exceptions import AnalyticsError
+from app.utils.reports import generate_report, normalize_report_config, report_cache_key
 from loguru import logger
 
 class DataAnalyticsAgent(BaseAgent):
+    def __init__(self, api_key: Optional[str] = None, store: Optional[RecordStore] = None):
+        super().__init__("Data Analytics Agent", api_key)
+        self.settings = Settings()
+        self.store = store
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Report results by normalized config: (expires_at, future); running reports never expire
+        self._reports: "OrderedDict[str, Tuple[float, asyncio.Future]]" = OrderedDict()
+
     async def initialize(self) -> Dict[str, Any]:
         """Initialize analytics agent"""
         try:
             # Initialize any required resources
             self.is_initialized = True
-            return await self.log_operation("initialize", {"status": "success"})
+            return self.log_operation("initialize", {"status": "success"})
         except Exception as e:
             logger.error(f"Error initializing analytics agent: {str(e)}")
             raise AnalyticsError(f"Failed to initialize analytics agent: {str(e)}")
 
+    async def cleanup(self) -> Dict[str, Any]:
+        """Stop the report worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._reports.clear()
+        return await super().cleanup()
+
     async def process(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Process an analytics request"""
         try:
@@ -29,7 +55,7 @@ class DataAnalyticsAgent(BaseAgent):
             else:
                 raise AnalyticsError(f"Unknown operation: {operation}")
         except Exception as e:
-            logger.error(f"Error processing analytics: {str(e)}")
+            logger.error("Error processing analytics: {error}", error=capped(e))
             raise AnalyticsError(f"Failed to process analytics: {str(e)}")
 
     async def _handle_log_creation(self, request: Dict[str, Any]) -> Dict[str, Any]:
@@ -38,13 +64,13 @@ class DataAnalyticsAgent(BaseAgent):
             data = request.get("data", {})
             
             # For demo purposes, return mock data
-            return {
+            return self.log_operation("log_creation", {
                 "operation": "creation",
                 "entity": data.get("entity"),
                 "entity_id": data.get("id"),
                 "timestamp": "2025-01-30T12:00:00Z",
                 "status": "logged"
-            }
+            })
         except Exception as e:
             raise AnalyticsError(f"Failed to log creation: {str(e)}")
 
@@ -54,13 +80,13 @@ class DataAnalyticsAgent(BaseAgent):
             data = request.get("data", {})
             
             # For demo purposes, return mock data
-            return {
+            return self.log_operation("log_update", {
                 "operation": "update",
                 "entity": data.get("entity"),
                 "entity_id": data.get("id"),
                 "timestamp": "2025-01-30T12:00:00Z",
                 "status": "logged"
-            }
+            })
         except Exception as e:
             raise AnalyticsError(f"Failed to log update: {str(e)}")
 
@@ -70,34 +96,62 @@ class DataAnalyticsAgent(BaseAgent):
             data = request.get("data", {})
             
             # For demo purposes, return mock data
-            return {
+            return self.log_operation("log_deletion", {
                 "operation": "deletion",
                 "entity": data.get("entity"),
                 "entity_id": data.get("id"),
                 "timestamp": "2025-01-30T12:00:00Z",
                 "status": "logged"
-            }
+            })
         except Exception as e:
             raise AnalyticsError(f"Failed to log deletion: {str(e)}")
 
     async def _handle_analytics(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle analytics operation"""
+        """Handle analytics operation.
+
+        Reports are computed in a worker process from the record store.
+        Requests with the same normalized config share one computation,
+        whether it is still running or finished less than
+        ANALYTICS_CACHE_TTL_SECONDS ago.
+        """
         try:
-            config = request.get("config", {})
-            
-            # For demo purposes, return mock data
-            return {
-                "report_type": config.get("type", "summary"),
-                "time_range": config.get("time_range", "daily"),
-                "metrics": {
-                    "total_records": 100,
-                    "active_records": 95,
-                    "deleted_records": 5,
-                    "updates_today": 10,
-                    "creations_today": 5,
-                    "deletions_today": 1
-                },
-                "generated_at": "2025-01-30T12:00:00Z"
-            }
+            config = normalize_report_config(request.get("config", {}))
+            key = report_cache_key(config)
+
+            cached = self._reports.get(key)
+            if cached is None or cached[0] <= time.monotonic():
+                cached = (float("inf"), self._submit_report(key, config))
+                self._reports[key] = cached
+                while len(self._reports) > self.settings.ANALYTICS_CACHE_MAX_ENTRIES:
+                    self._reports.popitem(last=False)
+            self._reports.move_to_end(key)
+
+            return dict(await asyncio.shield(cached[1]))
         except Exception as e:
             raise AnalyticsError(f"Failed to generate analytics: {str(e)}")
+
+    def _submit_report(self, key: str, config: Dict[str, Any]) -> asyncio.Future:
+        """Run a report in the worker pool and keep its result cached once it succeeds"""
+        if self.store is None or self.store.path == ":memory:":
+            raise AnalyticsError("Reports need a file-backed record store")
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.settings.ANALYTICS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        executor = self._executor
+        future = asyncio.get_running_loop().run_in_executor(executor, generate_report, self.store.path, config)
+
+        def settle(done: asyncio.Future) -> None:
+            if self._reports.get(key, (None, None))[1] is not done:
+                return
+            if done.cancelled() or done.exception() is not None:
+                del self._reports[key]
+                if isinstance(done.exception(), BrokenProcessPool) and self._executor is executor:
+                    # A worker died; start a fresh pool for the next report
+                    self._executor = None
+            else:
+                self._reports[key] = (time.monotonic() + self.settings.ANALYTICS_CACHE_TTL_SECONDS, done)
+
+        future.add_done_callback(settle)
+        return future
@@ -1,6 +1,8 @@
 from typing import Any, Dict, Optional
 from loguru import logger
 
+from app.core.log import capped, should_log
+
 class BaseAgent:
     def __init__(self, name: str, api_key: Optional[str] = None):
         """Initialize base agent with name and API key"""
@@ -24,8 +26,14 @@ class BaseAgent:
         raise NotImplementedError("Process method must be implemented by child classes")
 
     def log_operation(self, operation: str, result: Dict[str, Any]) -> Dict[str, Any]:
-        """Log an operation and its result"""
-        logger.info(f"{self.name} - {operation}: {result}")
+        """Log an operation and its result, subject to per-operation sampling.
+
+        The message is formatted lazily from structured fields, so nothing is
+        rendered when the call is not sampled or INFO is disabled, and the
+        result is cut to LOG_MAX_PAYLOAD_CHARS.
+        """
+        if should_log(operation):
+            logger.info("{agent} - {operation}: {result}", agent=self.name, operation=operation, result=capped(result))
         return result
 
     def check_initialized(self) -> None:
@@ -1,9 +1,34 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+from contextlib import AsyncExitStack
+import asyncio
+import random
+import sqlite3
+import weakref
 from app.agents.base_agent import BaseAgent
-from app.utils.exceptions import IngestionError
+from app.core.config import Settings
+from app.core.database import RecordStore
+from app.core.history import ChangeLog
+from app.core.log import capped
+from app.utils.exceptions import ConflictError, IngestionError, NotFoundError, ValidationError
+from app.utils.trigram_index import TrigramIndex, TrigramIndexSet
 from loguru import logger
 
 class DataIngestionAgent(BaseAgent):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        store: Optional[RecordStore] = None,
+        text_indexes: Optional[TrigramIndexSet] = None,
+        history: Optional[ChangeLog] = None
+    ):
+        super().__init__("Data Ingestion Agent", api_key)
+        self.store = store
+        self.text_indexes = text_indexes
+        self.history = history
+        self.settings = Settings()
+        # One lock per product with an order in flight; entries vanish once no order holds them
+        self._sku_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
     async def initialize(self) -> Dict[str, Any]:
         """Initialize ingestion agent"""
         try:
@@ -20,10 +45,14 @@ class DataIngestionAgent(BaseAgent):
             operation = request.get("operation")
             if operation == "create":
                 return await self._handle_create(request)
+            elif operation == "place_order":
+                return await self._handle_place_order(request)
             else:
                 raise IngestionError(f"Unknown operation: {operation}")
+        except (ConflictError, NotFoundError):
+            raise
         except Exception as e:
-            logger.error(f"Error processing ingestion: {str(e)}")
+            logger.error("Error processing ingestion: {error}", error=capped(e))
             raise IngestionError(f"Failed to process ingestion: {str(e)}")
 
     async def _handle_create(self, request: Dict[str, Any]) -> Dict[str, Any]:
@@ -31,15 +60,81 @@ class DataIngestionAgent(BaseAgent):
         try:
             entity = request.get("entity")
             data = request.get("data", {})
+            entity_id = data.get("id") or data.get(f"{entity}_id")
             
-            # For demo purposes, return mock data
-            return {
-                "id": "123",
-                "entity": entity,
-                "name": data.get("name", f"Test {entity.title()}"),
-                "created_at": "2025-01-30T12:00:00Z",
-                "status": "active",
-                **data
-            }
+            record = await asyncio.to_thread(self.store.insert, entity, data, entity_id)
+            if self.history is not None:
+                self.history.record_create(record)
+            index = self._text_index(entity)
+            if index is not None:
+                await asyncio.to_thread(index.upsert, record)
+            return record
+        except ConflictError:
+            raise
         except Exception as e:
             raise IngestionError(f"Failed to create {entity}: {str(e)}")
+
+    async def _handle_place_order(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle place_order operation.
+
+        Orders queue on a lock per product, taken in product id order, so
+        a hot SKU makes its buyers wait here as coroutines rather than as
+        worker threads blocked on the store. The store transaction then
+        takes the stock of every line or none of it.
+        """
+        customer_id = request.get("customer_id")
+        lines = request.get("products") or {}
+        if not customer_id:
+            raise ValidationError("customer_id is required")
+        if not lines:
+            raise ValidationError("An order needs at least one product")
+        for product_id, quantity in lines.items():
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+                raise ValidationError(f"Quantity of product {product_id} must be a positive integer")
+
+        try:
+            async with AsyncExitStack() as stack:
+                for product_id in sorted(lines):
+                    await stack.enter_async_context(self._sku_lock(product_id))
+                order, products = await self._place_order(customer_id, lines, request.get("order_id"))
+        except (ConflictError, NotFoundError):
+            raise
+        except Exception as e:
+            raise IngestionError(f"Failed to place order: {str(e)}")
+
+        if self.history is not None:
+            self.history.record_create(order)
+            for product in products:
+                self.history.record_update(product, {"stock": product["stock"]})
+        index = self._text_index("product")
+        if index is not None:
+            await asyncio.to_thread(index.upsert_many, products)
+        return {"order": order, "products": products}
+
+    def _sku_lock(self, product_id: str) -> asyncio.Lock:
+        lock = self._sku_locks.get(product_id)
+        if lock is None:
+            lock = self._sku_locks[product_id] = asyncio.Lock()
+        return lock
+
+    async def _place_order(self, customer_id: str, lines: Dict[str, int], order_id: Optional[str]):
+        """Run the order transaction, backing off while another process holds the database"""
+        delay = self.settings.ORDER_RETRY_BASE_SECONDS
+        for attempt in range(self.settings.ORDER_MAX_RETRIES + 1):
+            try:
+                return await asyncio.to_thread(self.store.place_order, customer_id, lines, order_id)
+            except sqlite3.OperationalError as e:
+                busy = "locked" in str(e) or "busy" in str(e)
+                if not busy or attempt == self.settings.ORDER_MAX_RETRIES:
+                    raise
+                logger.warning(
+                    "Order for {customer_id} hit a busy database, retry {attempt}",
+                    customer_id=customer_id,
+                    attempt=attempt + 1
+                )
+                await asyncio.sleep(random.uniform(0, delay))
+                delay = min(delay * 2, self.settings.ORDER_RETRY_MAX_SECONDS)
+
+    def _text_index(self, entity: str) -> Optional[TrigramIndex]:
+        """Get the trigram index maintained for an entity, if any"""
+        return self.text_indexes.get(entity) if self.text_indexes else None
@@ -1,67 +1,334 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Union
+import asyncio
+import itertools
+import orjson
+import os
 from app.agents.base_agent import BaseAgent
-from app.utils.exceptions import QueryError
+from app.core.config import Settings
+from app.core.database import RecordStore
+from app.core.log import capped
+from app.utils.exceptions import NotFoundError, QueryError
+from app.utils.export import ENCODERS, LEADING_COLUMNS, TRAILING_COLUMNS, ExportStream, column_kinds, export_fields
+from app.utils.records import ColumnarPage, Record, json_default
+from app.utils.trigram_index import TrigramIndexSet
+from app.utils.validation import BaseSchema, SCHEMAS, is_entity_name
+from app.utils.vector_index import Embedder, HashingEmbedder, VectorIndex, record_text
 from loguru import logger
 
 class DataQueryAgent(BaseAgent):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        store: Optional[RecordStore] = None,
+        embedder: Optional[Embedder] = None,
+        text_indexes: Optional[TrigramIndexSet] = None
+    ):
+        super().__init__("Data Query Agent", api_key)
+        self.settings = Settings()
+        self.store = store
+        self.text_indexes = text_indexes
+        self.embedder = embedder or HashingEmbedder(self.settings.EMBEDDING_DIM)
+        self.vector_indexes: Dict[str, VectorIndex] = {}
+
     async def initialize(self) -> Dict[str, Any]:
         """Initialize query agent"""
         try:
             # Initialize OpenAI client or other resources
+            if self.store is not None:
+                for entity in await asyncio.to_thread(self.store.entities):
+                    if is_entity_name(entity):
+                        await asyncio.to_thread(self._sync_vector_index, entity)
+                if self.text_indexes is not None:
+                    for entity in self.text_indexes.fields_by_entity:
+                        await asyncio.to_thread(self._sync_text_index, entity)
             self.is_initialized = True
-            return await self.log_operation("initialize", {"status": "success"})
+            return self.log_operation("initialize", {"status": "success"})
         except Exception as e:
             logger.error(f"Error initializing OpenAI client: {str(e)}")
             raise QueryError(f"Failed to initialize query agent: {str(e)}")
 
+    async def cleanup(self) -> Dict[str, Any]:
+        """Persist vector indexes and release resources"""
+        for entity, index in self.vector_indexes.items():
+            if self.store is not None:
+                index.mark = await asyncio.to_thread(self.store.change_mark, entity)
+            await asyncio.to_thread(index.flush)
+        return await super().cleanup()
+
     async def process(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Process a query request"""
         try:
             operation = request.get("operation")
             if operation == "read":
                 return await self._handle_read(request)
+            elif operation == "version":
+                return await self._handle_version(request)
             elif operation == "list":
                 return await self._handle_list(request)
+            elif operation == "page_tag":
+                return await self._handle_page_tag(request)
+            elif operation == "export":
+                return await self._handle_export(request)
+            elif operation == "lookup":
+                return await self._handle_lookup(request)
+            elif operation == "search":
+                return await self._handle_search(request)
+            elif operation == "semantic_search":
+                return await self._handle_semantic_search(request)
+            elif operation == "index":
+                return await self._handle_index(request)
+            elif operation == "unindex":
+                return await self._handle_unindex(request)
             else:
                 raise QueryError(f"Unknown operation: {operation}")
+        except NotFoundError:
+            raise
         except Exception as e:
-            logger.error(f"Error processing query: {str(e)}")
+            logger.error("Error processing query: {error}", error=capped(e))
             raise QueryError(f"Failed to process query: {str(e)}")
 
-    async def _handle_read(self, request: Dict[str, Any]) -> Dict[str, Any]:
+    def _get_vector_index(self, entity: str) -> VectorIndex:
+        """Get the vector index for an entity, loading or creating it on first use.
+
+        Only called for entities with stored records; searches go through
+        ``vector_indexes`` directly so a query never creates index files.
+        """
+        index = self.vector_indexes.get(entity)
+        if index is None:
+            if not is_entity_name(entity):
+                raise QueryError(f"Invalid entity name: {entity!r}")
+            index = VectorIndex(
+                os.path.join(self.settings.VECTOR_INDEX_PATH, entity),
+                dim=self.embedder.dim,
+                partitions=self.settings.VECTOR_INDEX_PARTITIONS,
+                nprobe=self.settings.VECTOR_INDEX_NPROBE
+            )
+            self.vector_indexes[entity] = index
+        return index
+
+    def _sync_vector_index(self, entity: str) -> None:
+        """Bring an entity's vector index up to date with the store.
+
+        Replays the rows written since the index's persisted mark; an index
+        with no mark (missing, or never flushed) is rebuilt from every row.
+        """
+        index = self._get_vector_index(entity)
+        mark = self.store.change_mark(entity)
+        if index.mark is not None and index.mark == mark:
+            return
+        if index.mark is None:
+            index.clear()
+        for records, deleted in self.store.iter_changes(entity, index.mark, self.settings.EXPORT_CHUNK_SIZE):
+            if records:
+                index.upsert([record.id for record in records], self.embedder.embed([self._record_text(entity, record) for record in records]))
+            if deleted:
+                index.remove(deleted)
+        logger.info("Synced {entity} vector index from {mark}", entity=entity, mark=index.mark or "scratch")
+        index.mark = mark
+
+    def _record_text(self, entity: str, record: Dict[str, Any]) -> str:
+        """Embedding text of a record; fields the store encrypts stay out of the unsealed vector files"""
+        cipher = self.store.cipher if self.store is not None else None
+        return record_text(record, cipher.fields.get(entity, ()) if cipher is not None else ())
+
+    def _sync_text_index(self, entity: str) -> None:
+        """Bring an entity's trigram index up to date with the store, as for vector indexes"""
+        index = self.text_indexes.get(entity)
+        mark = self.store.change_mark(entity)
+        if index is None or (index.mark is not None and index.mark == mark):
+            return
+        if index.mark is None:
+            index.clear()
+        for records, deleted in self.store.iter_changes(entity, index.mark, self.settings.EXPORT_CHUNK_SIZE):
+            for record in records:
+                index.upsert(record)
+            for entity_id in deleted:
+                index.remove(entity_id)
+        logger.info("Synced {entity} text index from {mark}", entity=entity, mark=index.mark or "scratch")
+        index.mark = mark
+
+    async def _handle_read(self, request: Dict[str, Any]) -> Record:
         """Handle read operation"""
         try:
             entity = request.get("entity")
             entity_id = request.get("id")
             
-            # For demo purposes, return mock data
-            return {
-                "id": entity_id,
-                "entity": entity,
-                "name": f"Test {entity.title()} {entity_id}",
-                "created_at": "2025-01-30T12:00:00Z",
-                "status": "active"
-            }
+            return await asyncio.to_thread(self.store.get, entity, entity_id)
+        except NotFoundError:
+            raise
         except Exception as e:
             raise QueryError(f"Failed to read {entity}: {str(e)}")
 
-    async def _handle_list(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Handle list operation"""
+    async def _handle_version(self, request: Dict[str, Any]) -> int:
+        """Handle version operation: the current version of a record, for conditional reads"""
+        try:
+            entity = request.get("entity")
+            return await asyncio.to_thread(self.store.version, entity, request.get("id"))
+        except NotFoundError:
+            raise
+        except Exception as e:
+            raise QueryError(f"Failed to read {entity} version: {str(e)}")
+
+    async def _handle_page_tag(self, request: Dict[str, Any]) -> str:
+        """Handle page_tag operation: a hash that changes whenever the list page does"""
+        try:
+            entity = request.get("entity")
+            return await asyncio.to_thread(
+                self.store.page_tag, entity, request.get("skip", 0), request.get("limit", 10)
+            )
+        except Exception as e:
+            raise QueryError(f"Failed to tag {entity} page: {str(e)}")
+
+    async def _handle_list(self, request: Dict[str, Any]) -> Union[List[Record], ColumnarPage, bytes]:
+        """Handle list operation.
+
+        With ``encoding: "json"`` the page is returned as pre-encoded JSON
+        bytes, serialized in the worker thread alongside the fetch. With
+        ``layout: "columnar"`` it is returned as a ColumnarPage.
+        """
         try:
             entity = request.get("entity")
             skip = request.get("skip", 0)
             limit = request.get("limit", 10)
             
-            # For demo purposes, return mock data
-            return [
-                {
-                    "id": f"{i}",
-                    "entity": entity,
-                    "name": f"Test {entity.title()} {i}",
-                    "created_at": "2025-01-30T12:00:00Z",
-                    "status": "active"
-                }
-                for i in range(skip, skip + limit)
-            ]
+            if request.get("encoding") == "json":
+                return await asyncio.to_thread(
+                    lambda: orjson.dumps(self.store.list(entity, skip, limit), default=json_default)
+                )
+            if request.get("layout") == "columnar":
+                return await asyncio.to_thread(self.store.list_columns, entity, skip, limit)
+            return await asyncio.to_thread(self.store.list, entity, skip, limit)
         except Exception as e:
             raise QueryError(f"Failed to list {entity}: {str(e)}")
+
+    async def _handle_export(self, request: Dict[str, Any]) -> ExportStream:
+        """Handle export operation.
+
+        Returns an ExportStream that walks the entity in ``chunk_size`` pages
+        and encodes each page to ``format`` (csv, ndjson or parquet) as it is
+        consumed. ``fields`` projects columns; ``filters`` keeps rows whose
+        fields equal the given values. Bad arguments fail here, before any of
+        the response has been sent.
+        """
+        try:
+            entity = request.get("entity")
+            export_format = request.get("format", "csv")
+            if export_format not in ENCODERS:
+                raise QueryError(f"Unsupported export format: {export_format}")
+            if export_format == "parquet":
+                try:
+                    import pyarrow  # noqa: F401
+                except ImportError:
+                    raise QueryError("Parquet export requires pyarrow")
+            fields = request.get("fields")
+            if fields is not None and (
+                not isinstance(fields, list) or not all(isinstance(field, str) for field in fields)
+            ):
+                raise QueryError("fields must be a list of field names")
+
+            pages = self.store.iter_pages(
+                entity,
+                request.get("chunk_size") or self.settings.EXPORT_CHUNK_SIZE,
+                request.get("filters")
+            )
+            schema = SCHEMAS.get(entity)
+            schema_fields = [name for name in schema.model_fields if name not in BaseSchema.model_fields] if schema else None
+            if schema_fields is None and not fields:
+                # No schema to take columns from: use the fields of the first page
+                first = await asyncio.to_thread(next, pages, None)
+                if first is not None:
+                    schema_fields = [field for field in first.columns if field not in LEADING_COLUMNS + TRAILING_COLUMNS]
+                    pages = itertools.chain([first], pages)
+
+            return ExportStream(
+                entity,
+                export_format,
+                export_fields(schema_fields, fields),
+                pages,
+                column_kinds(schema)
+            )
+        except Exception as e:
+            raise QueryError(f"Failed to export {entity}: {str(e)}")
+
+    async def _handle_lookup(self, request: Dict[str, Any]) -> List[Record]:
+        """Handle equality lookup on an encrypted field through its blind index"""
+        try:
+            entity = request.get("entity")
+            field = request.get("field")
+            return await asyncio.to_thread(self.store.lookup, entity, field, request.get("value"))
+        except Exception as e:
+            raise QueryError(f"Failed to look up {entity} by {field}: {str(e)}")
+
+    async def _handle_search(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Handle ranked substring search over the entity's trigram index"""
+        try:
+            entity = request.get("entity")
+            query = request.get("query", "")
+            limit = request.get("limit", 20)
+
+            index = self.text_indexes.get(entity) if self.text_indexes else None
+            if index is None:
+                raise QueryError(f"Full-text search is not enabled for {entity}")
+
+            hits = await asyncio.to_thread(index.search, query, limit)
+            return [{"entity": entity, **hit} for hit in hits]
+        except Exception as e:
+            raise QueryError(f"Failed to search {entity}: {str(e)}")
+
+    async def _handle_semantic_search(self, request: Dict[str, Any]) -> List[Any]:
+        """Handle semantic search over record embeddings.
+
+        Accepts a single ``query`` string or a batch of ``queries``; a batch
+        returns one ranked result list per query.
+        """
+        try:
+            entity = request.get("entity")
+            k = request.get("k", 10)
+            queries = request.get("queries") or [request.get("query", "")]
+            index = self.vector_indexes.get(entity)
+            if index is None:
+                # Indexes exist for every stored entity once initialized; a schema entity may just be empty
+                if entity not in SCHEMAS or entity == "default":
+                    raise QueryError(f"Unknown entity: {entity}")
+                return [[] for _ in queries] if "queries" in request else []
+
+            def search() -> List[List[Dict[str, Any]]]:
+                vectors = self.embedder.embed(queries)
+                hits = index.search(vectors, k)
+                return [
+                    [{"id": record_id, "entity": entity, "score": score} for record_id, score in query_hits]
+                    for query_hits in hits
+                ]
+
+            results = await asyncio.to_thread(search)
+            return results if "queries" in request else results[0]
+        except Exception as e:
+            raise QueryError(f"Failed to search {entity}: {str(e)}")
+
+    async def _handle_index(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Add or refresh records in the vector index"""
+        try:
+            entity = request.get("entity")
+            records = request.get("records", [])
+            index = self._get_vector_index(entity)
+
+            def upsert() -> None:
+                vectors = self.embedder.embed([self._record_text(entity, record) for record in records])
+                index.upsert([str(record["id"]) for record in records], vectors)
+
+            await asyncio.to_thread(upsert)
+            return {"entity": entity, "indexed": len(records)}
+        except Exception as e:
+            raise QueryError(f"Failed to index {entity}: {str(e)}")
+
+    async def _handle_unindex(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Remove records from the vector index"""
+        try:
+            entity = request.get("entity")
+            ids = [str(entity_id) for entity_id in request.get("ids", [])]
+            index = self.vector_indexes.get(entity)
+            if index is not None:
+                await asyncio.to_thread(index.remove, ids)
+            return {"entity": entity, "removed": len(ids)}
+        except Exception as e:
+            raise QueryError(f"Failed to unindex {entity}: {str(e)}")
@@ -1,14 +1,28 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Pattern
+import asyncio
 import jwt
 from datetime import datetime, timedelta
 import re
+import time
 from passlib.context import CryptContext
 from app.agents.base_agent import BaseAgent
+from app.core.crypto import FieldCipher
 from app.utils.exceptions import SecurityError
 
+# Formats checked on incoming data, compiled once
+VALIDATION_PATTERNS: Dict[str, Pattern] = {
+    "email": re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"),
+    "phone": re.compile(r"^\+?1?\d{9,15}$"),
+    "password": re.compile(r"^(?=.*[A-Za-z])(?=.*\d)[A-Za-z\d]{8,}$")  # At least 8 chars, 1 letter and 1 number
+}
+
 class DataSecurityAgent(BaseAgent):
-    def __init__(self, api_key: str):
+    # Decoded tokens kept so repeat requests skip signature verification
+    TOKEN_CACHE_SIZE = 1024
+
+    def __init__(self, api_key: str, cipher: Optional[FieldCipher] = None):
         super().__init__("Data Security Agent", api_key)
+        self.cipher = cipher
         self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
         
         # For demo purposes - in production, use a proper user database
@@ -26,13 +40,11 @@ class DataSecurityAgent(BaseAgent):
             "editor": ["create", "read", "update"],
             "viewer": ["read"]
         }
+        self._permission_sets = {role: frozenset(actions) for role, actions in self.role_permissions.items()}
+        self._tokens: Dict[str, Dict[str, Any]] = {}
         
         # Define validation patterns
-        self.validation_patterns = {
-            "email": r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$",
-            "phone": r"^\+?1?\d{9,15}$",
-            "password": r"^(?=.*[A-Za-z])(?=.*\d)[A-Za-z\d]{8,}$"  # At least 8 chars, 1 letter and 1 number
-        }
+        self.validation_patterns = VALIDATION_PATTERNS
 
     async def process(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Process security-related requests"""
@@ -44,6 +56,10 @@ class DataSecurityAgent(BaseAgent):
             return await self._authorize_request(request)
         elif operation == "validate":
             return await self._validate_data(request)
+        elif operation in ("encrypt", "decrypt"):
+            return await self._transform_fields(request)
+        elif operation == "blind_index":
+            return await self._blind_index(request)
         else:
             raise SecurityError(f"Unknown security operation: {operation}")
 
@@ -55,6 +71,21 @@ class DataSecurityAgent(BaseAgent):
         """Generate password hash"""
         return self.pwd_context.hash(password)
 
+    def permits(self, role: Optional[str], action: str) -> bool:
+        """Whether a role may perform an action"""
+        return action in self._permission_sets.get(role, ())
+
+    def _decode_token(self, token: str) -> Dict[str, Any]:
+        """Verify and decode a token, reusing the result until the token expires"""
+        payload = self._tokens.get(token)
+        if payload is not None and payload.get("exp", 0) > time.time():
+            return payload
+        payload = jwt.decode(token, self.api_key, algorithms=["HS256"])
+        if len(self._tokens) >= self.TOKEN_CACHE_SIZE:
+            self._tokens.pop(next(iter(self._tokens)))
+        self._tokens[token] = payload
+        return payload
+
     def create_access_token(self, data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Create JWT access token"""
         to_encode = data.copy()
@@ -97,14 +128,14 @@ class DataSecurityAgent(BaseAgent):
         action = request.get("action")
         
         try:
-            payload = jwt.decode(token, self.api_key, algorithms=["HS256"])
+            payload = self._decode_token(token)
             username = payload.get("sub")
             role = payload.get("role")
             
             if not username or not role:
                 raise SecurityError("Invalid token")
             
-            if action not in self.role_permissions.get(role, []):
+            if not self.permits(role, action):
                 raise SecurityError(f"User does not have permission to perform {action}")
             
             return {
@@ -127,8 +158,7 @@ class DataSecurityAgent(BaseAgent):
         
         for field, value in data.items():
             if field in self.validation_patterns and value:
-                pattern = self.validation_patterns[field]
-                is_match = bool(re.match(pattern, value))
+                is_match = bool(self.validation_patterns[field].match(value))
                 validation_results[field] = is_match
                 is_valid = is_valid and is_match
         
@@ -136,3 +166,26 @@ class DataSecurityAgent(BaseAgent):
             "valid": is_valid,
             "validation_results": validation_results
         }
+
+    def _require_cipher(self) -> FieldCipher:
+        if self.cipher is None:
+            raise SecurityError("Field encryption is not configured; set ENCRYPTION_KEY")
+        return self.cipher
+
+    async def _transform_fields(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Encrypt or decrypt the protected fields of a batch of record data"""
+        cipher = self._require_cipher()
+        entity = request.get("entity")
+        records = [dict(data) for data in request.get("records", [])]
+        if request.get("operation") == "decrypt":
+            return await asyncio.to_thread(cipher.decrypt_many, entity, records)
+        return await asyncio.to_thread(cipher.encrypt_many, entity, records)
+
+    async def _blind_index(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Compute the blind index of a value, as stored for equality lookups"""
+        cipher = self._require_cipher()
+        entity = request.get("entity")
+        field = request.get("field")
+        if field not in cipher.indexed_fields(entity):
+            raise SecurityError(f"{entity}.{field} has no blind index")
+        return {"entity": entity, "field": field, "digest": cipher.blind_index(entity, field, request.get("value"))}
@@ -1,19 +1,76 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import asyncio
 from app.agents.base_agent import BaseAgent
-from app.utils.exceptions import UpdateError
+from app.core.config import Settings
+from app.core.database import RecordStore
+from app.core.history import ChangeLog
+from app.core.log import capped
+from app.utils.exceptions import ConflictError, NotFoundError, UpdateError
+from app.utils.trigram_index import TrigramIndex, TrigramIndexSet
 from loguru import logger
 
 class DataUpdateAgent(BaseAgent):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        store: Optional[RecordStore] = None,
+        text_indexes: Optional[TrigramIndexSet] = None,
+        history: Optional[ChangeLog] = None
+    ):
+        super().__init__("Data Update Agent", api_key)
+        self.settings = Settings()
+        self.store = store
+        self.text_indexes = text_indexes
+        self.history = history
+        self._history_compaction: Optional[asyncio.Task] = None
+        self._tombstone_compaction: Optional[asyncio.Task] = None
+
     async def initialize(self) -> Dict[str, Any]:
         """Initialize update agent"""
         try:
-            # Initialize any required resources
+            if self.store is not None:
+                self._tombstone_compaction = asyncio.create_task(self._compact_tombstones())
             self.is_initialized = True
             return self.log_operation("initialize", {"status": "success"})
         except Exception as e:
             logger.error(f"Error initializing update agent: {str(e)}")
             raise UpdateError(f"Failed to initialize update agent: {str(e)}")
 
+    async def cleanup(self) -> Dict[str, Any]:
+        """Stop background compaction and release resources"""
+        for task in (self._tombstone_compaction, self._history_compaction):
+            if task is not None and not task.done():
+                task.cancel()
+        return await super().cleanup()
+
+    async def _compact_tombstones(self) -> None:
+        """Periodically purge tombstones past the retention window in small batches.
+
+        Each batch is its own short transaction and the loop sleeps between
+        batches, so foreground requests never wait behind a large purge.
+        """
+        batch_size = self.settings.TOMBSTONE_COMPACTION_BATCH_SIZE
+        while True:
+            await asyncio.sleep(self.settings.TOMBSTONE_COMPACTION_INTERVAL_SECONDS)
+            try:
+                cutoff = datetime.utcnow() - timedelta(days=self.settings.TOMBSTONE_RETENTION_DAYS)
+                purged = batch_size
+                total = 0
+                while purged == batch_size:
+                    purged = await asyncio.to_thread(
+                        self.store.purge_tombstones,
+                        cutoff.isoformat() + "Z",
+                        batch_size,
+                        self.settings.TOMBSTONE_ARCHIVE
+                    )
+                    total += purged
+                    await asyncio.sleep(self.settings.TOMBSTONE_COMPACTION_BATCH_PAUSE_SECONDS)
+                if total:
+                    self.log_operation("compact_tombstones", {"purged": total})
+            except Exception as e:
+                logger.error("Error compacting tombstones: {error}", error=capped(e))
+
     async def process(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Process an update request"""
         try:
@@ -22,10 +79,14 @@ class DataUpdateAgent(BaseAgent):
                 return await self._handle_update(request)
             elif operation == "delete":
                 return await self._handle_delete(request)
+            elif operation == "history":
+                return await self._handle_history(request)
             else:
                 raise UpdateError(f"Unknown operation: {operation}")
+        except (ConflictError, NotFoundError):
+            raise
         except Exception as e:
-            logger.error(f"Error processing update: {str(e)}")
+            logger.error("Error processing update: {error}", error=capped(e))
             raise UpdateError(f"Failed to process update: {str(e)}")
 
     async def _handle_update(self, request: Dict[str, Any]) -> Dict[str, Any]:
@@ -34,16 +95,17 @@ class DataUpdateAgent(BaseAgent):
             entity = request.get("entity")
             entity_id = request.get("id")
             data = request.get("data", {})
+            expected_version = request.get("expected_version")
             
-            # For demo purposes, return mock data
-            return {
-                "id": entity_id,
-                "entity": entity,
-                "name": data.get("name", f"Test {entity.title()} {entity_id}"),
-                "updated_at": "2025-01-30T12:00:00Z",
-                "status": "active",
-                **data
-            }
+            # Compare-and-set on the version the client last read, if given
+            record = await asyncio.to_thread(self.store.update, entity, entity_id, data, expected_version)
+            self._record_history(lambda history: history.record_update(record, data))
+            index = self._text_index(entity)
+            if index is not None:
+                await asyncio.to_thread(index.upsert, record)
+            return record
+        except (ConflictError, NotFoundError):
+            raise
         except Exception as e:
             raise UpdateError(f"Failed to update {entity}: {str(e)}")
 
@@ -52,13 +114,48 @@ class DataUpdateAgent(BaseAgent):
         try:
             entity = request.get("entity")
             entity_id = request.get("id")
+            expected_version = request.get("expected_version")
             
-            # For demo purposes, return mock data
-            return {
-                "id": entity_id,
-                "entity": entity,
-                "deleted_at": "2025-01-30T12:00:00Z",
-                "status": "deleted"
-            }
+            result = await asyncio.to_thread(self.store.delete, entity, entity_id, expected_version)
+            self._record_history(lambda history: history.record_delete(entity, entity_id, result["version"]))
+            index = self._text_index(entity)
+            if index is not None:
+                await asyncio.to_thread(index.remove, entity_id)
+            return result
+        except (ConflictError, NotFoundError):
+            raise
         except Exception as e:
             raise UpdateError(f"Failed to delete {entity}: {str(e)}")
+
+    async def _handle_history(self, request: Dict[str, Any]) -> Any:
+        """Handle history operation: the record as of a timestamp, or its full change list"""
+        try:
+            entity = request.get("entity")
+            entity_id = request.get("id")
+            as_of = request.get("as_of")
+
+            if self.history is None:
+                raise UpdateError("Change history is not enabled")
+            if as_of is None:
+                return await asyncio.to_thread(self.history.changes, entity, entity_id)
+
+            record = await asyncio.to_thread(self.history.as_of, entity, entity_id, as_of)
+            if record is None:
+                raise NotFoundError(f"{entity} {entity_id} did not exist at {as_of}")
+            return record
+        except NotFoundError:
+            raise
+        except Exception as e:
+            raise UpdateError(f"Failed to read history of {entity}: {str(e)}")
+
+    def _record_history(self, write) -> None:
+        """Append to the change log and compact sealed segments in the background when due"""
+        if self.history is None:
+            return
+        write(self.history)
+        if self.history.needs_compaction() and (self._history_compaction is None or self._history_compaction.done()):
+            self._history_compaction = asyncio.create_task(asyncio.to_thread(self.history.compact))
+
+    def _text_index(self, entity: str) -> Optional[TrigramIndex]:
+        """Get the trigram index maintained for an entity, if any"""
+        return self.text_indexes.get(entity) if self.text_indexes else None
@@ -1,18 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, Security, Form
+from fastapi import APIRouter, Depends, HTTPException, Security, Form, Header, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 from datetime import datetime
+import asyncio
+import json
 
+from app.api.api_v1.models import DeletedRecordModel, RECORD_MODELS
+from app.api.api_v1.pipelines import EntityPipeline, OPERATION_ACTIONS, PIPELINES
 from app.core.config import Settings
 from app.core.orchestrator import OrchestrationAgent
-from app.utils.exceptions import OrchestrationError, SecurityError
+from app.core.events import Subscription
+from app.utils.exceptions import ConflictError, NotFoundError, OffsetExpiredError, OrchestrationError, SecurityError, ValidationError
+from app.utils.records import json_default, to_wire
 
 settings = Settings()
-api_router = APIRouter()
+api_router = APIRouter(default_response_class=ORJSONResponse)
 orchestrator = OrchestrationAgent()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/token")
 
+def make_etag(record: Dict[str, Any]) -> str:
+    """Build the strong ETag for a record from its version"""
+    return f'"{record["version"]}"'
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Return the version an If-Match header requires, or None for `*`"""
+    if if_match is None:
+        raise HTTPException(status_code=428, detail="If-Match header is required")
+    value = if_match.strip()
+    if value == "*":
+        return None
+    if value.startswith("W/"):
+        raise HTTPException(status_code=412, detail="Weak ETags cannot be used with If-Match")
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Malformed If-Match header: {if_match}")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compare an If-None-Match header against the current ETag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+def not_modified(etag: str) -> Response:
+    """Build a 304 response carrying the validators a full response would have"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": settings.CACHE_CONTROL})
+
 @api_router.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()) -> Dict[str, str]:
     """Login endpoint to get access token"""
@@ -50,15 +88,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def scoped_idempotency_key(current_user: Dict[str, Any], idempotency_key: Optional[str]) -> Optional[str]:
+    """Namespace a client's Idempotency-Key by user so keys from different users never collide"""
+    return f"{current_user.get('username')}:{idempotency_key}" if idempotency_key else None
+
 @api_router.post("/process")
 async def process_request(
     request: Dict[str, Any],
+    idempotency_key: Optional[str] = Header(None),
     current_user: Dict[str, Any] = Depends(get_current_user)
-) -> Dict[str, Any]:
-    """Process a request through the agent system"""
+) -> Any:
+    """Process a request through the agent system, authorized for what its operation does"""
     try:
+        action = OPERATION_ACTIONS.get(request.get("operation"), "read")
+        EntityPipeline.authorize(orchestrator.agents["security"], current_user, action)
+
+        request["idempotency_key"] = scoped_idempotency_key(current_user, idempotency_key)
         result = await orchestrator.process_request(request)
-        return result
+        return to_wire(result)
+    except SecurityError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except OrchestrationError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -71,7 +122,7 @@ async def get_workflow_status(
 ) -> Dict[str, Any]:
     """Get the status of a specific workflow"""
     try:
-        return await orchestrator.get_workflow_status(workflow_id)
+        return to_wire(await orchestrator.get_workflow_status(workflow_id))
     except OrchestrationError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -90,117 +141,317 @@ async def get_agent_status(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/customer")
-async def create_customer(
-    customer_data: Dict[str, Any],
-    current_user: Dict[str, Any] = Depends(get_current_user)
-) -> Dict[str, Any]:
-    """Create a new customer"""
-    try:
-        # Validate user has create permission
-        await orchestrator.agents["security"].process({
-            "operation": "authorize",
-            "token": current_user.get("token"),
-            "action": "create"
-        })
+def register_entity_routes(pipeline: EntityPipeline) -> None:
+    """Add the CRUD routes of one entity to the router.
 
-        # Validate customer data
-        validation_result = await orchestrator.agents["security"].process({
-            "operation": "validate",
-            "data": {
-                "email": customer_data.get("email", ""),
-                "phone": customer_data.get("phone", "")
-            }
-        })
+    Every entity in the schema registry gets the same routes, sharing the
+    entity's precompiled pipeline:
 
-        if not validation_result["valid"]:
-            raise HTTPException(
-                status_code=422,
-                detail=f"Invalid data format: {validation_result['validation_results']}"
-            )
+        POST   /{entity}                  create (Idempotency-Key aware)
+        GET    /{entity}/{id}             read (If-None-Match aware)
+        PUT    /{entity}/{id}             update (If-Match required), unless workflow-managed
+        DELETE /{entity}/{id}             delete (If-Match optional), unless workflow-managed
+        GET    /{entity}/{id}/history     change history
+        GET    /{entity}s                 paginated list (If-None-Match aware)
+        GET    /{entity}s/lookup          exact match on a blind-indexed field
+    """
+    entity = pipeline.entity
+    record_model = RECORD_MODELS[entity]
 
-        # Process customer creation
-        result = await orchestrator.process_request({
-            "operation": "create",
-            "entity": "customer",
-            "data": customer_data
-        })
-        return result
+    @api_router.post(f"/{entity}", response_model=record_model, response_model_exclude_unset=True, name=f"create_{entity}")
+    async def create_record(
+        data: Dict[str, Any],
+        response: Response,
+        idempotency_key: Optional[str] = Header(None),
+        current_user: Dict[str, Any] = Depends(get_current_user)
+    ) -> Dict[str, Any]:
+        """Create a record.
 
-    except SecurityError as e:
-        raise HTTPException(status_code=403, detail=str(e))
-    except OrchestrationError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        Send an Idempotency-Key header to make retries safe: a repeated key
+        returns the original result instead of creating a duplicate.
+        """
+        try:
+            pipeline.authorize(orchestrator.agents["security"], current_user, "create")
+            request = pipeline.create_request(pipeline.validate(data))
+            request["idempotency_key"] = scoped_idempotency_key(current_user, idempotency_key)
+            result = await orchestrator.process_request(request)
+            response.headers["ETag"] = make_etag(result)
+            return to_wire(result)
 
-@api_router.get("/customer/{customer_id}")
-async def get_customer(
-    customer_id: str,
-    current_user: Dict[str, Any] = Depends(get_current_user)
-) -> Dict[str, Any]:
-    """Get customer by ID"""
-    try:
-        # Validate user has read permission
-        await orchestrator.agents["security"].process({
-            "operation": "authorize",
-            "token": current_user.get("token"),
-            "action": "read"
-        })
+        except SecurityError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except NotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except ConflictError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except OrchestrationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
-        result = await orchestrator.process_request({
-            "operation": "read",
-            "entity": "customer",
-            "id": customer_id
-        })
-        return result
+    @api_router.get(f"/{entity}/{{entity_id}}", response_model=record_model, response_model_exclude_unset=True, name=f"get_{entity}")
+    async def get_record(
+        entity_id: str,
+        response: Response,
+        if_none_match: Optional[str] = Header(None),
+        current_user: Dict[str, Any] = Depends(get_current_user)
+    ) -> Dict[str, Any]:
+        """Get a record by ID.
 
-    except SecurityError as e:
-        raise HTTPException(status_code=403, detail=str(e))
-    except OrchestrationError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        With If-None-Match, only the record's version is looked up first; if
+        the ETag still matches the response is a bodiless 304.
+        """
+        try:
+            pipeline.authorize(orchestrator.agents["security"], current_user, "read")
 
-@api_router.put("/customer/{customer_id}")
-async def update_customer(
-    customer_id: str,
-    customer_data: Dict[str, Any],
-    current_user: Dict[str, Any] = Depends(get_current_user)
-) -> Dict[str, Any]:
-    """Update customer by ID"""
-    try:
-        # Validate user has update permission
-        await orchestrator.agents["security"].process({
-            "operation": "authorize",
-            "token": current_user.get("token"),
-            "action": "update"
-        })
+            if if_none_match:
+                version = await orchestrator.process_request({
+                    "operation": "version",
+                    "entity": entity,
+                    "id": entity_id
+                })
+                etag = make_etag({"version": version})
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
 
-        # Validate customer data
-        if "email" in customer_data or "phone" in customer_data:
-            validation_result = await orchestrator.agents["security"].process({
-                "operation": "validate",
-                "data": {
-                    "email": customer_data.get("email", ""),
-                    "phone": customer_data.get("phone", "")
-                }
+            result = await orchestrator.process_request({
+                "operation": "read",
+                "entity": entity,
+                "id": entity_id
             })
+            response.headers["ETag"] = make_etag(result)
+            response.headers["Cache-Control"] = settings.CACHE_CONTROL
+            return to_wire(result)
+
+        except SecurityError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        except NotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except OrchestrationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    if pipeline.writable:
+        @api_router.put(f"/{entity}/{{entity_id}}", response_model=record_model, response_model_exclude_unset=True, name=f"update_{entity}")
+        async def update_record(
+            entity_id: str,
+            data: Dict[str, Any],
+            response: Response,
+            if_match: Optional[str] = Header(None),
+            current_user: Dict[str, Any] = Depends(get_current_user)
+        ) -> Dict[str, Any]:
+            """Update a record by ID.
 
-            if not validation_result["valid"]:
+            Requires an If-Match header carrying the ETag from a previous read; the
+            update only applies if the record is still at that version.
+            """
+            try:
+                expected_version = parse_if_match(if_match)
+                pipeline.authorize(orchestrator.agents["security"], current_user, "update")
+
+                result = await orchestrator.process_request({
+                    "operation": "update",
+                    "entity": entity,
+                    "id": entity_id,
+                    "data": pipeline.validate(data, partial=True),
+                    "expected_version": expected_version
+                })
+                response.headers["ETag"] = make_etag(result)
+                return to_wire(result)
+
+            except HTTPException:
+                raise
+            except SecurityError as e:
+                raise HTTPException(status_code=403, detail=str(e))
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            except NotFoundError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            except ConflictError as e:
                 raise HTTPException(
-                    status_code=422,
-                    detail=f"Invalid data format: {validation_result['validation_results']}"
+                    status_code=412,
+                    detail=str(e),
+                    headers={"ETag": f'"{e.current_version}"'} if e.current_version is not None else None
                 )
+            except OrchestrationError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
 
-        result = await orchestrator.process_request({
-            "operation": "update",
-            "entity": "customer",
-            "id": customer_id,
-            "data": customer_data
-        })
-        return result
+        @api_router.delete(f"/{entity}/{{entity_id}}", response_model=DeletedRecordModel, name=f"delete_{entity}")
+        async def delete_record(
+            entity_id: str,
+            if_match: Optional[str] = Header(None),
+            current_user: Dict[str, Any] = Depends(get_current_user)
+        ) -> Dict[str, Any]:
+            """Delete a record by ID, optionally conditional on an If-Match ETag"""
+            try:
+                expected_version = parse_if_match(if_match) if if_match is not None else None
+                pipeline.authorize(orchestrator.agents["security"], current_user, "delete")
+
+                result = await orchestrator.process_request({
+                    "operation": "delete",
+                    "entity": entity,
+                    "id": entity_id,
+                    "expected_version": expected_version
+                })
+                return to_wire(result)
 
+            except HTTPException:
+                raise
+            except SecurityError as e:
+                raise HTTPException(status_code=403, detail=str(e))
+            except NotFoundError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            except ConflictError as e:
+                raise HTTPException(
+                    status_code=412,
+                    detail=str(e),
+                    headers={"ETag": f'"{e.current_version}"'} if e.current_version is not None else None
+                )
+            except OrchestrationError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=str(e))
+
+    @api_router.get(f"/{entity}/{{entity_id}}/history", name=f"get_{entity}_history")
+    async def get_record_history(
+        entity_id: str,
+        as_of: Optional[str] = None,
+        current_user: Dict[str, Any] = Depends(get_current_user)
+    ) -> Any:
+        """Get a record's change history, or the record as it was at `as_of` (ISO timestamp)"""
+        try:
+            pipeline.authorize(orchestrator.agents["security"], current_user, "read")
+
+            result = await orchestrator.process_request({
+                "operation": "history",
+                "entity": entity,
+                "id": entity_id,
+                "as_of": as_of
+            })
+            return to_wire(result)
+
+        except SecurityError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        except NotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except OrchestrationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @api_router.get(f"/{entity}s", response_model=List[record_model], name=f"list_{entity}s")
+    async def list_records(
+        skip: int = 0,
+        limit: int = 10,
+        if_none_match: Optional[str] = Header(None),
+        current_user: Dict[str, Any] = Depends(get_current_user)
+    ) -> Response:
+        """List records with pagination.
+
+        The query agent hands back the page already JSON-encoded, so the
+        response skips model validation and generic encoding entirely. The ETag
+        hashes the ids and versions on the page and is checked before the page
+        is read.
+        """
+        try:
+            pipeline.authorize(orchestrator.agents["security"], current_user, "read")
+
+            page_tag = await orchestrator.process_request({
+                "operation": "page_tag",
+                "entity": entity,
+                "skip": skip,
+                "limit": limit
+            })
+            etag = f'"{page_tag}"'
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+            result = await orchestrator.process_request({
+                "operation": "list",
+                "entity": entity,
+                "skip": skip,
+                "limit": limit,
+                "encoding": "json"
+            })
+            return Response(
+                content=result,
+                media_type="application/json",
+                headers={"ETag": etag, "Cache-Control": settings.CACHE_CONTROL}
+            )
+
+        except SecurityError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        except OrchestrationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    if not pipeline.lookup_fields:
+        return
+
+    @api_router.get(f"/{entity}s/lookup", response_model=List[record_model], name=f"lookup_{entity}s")
+    async def lookup_records(
+        field: str,
+        value: str,
+        current_user: Dict[str, Any] = Depends(get_current_user)
+    ) -> Any:
+        """Find records whose encrypted `field` equals `value` (case-insensitive), via its blind index"""
+        try:
+            pipeline.authorize(orchestrator.agents["security"], current_user, "read")
+            if field not in pipeline.lookup_fields:
+                raise ValidationError(f"Lookup is only supported on {', '.join(pipeline.lookup_fields)}")
+
+            result = await orchestrator.process_request({
+                "operation": "lookup",
+                "entity": entity,
+                "field": field,
+                "value": value
+            })
+            return to_wire(result)
+
+        except SecurityError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except OrchestrationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+for pipeline in PIPELINES.values():
+    register_entity_routes(pipeline)
+
+@api_router.post("/export")
+async def export_records(
+    request: Dict[str, Any],
+    current_user: Dict[str, Any] = Depends(get_current_user)
+) -> StreamingResponse:
+    """Stream every record of an entity as CSV, NDJSON or Parquet.
+
+    Body: ``entity``, optional ``format`` (default csv), ``fields`` to
+    project, ``filters`` of field/value equality pairs and ``chunk_size``.
+    """
+    try:
+        # Validate user has read permission
+        EntityPipeline.authorize(orchestrator.agents["security"], current_user, "read")
+
+        if not request.get("entity"):
+            raise HTTPException(status_code=422, detail="entity is required")
+
+        stream = await orchestrator.process_request({**request, "operation": "export", "idempotency_key": None})
+        return StreamingResponse(
+            stream,
+            media_type=stream.media_type,
+            headers={"Content-Disposition": f'attachment; filename="{stream.filename}"'}
+        )
+
+    except HTTPException:
+        raise
     except SecurityError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except OrchestrationError as e:
@@ -208,26 +459,24 @@ async def update_customer(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.delete("/customer/{customer_id}")
-async def delete_customer(
-    customer_id: str,
+@api_router.get("/customers/search")
+async def search_customers(
+    q: str,
+    limit: int = 20,
     current_user: Dict[str, Any] = Depends(get_current_user)
-) -> Dict[str, Any]:
-    """Delete customer by ID"""
+) -> List[Dict[str, Any]]:
+    """Search customers by partial name or address"""
     try:
-        # Validate user has delete permission
-        await orchestrator.agents["security"].process({
-            "operation": "authorize",
-            "token": current_user.get("token"),
-            "action": "delete"
-        })
+        # Validate user has read permission
+        EntityPipeline.authorize(orchestrator.agents["security"], current_user, "read")
 
         result = await orchestrator.process_request({
-            "operation": "delete",
+            "operation": "search",
             "entity": "customer",
-            "id": customer_id
+            "query": q,
+            "limit": limit
         })
-        return result
+        return to_wire(result)
 
     except SecurityError as e:
         raise HTTPException(status_code=403, detail=str(e))
@@ -236,28 +485,24 @@ async def delete_customer(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/customers")
-async def list_customers(
-    skip: int = 0,
-    limit: int = 10,
+@api_router.get("/customers/semantic-search")
+async def semantic_search_customers(
+    q: str,
+    k: int = 10,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ) -> List[Dict[str, Any]]:
-    """List customers with pagination"""
+    """Find customers whose records are semantically closest to a free-text query"""
     try:
         # Validate user has read permission
-        await orchestrator.agents["security"].process({
-            "operation": "authorize",
-            "token": current_user.get("token"),
-            "action": "read"
-        })
+        EntityPipeline.authorize(orchestrator.agents["security"], current_user, "read")
 
         result = await orchestrator.process_request({
-            "operation": "list",
+            "operation": "semantic_search",
             "entity": "customer",
-            "skip": skip,
-            "limit": limit
+            "query": q,
+            "k": k
         })
-        return result
+        return to_wire(result)
 
     except SecurityError as e:
         raise HTTPException(status_code=403, detail=str(e))
@@ -269,22 +514,29 @@ async def list_customers(
 @api_router.post("/analytics/report")
 async def generate_analytics_report(
     report_config: Dict[str, Any],
+    response: Response,
+    background: bool = False,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ) -> Dict[str, Any]:
-    """Generate analytics report"""
+    """Generate analytics report.
+
+    With ``background=true`` the report is queued and the response is a 202
+    carrying the workflow id; poll ``/workflow/{workflow_id}`` for the result.
+    Identical configs share one cached computation either way.
+    """
     try:
         # Validate user has read permission
-        await orchestrator.agents["security"].process({
-            "operation": "authorize",
-            "token": current_user.get("token"),
-            "action": "read"
-        })
+        EntityPipeline.authorize(orchestrator.agents["security"], current_user, "read")
 
         result = await orchestrator.process_request({
             "operation": "analytics",
-            "config": report_config
+            "config": report_config,
+            "background": background
         })
-        return result
+        if background:
+            response.status_code = 202
+            response.headers["Location"] = f"{settings.API_V1_STR}/workflow/{result['workflow_id']}"
+        return to_wire(result)
 
     except SecurityError as e:
         raise HTTPException(status_code=403, detail=str(e))
@@ -292,3 +544,78 @@ async def generate_analytics_report(
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def _sse_events(subscription: Subscription) -> AsyncIterator[str]:
+    """Encode a subscription as Server-Sent Events, with heartbeats while idle"""
+    try:
+        while True:
+            try:
+                event = await subscription.get(timeout=settings.CDC_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                yield f"event: evicted\ndata: {json.dumps({'resume_after': subscription.last_offset})}\n\n"
+                return
+            yield f"id: {event['offset']}\nevent: {event['type']}\ndata: {json.dumps(event, default=json_default)}\n\n"
+    finally:
+        orchestrator.events.unsubscribe(subscription)
+
+@api_router.get("/changes/stream")
+async def stream_changes(
+    entity: Optional[str] = None,
+    offset: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+) -> StreamingResponse:
+    """Stream create/update/delete events as Server-Sent Events.
+
+    Pass `offset` (or let the browser send Last-Event-ID) to resume after the
+    last event received. A consumer that falls behind its buffer gets an
+    `evicted` event carrying the offset to resume from.
+    """
+    try:
+        after_offset = int(last_event_id) if last_event_id else offset
+        subscription = orchestrator.events.subscribe(entity, after_offset)
+        return StreamingResponse(
+            _sse_events(subscription),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except OffsetExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Malformed Last-Event-ID: {last_event_id}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.websocket("/changes/ws")
+async def websocket_changes(
+    websocket: WebSocket,
+    token: str,
+    entity: Optional[str] = None,
+    offset: Optional[int] = None
+) -> None:
+    """Stream create/update/delete events over a WebSocket, authenticated by a `token` query parameter"""
+    try:
+        await get_current_user(token)
+        subscription = orchestrator.events.subscribe(entity, offset)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    except OffsetExpiredError as e:
+        await websocket.close(code=4410, reason=str(e))
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            event = await subscription.get()
+            if event is None:
+                await websocket.close(code=4429, reason=json.dumps({"resume_after": subscription.last_offset}))
+                return
+            await websocket.send_text(json.dumps(event, default=json_default))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        orchestrator.events.unsubscribe(subscription)
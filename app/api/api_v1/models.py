@@ -0,0 +1,47 @@
+from typing import Any, Dict, Optional, Type
+from pydantic import BaseModel, ConfigDict, create_model
+
+from app.utils.validation import BaseSchema, SCHEMAS
+
+
+class RecordModel(BaseModel):
+    """Wire format shared by every stored record"""
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    entity: str
+    version: int
+    created_at: str
+    updated_at: Optional[str] = None
+    status: str = "active"
+
+
+class DeletedRecordModel(BaseModel):
+    """Wire format of a delete result"""
+    id: str
+    entity: str
+    version: int
+    deleted_at: str
+    status: str = "deleted"
+
+
+def build_record_model(entity: str, schema: Type[BaseModel]) -> Type[RecordModel]:
+    """Derive a response model for an entity from its validation schema.
+
+    Schema fields become optional so partial records still serialize;
+    routes use ``response_model_exclude_unset`` to keep absent fields off
+    the wire.
+    """
+    fields: Dict[str, Any] = {
+        name: (Optional[field.annotation], None)
+        for name, field in schema.model_fields.items()
+        if name not in BaseSchema.model_fields
+    }
+    return create_model(f"{entity.title()}Record", __base__=RecordModel, **fields)
+
+
+RECORD_MODELS: Dict[str, Type[RecordModel]] = {
+    entity: build_record_model(entity, schema)
+    for entity, schema in SCHEMAS.items()
+    if entity != "default"
+}
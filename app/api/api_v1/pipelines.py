@@ -0,0 +1,99 @@
+from typing import Any, Dict, Optional, Pattern, Type, get_args
+from pydantic import BaseModel, ConfigDict, ValidationError as PydanticValidationError, create_model
+
+from app.agents.security_agent import VALIDATION_PATTERNS
+from app.core.config import Settings
+from app.utils.exceptions import SecurityError, ValidationError
+from app.utils.validation import BaseSchema, OrderPlacementSchema, SCHEMAS, WORKFLOW_MANAGED_ENTITIES
+
+settings = Settings()
+
+# Entities created by a workflow of their own instead of a plain insert
+CREATE_OPERATIONS = {"order": ("place_order", OrderPlacementSchema)}
+
+# The permission each orchestrator operation needs; anything else only reads
+OPERATION_ACTIONS = {"create": "create", "place_order": "create", "update": "update", "delete": "delete"}
+
+
+def compile_validator(name: str, schema: Type[BaseModel], id_field: str, partial: bool) -> Type[BaseModel]:
+    """Derive a request model from an entity's validation schema.
+
+    Store-managed fields are dropped and unknown fields pass through. Fields
+    are required only if the schema requires them and they cannot be null;
+    the id field never is, since the store generates one. ``partial`` lets
+    every field be omitted, for updates, but only nullable fields accept an
+    explicit null: storing it would drop a field the schema requires.
+    """
+    fields: Dict[str, Any] = {}
+    for field_name, field in schema.model_fields.items():
+        if field_name in BaseSchema.model_fields:
+            continue
+        nullable = type(None) in get_args(field.annotation)
+        if field.is_required() and not nullable and not partial and field_name != id_field:
+            fields[field_name] = (field.annotation, ...)
+        elif partial and not nullable:
+            fields[field_name] = (field.annotation, None)
+        else:
+            fields[field_name] = (Optional[field.annotation], None)
+    return create_model(name, __config__=ConfigDict(extra="allow"), **fields)
+
+
+class EntityPipeline:
+    """What the CRUD routes of one entity need, built once at import.
+
+    Holds the compiled create and update validators and the format patterns
+    that apply to the entity's fields, so a request costs a model validation
+    and no security-agent round trips. ``lookup_fields`` are the fields with
+    a blind index, searchable by exact value; ``writable`` is False for
+    workflow-managed entities. Storage goes through the shared RecordStore,
+    whose parameterized statements are the same for every entity and stay
+    prepared in its connection's statement cache.
+    """
+
+    def __init__(self, entity: str, schema: Type[BaseModel]):
+        self.entity = entity
+        self.id_field = f"{entity}_id"
+        self.create_operation, create_schema = CREATE_OPERATIONS.get(entity, ("create", None))
+        title = entity.title()
+        self.create_validator = create_schema or compile_validator(f"{title}Create", schema, self.id_field, partial=False)
+        self.update_validator = compile_validator(f"{title}Update", schema, self.id_field, partial=True)
+        self.patterns: Dict[str, Pattern] = {
+            field: pattern for field, pattern in VALIDATION_PATTERNS.items() if field in schema.model_fields
+        }
+        self.lookup_fields = tuple(settings.BLIND_INDEX_FIELDS.get(entity, ()))
+        self.writable = entity not in WORKFLOW_MANAGED_ENTITIES
+
+    @staticmethod
+    def authorize(security: Any, current_user: Dict[str, Any], action: str) -> None:
+        """Check an already authenticated user's role against an action"""
+        if not security.permits(current_user.get("role"), action):
+            raise SecurityError(f"User does not have permission to perform {action}")
+
+    def validate(self, data: Dict[str, Any], partial: bool = False) -> Dict[str, Any]:
+        """Validate and coerce request data, raising ValidationError on bad input"""
+        validator = self.update_validator if partial else self.create_validator
+        try:
+            validated = validator.model_validate(data).model_dump(exclude_unset=True)
+        except PydanticValidationError as e:
+            raise ValidationError(f"Invalid data format: {e.errors(include_url=False)}")
+        results = {}
+        for field, pattern in self.patterns.items():
+            value = validated.get(field)
+            if value and isinstance(value, str):
+                results[field] = bool(pattern.match(value))
+        if not all(results.values()):
+            raise ValidationError(f"Invalid data format: {results}")
+        return validated
+
+    def create_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the orchestrator request that creates a record from validated data"""
+        if self.create_operation == "create":
+            return {"operation": "create", "entity": self.entity, "data": data}
+        return {"operation": self.create_operation, **data}
+
+
+PIPELINES: Dict[str, EntityPipeline] = {
+    entity: EntityPipeline(entity, schema)
+    for entity, schema in SCHEMAS.items()
+    if entity != "default"
+}
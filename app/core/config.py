@@ -26,8 +26,82 @@ class Settings(BaseModel):
     COHERE_API_KEY: str = os.getenv("COHERE_API_KEY", "")
     EMERGENCEAI_API_KEY: str = os.getenv("EMERGENCEAI_API_KEY", "")
     
+    # Semantic search settings
+    VECTOR_INDEX_PATH: str = os.getenv("VECTOR_INDEX_PATH", "./data/vectors")
+    EMBEDDING_DIM: int = 256
+    VECTOR_INDEX_PARTITIONS: int = 0  # 0 keeps a flat index; > 0 enables IVF partitioning
+    VECTOR_INDEX_NPROBE: int = 4
+    
+    # Full-text search settings
+    TEXT_INDEX_PATH: str = os.getenv("TEXT_INDEX_PATH", "./data/text")
+    TEXT_SEARCH_FIELDS: Dict[str, List[str]] = {
+        "customer": ["name", "address"],
+        "product": ["name", "description"]
+    }
+    
+    # Change history settings
+    HISTORY_PATH: str = os.getenv("HISTORY_PATH", "./data/history")
+    HISTORY_SNAPSHOT_INTERVAL: int = 20
+    HISTORY_SEGMENT_BYTES: int = 16 * 1024 * 1024
+    HISTORY_RETENTION_DAYS: int = 90
+    HISTORY_COMPACT_SEGMENTS: int = 8
+    
+    # Tombstone compaction settings
+    TOMBSTONE_RETENTION_DAYS: int = 30
+    TOMBSTONE_COMPACTION_INTERVAL_SECONDS: int = 300
+    TOMBSTONE_COMPACTION_BATCH_SIZE: int = 500
+    TOMBSTONE_COMPACTION_BATCH_PAUSE_SECONDS: float = 0.05
+    TOMBSTONE_ARCHIVE: bool = True
+    
+    # Change data capture settings
+    CDC_RETENTION_EVENTS: int = 10000
+    CDC_SUBSCRIBER_BUFFER: int = 1000
+    CDC_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Idempotency settings
+    IDEMPOTENCY_DB_PATH: str = os.getenv("IDEMPOTENCY_DB_PATH", "./data/idempotency.db")
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    
+    # Analytics settings
+    ANALYTICS_WORKERS: int = 2
+    ANALYTICS_CACHE_TTL_SECONDS: int = 300
+    ANALYTICS_CACHE_MAX_ENTRIES: int = 256
+    
+    # HTTP caching settings
+    CACHE_CONTROL: str = "private, no-cache"
+    
+    # Export settings
+    EXPORT_CHUNK_SIZE: int = 5000
+    
+    # Field encryption settings
+    ENCRYPTION_KEY: str = os.getenv("ENCRYPTION_KEY", "")  # urlsafe base64 of 32 bytes; empty disables encryption
+    ENCRYPTED_FIELDS: Dict[str, List[str]] = {
+        "customer": ["email", "phone", "address"]
+    }
+    BLIND_INDEX_FIELDS: Dict[str, List[str]] = {
+        "customer": ["email"]
+    }
+    ENCRYPTION_WORKERS: int = 4
+    ENCRYPTION_BATCH_MIN: int = 256
+    
+    # Order placement settings
+    ORDER_MAX_RETRIES: int = 5
+    ORDER_RETRY_BASE_SECONDS: float = 0.01
+    ORDER_RETRY_MAX_SECONDS: float = 0.5
+    
     # Logging settings
-    LOG_LEVEL: str = "INFO"
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FILE: Optional[str] = os.getenv("LOG_FILE")
+    LOG_ROTATION: str = "100 MB"
+    LOG_ENQUEUE: bool = True
+    LOG_SERIALIZE: bool = False
+    LOG_MAX_PAYLOAD_CHARS: int = 1000
+    # Fraction of calls logged per operation; operations not listed use LOG_SAMPLE_RATE.
+    # Sampling is opt-in: the log_creation/log_update/log_deletion audit events
+    # are kept in full unless an operator lists them here.
+    LOG_SAMPLE_RATE: float = 1.0
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
     
     # CORS settings
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
@@ -0,0 +1,190 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import hashlib
+import hmac
+import json
+import os
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.core.config import Settings
+
+# Marks an encrypted field value; anything without it is read back as plaintext
+CIPHERTEXT_PREFIX = "enc:v1:"
+
+_NONCE_BYTES = 12
+
+
+def derive_key(master_key: bytes, purpose: bytes) -> bytes:
+    """Derive a 256-bit subkey for one purpose from the master key"""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=purpose).derive(master_key)
+
+
+def normalize_index_value(value: Any) -> str:
+    """Canonical form a blind index is computed over, so lookups ignore case and surrounding spaces"""
+    return str(value).strip().lower()
+
+
+class FieldCipher:
+    """Field-level AES-GCM encryption and HMAC blind indexes for record data.
+
+    ``fields`` maps entities to the fields stored encrypted, and
+    ``index_fields`` to the encrypted fields that also get a blind index:
+    a keyed HMAC of the normalized value, so equality lookups match without
+    decrypting anything. Encryption and index keys are derived from the
+    master key once, and the AESGCM and HMAC handles are built once and
+    reused for every value.
+
+    Values are JSON-encoded, encrypted with a random 96-bit nonce and bound
+    to their entity and field as associated data, then stored as
+    ``enc:v1:`` + urlsafe base64 of nonce and ciphertext. Batches of at
+    least ``batch_min`` values are spread over ``workers`` threads.
+
+    ``seal_bytes`` encrypts whole blobs that derive from record data, such
+    as index files and cached results, under a separate subkey.
+    """
+
+    def __init__(
+        self,
+        master_key: bytes,
+        fields: Dict[str, List[str]],
+        index_fields: Optional[Dict[str, List[str]]] = None,
+        workers: int = 4,
+        batch_min: int = 256
+    ):
+        if len(master_key) != 32:
+            raise ValueError("Encryption master key must be 32 bytes")
+        self.fields = {entity: tuple(names) for entity, names in fields.items()}
+        self.index_fields = {entity: tuple(names) for entity, names in (index_fields or {}).items()}
+        for entity, names in self.index_fields.items():
+            unencrypted = set(names) - set(self.fields.get(entity, ()))
+            if unencrypted:
+                raise ValueError(f"Blind-indexed fields of {entity} must be encrypted: {sorted(unencrypted)}")
+        self._aead = AESGCM(derive_key(master_key, b"field-encryption"))
+        self._blob_aead = AESGCM(derive_key(master_key, b"blob-encryption"))
+        self._index_mac = hmac.new(derive_key(master_key, b"blind-index"), digestmod=hashlib.sha256)
+        self._associated_data: Dict[Tuple[str, str], bytes] = {}
+        self.workers = workers
+        self.batch_min = batch_min
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def close(self) -> None:
+        """Stop the batch worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _ad(self, entity: str, field: str) -> bytes:
+        ad = self._associated_data.get((entity, field))
+        if ad is None:
+            ad = self._associated_data[(entity, field)] = f"{entity}\0{field}".encode("utf-8")
+        return ad
+
+    def encrypt_value(self, entity: str, field: str, value: Any) -> str:
+        """Encrypt one field value"""
+        nonce = os.urandom(_NONCE_BYTES)
+        plaintext = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        sealed = nonce + self._aead.encrypt(nonce, plaintext, self._ad(entity, field))
+        return CIPHERTEXT_PREFIX + base64.urlsafe_b64encode(sealed).decode("ascii")
+
+    def decrypt_value(self, entity: str, field: str, value: Any) -> Any:
+        """Decrypt one field value; values written before encryption was enabled pass through"""
+        if not isinstance(value, str) or not value.startswith(CIPHERTEXT_PREFIX):
+            return value
+        sealed = base64.urlsafe_b64decode(value[len(CIPHERTEXT_PREFIX):])
+        plaintext = self._aead.decrypt(sealed[:_NONCE_BYTES], sealed[_NONCE_BYTES:], self._ad(entity, field))
+        return json.loads(plaintext)
+
+    def seal_bytes(self, context: str, data: bytes) -> bytes:
+        """Encrypt a blob, bound to ``context`` (what it is and whose it is)"""
+        nonce = os.urandom(_NONCE_BYTES)
+        return nonce + self._blob_aead.encrypt(nonce, data, context.encode("utf-8"))
+
+    def open_bytes(self, context: str, sealed: bytes) -> bytes:
+        """Decrypt a blob sealed for the same ``context``; raises InvalidTag otherwise"""
+        return self._blob_aead.decrypt(sealed[:_NONCE_BYTES], sealed[_NONCE_BYTES:], context.encode("utf-8"))
+
+    def encrypt_data(self, entity: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of ``data`` with the entity's encrypted fields sealed; nulls stay null"""
+        fields = self.fields.get(entity)
+        if not fields:
+            return data
+        data = dict(data)
+        for field in fields:
+            if data.get(field) is not None:
+                data[field] = self.encrypt_value(entity, field, data[field])
+        return data
+
+    def decrypt_data(self, entity: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Decrypt the entity's encrypted fields of ``data`` in place"""
+        for field in self.fields.get(entity, ()):
+            if data.get(field) is not None:
+                data[field] = self.decrypt_value(entity, field, data[field])
+        return data
+
+    def decrypt_many(self, entity: str, records: Sequence[Dict[str, Any]]) -> Sequence[Dict[str, Any]]:
+        """Decrypt a batch of record data in place, across the worker threads when it is large"""
+        fields = self.fields.get(entity)
+        if not fields or not records:
+            return records
+        if self.workers <= 1 or len(records) * len(fields) < self.batch_min:
+            for data in records:
+                self.decrypt_data(entity, data)
+            return records
+        for _ in self._map_chunks(lambda part: [self.decrypt_data(entity, data) for data in part], records):
+            pass
+        return records
+
+    def encrypt_many(self, entity: str, records: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies of a batch of record data with encrypted fields sealed, as ``decrypt_many`` splits work"""
+        fields = self.fields.get(entity)
+        if not fields or not records:
+            return list(records)
+        if self.workers <= 1 or len(records) * len(fields) < self.batch_min:
+            return [self.encrypt_data(entity, data) for data in records]
+        encrypted: List[Dict[str, Any]] = []
+        for part in self._map_chunks(lambda part: [self.encrypt_data(entity, data) for data in part], records):
+            encrypted.extend(part)
+        return encrypted
+
+    def _map_chunks(self, function: Callable[[Sequence[Any]], Any], records: Sequence[Any]) -> Iterator[Any]:
+        """Apply ``function`` to one contiguous chunk of ``records`` per worker thread, in order"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="field-crypto")
+        chunk = -(-len(records) // self.workers)
+        return self._executor.map(function, [records[start:start + chunk] for start in range(0, len(records), chunk)])
+
+    def indexed_fields(self, entity: str) -> Tuple[str, ...]:
+        return self.index_fields.get(entity, ())
+
+    def blind_index(self, entity: str, field: str, value: Any) -> str:
+        """Deterministic keyed digest of a value, equal for equal normalized values"""
+        mac = self._index_mac.copy()
+        mac.update(self._ad(entity, field))
+        mac.update(b"\0")
+        mac.update(normalize_index_value(value).encode("utf-8"))
+        return mac.hexdigest()[:32]
+
+    def blind_indexes(self, entity: str, data: Dict[str, Any]) -> Dict[str, Optional[str]]:
+        """Blind indexes of the indexed fields present in ``data``; None for fields being cleared"""
+        return {
+            field: None if data[field] is None else self.blind_index(entity, field, data[field])
+            for field in self.indexed_fields(entity)
+            if field in data
+        }
+
+
+def load_cipher(settings: Optional[Settings] = None) -> Optional[FieldCipher]:
+    """Build the FieldCipher described by Settings, or None when no ENCRYPTION_KEY is set"""
+    settings = settings or Settings()
+    if not settings.ENCRYPTION_KEY:
+        return None
+    return FieldCipher(
+        base64.urlsafe_b64decode(settings.ENCRYPTION_KEY),
+        settings.ENCRYPTED_FIELDS,
+        settings.BLIND_INDEX_FIELDS,
+        workers=settings.ENCRYPTION_WORKERS,
+        batch_min=settings.ENCRYPTION_BATCH_MIN
+    )
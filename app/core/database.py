@@ -0,0 +1,543 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+from app.core.crypto import FieldCipher, normalize_index_value
+from app.utils.exceptions import ConflictError, NotFoundError
+from app.utils.records import ColumnarPage, Record
+
+# Columns managed by the store; clients cannot write them through record data
+RESERVED_FIELDS = {"id", "entity", "version", "created_at", "updated_at", "deleted_at", "status"}
+
+# Fields that filter on a table column rather than a value inside the data JSON
+_FILTER_COLUMNS = {"id", "version", "created_at", "updated_at"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    entity TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    deleted_at TEXT,
+    PRIMARY KEY (entity, id)
+);
+CREATE TABLE IF NOT EXISTS records_archive (
+    entity TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    deleted_at TEXT NOT NULL,
+    archived_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blind_indexes (
+    entity TEXT NOT NULL,
+    field TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (entity, field, digest, id)
+) WITHOUT ROWID;
+"""
+
+# Partial indexes: list pages walk live rows in (entity, rowid) order, compaction only tombstones
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS records_live ON records (entity) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS records_tombstones ON records (deleted_at) WHERE deleted_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS blind_indexes_record ON blind_indexes (entity, id);
+"""
+
+
+def utcnow() -> str:
+    """Current UTC time in the ISO format used for record timestamps"""
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def sqlite_path(database_url: str) -> str:
+    """Extract the file path from a ``sqlite:///`` database URL"""
+    prefix = "sqlite:///"
+    if not database_url.startswith(prefix):
+        raise ValueError(f"Unsupported database URL: {database_url}")
+    return database_url[len(prefix):] or ":memory:"
+
+
+class RecordStore:
+    """SQLite-backed storage shared by the ingestion, query and update agents.
+
+    Every row carries a ``version`` that starts at 1 and is bumped by each
+    write, so updates can compare-and-set against the version a client read.
+    Methods are blocking; agents call them through ``asyncio.to_thread``.
+
+    With a ``cipher``, the fields it covers are encrypted before they reach
+    SQLite and decrypted as rows are read, and blind-indexed fields are
+    tracked in ``blind_indexes`` for ``lookup``.
+    """
+
+    def __init__(self, database_url: str, cipher: Optional[FieldCipher] = None):
+        self.path = sqlite_path(database_url)
+        self.cipher = cipher
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(records)")}
+        if "deleted_at" not in columns:
+            self._conn.execute("ALTER TABLE records ADD COLUMN deleted_at TEXT")
+        self._conn.executescript(_INDEXES)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close the underlying connection"""
+        with self._lock:
+            self._conn.close()
+
+    def _to_record(self, entity: str, entity_id: str, data: str, version: int, created_at: str, updated_at: Optional[str]) -> Record:
+        decoded = json.loads(data)
+        if self.cipher is not None:
+            self.cipher.decrypt_data(entity, decoded)
+        return Record(entity_id, entity, decoded, version, created_at, updated_at)
+
+    def _decode_page(self, entity: str, payloads: List[str]) -> List[Dict[str, Any]]:
+        """Decode the data of a page of rows, decrypting them as one batch"""
+        decoded = [json.loads(data) for data in payloads]
+        if self.cipher is not None:
+            self.cipher.decrypt_many(entity, decoded)
+        return decoded
+
+    def _payload(self, entity: str, data: Dict[str, Any]) -> str:
+        data = {k: v for k, v in data.items() if k not in RESERVED_FIELDS}
+        if self.cipher is not None:
+            data = self.cipher.encrypt_data(entity, data)
+        return json.dumps(data, separators=(",", ":"))
+
+    def _write_blind_indexes(self, entity: str, entity_id: str, digests: Dict[str, Optional[str]]) -> None:
+        """Replace the blind index rows of the given fields; call inside a transaction"""
+        for field, digest in digests.items():
+            self._conn.execute(
+                "DELETE FROM blind_indexes WHERE entity = ? AND id = ? AND field = ?",
+                (entity, entity_id, field)
+            )
+            if digest is not None:
+                self._conn.execute(
+                    "INSERT INTO blind_indexes (entity, field, digest, id) VALUES (?, ?, ?, ?)",
+                    (entity, field, digest, entity_id)
+                )
+
+    def insert(self, entity: str, data: Dict[str, Any], entity_id: Optional[str] = None) -> Record:
+        """Insert a new record at version 1.
+
+        Re-creating a tombstoned id revives the row and continues its version
+        sequence, so ETags handed out before the delete never match again.
+        """
+        entity_id = str(entity_id or uuid.uuid4().hex)
+        payload = self._payload(entity, data)
+        digests = self._blind_indexes(entity, data, revive=True)
+        created_at = utcnow()
+        with self._lock:
+            if digests:
+                self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "INSERT INTO records (entity, id, data, version, created_at) VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (entity, id) DO UPDATE SET data = excluded.data, version = records.version + 1, "
+                    "created_at = excluded.created_at, updated_at = NULL, deleted_at = NULL "
+                    "WHERE records.deleted_at IS NOT NULL "
+                    "RETURNING version",
+                    (entity, entity_id, payload, created_at)
+                ).fetchone()
+                if digests:
+                    if row is not None:
+                        self._write_blind_indexes(entity, entity_id, digests)
+                    self._conn.execute("COMMIT")
+            except BaseException:
+                if digests:
+                    self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            raise ConflictError(f"{entity} {entity_id} already exists")
+        return self._to_record(entity, entity_id, payload, row[0], created_at, None)
+
+    def _blind_indexes(self, entity: str, data: Dict[str, Any], revive: bool = False) -> Dict[str, Optional[str]]:
+        """Blind indexes a write must store; on insert every indexed field is reset, present or not"""
+        if self.cipher is None or not self.cipher.indexed_fields(entity):
+            return {}
+        digests = self.cipher.blind_indexes(entity, data)
+        if revive:
+            for field in self.cipher.indexed_fields(entity):
+                digests.setdefault(field, None)
+        return digests
+
+    def get(self, entity: str, entity_id: str) -> Record:
+        """Fetch a record by id"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, version, created_at, updated_at FROM records "
+                "WHERE entity = ? AND id = ? AND deleted_at IS NULL",
+                (entity, entity_id)
+            ).fetchone()
+        if row is None:
+            raise NotFoundError(f"{entity} {entity_id} not found")
+        return self._to_record(entity, entity_id, *row)
+
+    def version(self, entity: str, entity_id: str) -> int:
+        """Fetch only the current version of a record, without decoding its data"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM records WHERE entity = ? AND id = ? AND deleted_at IS NULL",
+                (entity, entity_id)
+            ).fetchone()
+        if row is None:
+            raise NotFoundError(f"{entity} {entity_id} not found")
+        return row[0]
+
+    def page_tag(self, entity: str, skip: int = 0, limit: int = 10) -> str:
+        """Hash the ids and versions of a page; it changes whenever any row in the page does"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, version FROM records "
+                "WHERE entity = ? AND deleted_at IS NULL ORDER BY rowid LIMIT ? OFFSET ?",
+                (entity, limit, skip)
+            ).fetchall()
+        digest = hashlib.blake2b(entity.encode("utf-8"), digest_size=16)
+        for entity_id, version in rows:
+            digest.update(f"\0{entity_id}\0{version}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def list(self, entity: str, skip: int = 0, limit: int = 10) -> List[Record]:
+        """Fetch a page of live records in insertion order"""
+        rows = self._page(entity, skip, limit)
+        decoded = self._decode_page(entity, [row[1] for row in rows])
+        return [
+            Record(entity_id, entity, data, version, created_at, updated_at)
+            for (entity_id, _, version, created_at, updated_at), data in zip(rows, decoded)
+        ]
+
+    def list_columns(self, entity: str, skip: int = 0, limit: int = 10) -> ColumnarPage:
+        """Fetch a page of live records as columns instead of one object per row"""
+        page = ColumnarPage(entity)
+        rows = self._page(entity, skip, limit)
+        decoded = self._decode_page(entity, [row[1] for row in rows])
+        for (entity_id, _, version, created_at, updated_at), data in zip(rows, decoded):
+            page.append(entity_id, data, version, created_at, updated_at)
+        return page
+
+    def iter_pages(self, entity: str, page_size: int = 10000, filters: Optional[Dict[str, Any]] = None) -> Iterator[ColumnarPage]:
+        """Walk every live record of an entity as ColumnarPages of ``page_size`` rows.
+
+        Pages are fetched by keyset on rowid rather than OFFSET, so each page
+        costs the same however deep the walk is and the store lock is only
+        held while one page is read. ``filters`` maps fields to the scalar
+        value they must equal; an encrypted field can only be filtered on
+        through its blind index. Arguments are checked before the iterator is
+        returned, so a bad filter raises ValueError here rather than midway
+        through a consumer's stream.
+        """
+        if isinstance(page_size, bool) or not isinstance(page_size, int) or page_size < 1:
+            raise ValueError(f"Invalid page size: {page_size!r}")
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError("Filters must be an object of field/value pairs")
+        sql = (
+            "SELECT rowid, id, data, version, created_at, updated_at FROM records "
+            "WHERE entity = ? AND deleted_at IS NULL AND rowid > ?"
+        )
+        params: List[Any] = []
+        encrypted = self.cipher.fields.get(entity, ()) if self.cipher is not None else ()
+        for field, value in (filters or {}).items():
+            if value is not None and not isinstance(value, (str, int, float)):
+                raise ValueError(f"Filter on {field} must be a string, number, boolean or null")
+            if field in encrypted:
+                if field not in self.cipher.indexed_fields(entity) or value is None:
+                    raise ValueError(f"Cannot filter on encrypted field {field}")
+                sql += " AND id IN (SELECT id FROM blind_indexes WHERE entity = ? AND field = ? AND digest = ?)"
+                params.extend([entity, field, self.cipher.blind_index(entity, field, value)])
+                continue
+            column = field if field in _FILTER_COLUMNS else "json_extract(data, ?)"
+            if column != field:
+                params.append(f'$."{field}"')
+            if value is None:
+                sql += f" AND {column} IS NULL"
+            else:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        sql += " ORDER BY rowid LIMIT ?"
+        return self._walk_pages(entity, sql, params, page_size)
+
+    def _walk_pages(self, entity: str, sql: str, params: List[Any], page_size: int) -> Iterator[ColumnarPage]:
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, [entity, last_rowid, *params, page_size]).fetchall()
+            if not rows:
+                return
+            page = ColumnarPage(entity)
+            decoded = self._decode_page(entity, [row[2] for row in rows])
+            for (_, entity_id, _, version, created_at, updated_at), data in zip(rows, decoded):
+                page.append(entity_id, data, version, created_at, updated_at)
+            del decoded
+            last_rowid = rows[-1][0]
+            del rows
+            yield page
+            if len(page) < page_size:
+                return
+
+    def entities(self) -> List[str]:
+        """Names of every entity with at least one stored row"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT entity FROM records")]
+
+    def change_mark(self, entity: str) -> Optional[str]:
+        """Timestamp of the latest create, update or delete of an entity, None if it has no rows"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT max(max(created_at, coalesce(updated_at, ''), coalesce(deleted_at, ''))) "
+                "FROM records WHERE entity = ?",
+                (entity,)
+            ).fetchone()
+        return row[0]
+
+    def iter_changes(
+        self,
+        entity: str,
+        since: Optional[str] = None,
+        page_size: int = 10000
+    ) -> Iterator[Tuple[List[Record], List[str]]]:
+        """Walk the rows of an entity written at or after ``since`` (every row when None).
+
+        Yields pages of (live records, ids of deleted records), so derived
+        indexes can catch up with writes they missed. Rows written exactly
+        at ``since`` are included again; reapplying them is harmless.
+        """
+        sql = (
+            "SELECT rowid, id, data, version, created_at, updated_at, deleted_at FROM records "
+            "WHERE entity = ? AND rowid > ?"
+        )
+        params: List[Any] = []
+        if since is not None:
+            sql += " AND max(created_at, coalesce(updated_at, ''), coalesce(deleted_at, '')) >= ?"
+            params.append(since)
+        sql += " ORDER BY rowid LIMIT ?"
+
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, [entity, last_rowid, *params, page_size]).fetchall()
+            if not rows:
+                return
+            live = [row for row in rows if row[6] is None]
+            decoded = self._decode_page(entity, [row[2] for row in live])
+            records = [
+                Record(entity_id, entity, data, version, created_at, updated_at)
+                for (_, entity_id, _, version, created_at, updated_at, _), data in zip(live, decoded)
+            ]
+            yield records, [row[1] for row in rows if row[6] is not None]
+            last_rowid = rows[-1][0]
+            if len(rows) < page_size:
+                return
+
+    def _page(self, entity: str, skip: int, limit: int) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, data, version, created_at, updated_at FROM records "
+                "WHERE entity = ? AND deleted_at IS NULL ORDER BY rowid LIMIT ? OFFSET ?",
+                (entity, limit, skip)
+            ).fetchall()
+
+    def lookup(self, entity: str, field: str, value: Any) -> List[Record]:
+        """Find live records whose encrypted ``field`` equals ``value``, through its blind index.
+
+        Only rows whose digest matches are read and decrypted; the decrypted
+        value is compared again to rule out digest collisions.
+        """
+        if self.cipher is None or field not in self.cipher.indexed_fields(entity):
+            raise ValueError(f"{entity}.{field} has no blind index")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.id, r.data, r.version, r.created_at, r.updated_at FROM blind_indexes b "
+                "JOIN records r ON r.entity = b.entity AND r.id = b.id "
+                "WHERE b.entity = ? AND b.field = ? AND b.digest = ? AND r.deleted_at IS NULL",
+                (entity, field, self.cipher.blind_index(entity, field, value))
+            ).fetchall()
+        wanted = normalize_index_value(value)
+        return [
+            record for record in (self._to_record(entity, *row) for row in rows)
+            if normalize_index_value(record.data.get(field)) == wanted
+        ]
+
+    def update(self, entity: str, entity_id: str, data: Dict[str, Any], expected_version: Optional[int] = None) -> Record:
+        """Merge ``data`` into a record, bumping its version.
+
+        With ``expected_version`` the write is a compare-and-set: it only
+        applies if the stored version still matches, otherwise ConflictError
+        carries the current version. No read precedes the write.
+        """
+        sql = (
+            "UPDATE records SET data = json_patch(data, ?), version = version + 1, updated_at = ? "
+            "WHERE entity = ? AND id = ? AND deleted_at IS NULL"
+        )
+        params: List[Any] = [self._payload(entity, data), utcnow(), entity, entity_id]
+        if expected_version is not None:
+            sql += " AND version = ?"
+            params.append(expected_version)
+        sql += " RETURNING data, version, created_at, updated_at"
+        digests = self._blind_indexes(entity, data)
+
+        with self._lock:
+            if digests:
+                self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(sql, params).fetchone()
+                if row is None:
+                    self._raise_write_failure(entity, entity_id)
+                if digests:
+                    self._write_blind_indexes(entity, entity_id, digests)
+                    self._conn.execute("COMMIT")
+            except BaseException:
+                if digests:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return self._to_record(entity, entity_id, *row)
+
+    def delete(self, entity: str, entity_id: str, expected_version: Optional[int] = None) -> Record:
+        """Tombstone a record, optionally only if it is still at ``expected_version``.
+
+        The row stays in place, invisible to reads, until ``purge_tombstones``
+        removes it after the retention window.
+        """
+        sql = (
+            "UPDATE records SET deleted_at = ?, version = version + 1 "
+            "WHERE entity = ? AND id = ? AND deleted_at IS NULL"
+        )
+        params: List[Any] = [utcnow(), entity, entity_id]
+        if expected_version is not None:
+            sql += " AND version = ?"
+            params.append(expected_version)
+        sql += " RETURNING version, deleted_at"
+
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+            if row is None:
+                self._raise_write_failure(entity, entity_id)
+        return Record(entity_id, entity, {}, row[0], deleted_at=row[1])
+
+    def place_order(self, customer_id: str, lines: Dict[str, int], order_id: Optional[str] = None) -> Tuple[Record, List[Record]]:
+        """Create an order and take its stock in one transaction.
+
+        Each line's stock is decremented with a guarded UPDATE, in product id
+        order, so concurrent writers always lock products in the same
+        sequence. A missing customer or product, or short stock on any
+        line, rolls the whole order back. Returns the order and the updated
+        products.
+        """
+        order_id = str(order_id or uuid.uuid4().hex)
+        now = utcnow()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute(
+                    "SELECT 1 FROM records WHERE entity = 'customer' AND id = ? AND deleted_at IS NULL",
+                    (customer_id,)
+                ).fetchone() is None:
+                    raise NotFoundError(f"customer {customer_id} not found")
+
+                products: List[Record] = []
+                total_amount = 0.0
+                for product_id in sorted(lines):
+                    quantity = lines[product_id]
+                    row = self._conn.execute(
+                        "UPDATE records SET data = json_set(data, '$.stock', json_extract(data, '$.stock') - ?), "
+                        "version = version + 1, updated_at = ? "
+                        "WHERE entity = 'product' AND id = ? AND deleted_at IS NULL "
+                        "AND json_extract(data, '$.stock') >= ? "
+                        "RETURNING data, version, created_at, updated_at",
+                        (quantity, now, product_id, quantity)
+                    ).fetchone()
+                    if row is None:
+                        self._raise_stock_failure(product_id, quantity)
+                    product = self._to_record("product", product_id, *row)
+                    total_amount += float(product.data.get("price") or 0) * quantity
+                    products.append(product)
+
+                payload = self._payload("order", {
+                    "order_id": order_id,
+                    "customer_id": customer_id,
+                    "products": lines,
+                    "total_amount": round(total_amount, 2),
+                    # "status" is the store's active/deleted marker; the order's own state lives beside it
+                    "order_status": "placed"
+                })
+                if self._conn.execute(
+                    "INSERT INTO records (entity, id, data, version, created_at) VALUES ('order', ?, ?, 1, ?) "
+                    "ON CONFLICT (entity, id) DO NOTHING RETURNING version",
+                    (order_id, payload, now)
+                ).fetchone() is None:
+                    raise ConflictError(f"order {order_id} already exists")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._to_record("order", order_id, payload, 1, now, None), products
+
+    def _raise_stock_failure(self, product_id: str, quantity: int) -> None:
+        """Explain why a stock decrement matched no row"""
+        row = self._conn.execute(
+            "SELECT json_extract(data, '$.stock') FROM records "
+            "WHERE entity = 'product' AND id = ? AND deleted_at IS NULL",
+            (product_id,)
+        ).fetchone()
+        if row is None:
+            raise NotFoundError(f"product {product_id} not found")
+        raise ConflictError(f"Insufficient stock for product {product_id}: requested {quantity}, available {row[0]}")
+
+    def purge_tombstones(self, deleted_before: str, batch_size: int = 500, archive: bool = True) -> int:
+        """Remove up to ``batch_size`` tombstones deleted before ``deleted_before``.
+
+        Runs as one short transaction so foreground writers wait at most one
+        batch; callers loop until fewer than ``batch_size`` rows come back.
+        Returns the number of rows purged.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rowids = [row[0] for row in self._conn.execute(
+                    "SELECT rowid FROM records WHERE deleted_at IS NOT NULL AND deleted_at < ? LIMIT ?",
+                    (deleted_before, batch_size)
+                )]
+                if rowids:
+                    placeholders = ",".join("?" * len(rowids))
+                    self._conn.execute(
+                        "DELETE FROM blind_indexes WHERE (entity, id) IN "
+                        f"(SELECT entity, id FROM records WHERE rowid IN ({placeholders}))",
+                        rowids
+                    )
+                    if archive:
+                        self._conn.execute(
+                            "INSERT INTO records_archive "
+                            "SELECT entity, id, data, version, created_at, updated_at, deleted_at, ? "
+                            f"FROM records WHERE rowid IN ({placeholders})",
+                            [utcnow(), *rowids]
+                        )
+                    self._conn.execute(f"DELETE FROM records WHERE rowid IN ({placeholders})", rowids)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rowids)
+
+    def _raise_write_failure(self, entity: str, entity_id: str) -> None:
+        """Explain why a conditional write matched no row; only runs on the failure path"""
+        row = self._conn.execute(
+            "SELECT version FROM records WHERE entity = ? AND id = ? AND deleted_at IS NULL",
+            (entity, entity_id)
+        ).fetchone()
+        if row is None:
+            raise NotFoundError(f"{entity} {entity_id} not found")
+        raise ConflictError(f"{entity} {entity_id} has been modified (current version {row[0]})", current_version=row[0])
@@ -0,0 +1,114 @@
+from typing import Any, Deque, Dict, List, Optional, Set
+from collections import deque
+import asyncio
+
+from app.core.database import utcnow
+from app.utils.exceptions import OffsetExpiredError
+
+
+class Subscription:
+    """A consumer's view of the change stream.
+
+    Replayed events are served from ``backlog`` first, then live events from a
+    bounded queue. When the queue overflows the hub evicts the subscription;
+    ``get`` then returns None and ``last_offset`` tells the client where to
+    resume.
+    """
+
+    def __init__(self, entity: Optional[str], backlog: List[Dict[str, Any]], buffer_size: int, last_offset: int):
+        self.entity = entity
+        self.evicted = False
+        self.last_offset = last_offset
+        self._backlog: Deque[Dict[str, Any]] = deque(backlog)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+
+    def _offer(self, event: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _evict(self) -> None:
+        self.evicted = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._backlog.clear()
+        self._queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for the next event; raises asyncio.TimeoutError after ``timeout`` seconds"""
+        if self._backlog:
+            event = self._backlog.popleft()
+        else:
+            event = await asyncio.wait_for(self._queue.get(), timeout)
+        if event is not None:
+            self.last_offset = event["offset"]
+        return event
+
+
+class ChangeEventHub:
+    """In-process fan-out of create/update/delete events.
+
+    Every event gets a monotonically increasing offset and is kept in a ring of
+    the last ``retention`` events so subscribers can resume after a
+    disconnect. Offsets are local to the process: after a restart any offset
+    the hub has not issued yet is reported as expired.
+    """
+
+    def __init__(self, retention: int = 10000, buffer_size: int = 1000):
+        self.buffer_size = buffer_size
+        self._log: Deque[Dict[str, Any]] = deque(maxlen=retention)
+        self._next_offset = 1
+        self._subscribers: Set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event_type: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a change event and offer it to every matching subscriber without blocking"""
+        event = {
+            "offset": self._next_offset,
+            "type": event_type,
+            "entity": record.get("entity"),
+            "id": record.get("id"),
+            "version": record.get("version"),
+            "timestamp": utcnow(),
+            "data": record
+        }
+        self._next_offset += 1
+        self._log.append(event)
+
+        for subscription in list(self._subscribers):
+            if subscription.entity is not None and subscription.entity != event["entity"]:
+                continue
+            if not subscription._offer(event):
+                # Slow consumer: drop it rather than buffer without bound
+                self._subscribers.discard(subscription)
+                subscription._evict()
+        return event
+
+    def subscribe(self, entity: Optional[str] = None, after_offset: Optional[int] = None) -> Subscription:
+        """Subscribe to events, replaying retained events after ``after_offset`` first"""
+        latest = self._next_offset - 1
+        if after_offset is None:
+            backlog: List[Dict[str, Any]] = []
+            after_offset = latest
+        else:
+            oldest = self._log[0]["offset"] if self._log else self._next_offset
+            if after_offset > latest or after_offset < oldest - 1:
+                raise OffsetExpiredError(
+                    f"Offset {after_offset} is not available; retained offsets are {oldest} to {latest}"
+                )
+            backlog = [
+                event for event in self._log
+                if event["offset"] > after_offset and (entity is None or event["entity"] == entity)
+            ]
+
+        subscription = Subscription(entity, backlog, self.buffer_size, after_offset)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
@@ -0,0 +1,307 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import json
+import os
+import re
+import struct
+import threading
+import time
+
+from app.core.crypto import FieldCipher
+from app.core.database import RESERVED_FIELDS
+
+# Entry kinds
+SNAPSHOT = 0
+DIFF = 1
+DELETE = 2
+_KIND_NAMES = {SNAPSHOT: "snapshot", DIFF: "diff", DELETE: "delete"}
+
+# payload length, timestamp (microseconds), version, kind
+_ENTRY = struct.Struct("<IqIB")
+_SEGMENT_PATTERN = re.compile(r"^seg-(\d{8})\.log$")
+
+# Record fields that are rebuilt from entry headers rather than stored in bodies
+_META_FIELDS = {"id", "entity", "status", "version", "updated_at"}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# (timestamp_us, version, kind, segment, offset)
+Entry = Tuple[int, int, int, int, int]
+
+
+def merge_patch(target: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply an RFC 7396 merge patch, matching SQLite's json_patch"""
+    result = dict(target)
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        elif isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge_patch(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def to_timestamp_us(value: Optional[str]) -> int:
+    """Convert an ISO timestamp (naive means UTC) to epoch microseconds"""
+    if value is None:
+        return time.time_ns() // 1000
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    # Integer arithmetic, so a timestamp read back from ``changes`` selects that exact entry
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+def from_timestamp_us(value: int) -> str:
+    return (_EPOCH + value * _MICROSECOND).replace(tzinfo=None).isoformat() + "Z"
+
+
+class ChangeLog:
+    """Append-only per-record change history kept outside the primary table.
+
+    Entries are length-prefixed binary headers followed by a compact JSON
+    ``[entity, id, body]`` payload, appended to fixed-size segment files.
+    Creates and every ``snapshot_interval``-th update store the full record;
+    other updates store only the merge patch that was applied. Point-in-time
+    reads replay the nearest snapshot plus the diffs after it. Sealed segments
+    are merged by ``compact``, which also drops entries older than the
+    retention window that no longer precede a reachable snapshot.
+
+    With a ``cipher``, the encrypted fields of snapshot and diff bodies are
+    sealed as they are in the primary table; compaction copies them as is.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        snapshot_interval: int = 20,
+        segment_bytes: int = 16 * 1024 * 1024,
+        retention_seconds: float = 90 * 24 * 3600,
+        compact_segments: int = 8,
+        cipher: Optional[FieldCipher] = None
+    ):
+        self.directory = directory
+        self.cipher = cipher
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.segment_bytes = segment_bytes
+        self.retention_seconds = retention_seconds
+        self.compact_segments = compact_segments
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._index: Dict[Tuple[str, str], List[Entry]] = {}
+        self._segments: List[int] = []
+        self._active = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"seg-{segment:08d}.log")
+
+    def _load(self) -> None:
+        """Rebuild the in-memory entry index by scanning existing segments"""
+        segments = sorted(
+            int(match.group(1))
+            for match in map(_SEGMENT_PATTERN.match, os.listdir(self.directory))
+            if match
+        )
+        for segment in segments:
+            for key, entry, _ in self._scan(segment):
+                self._index.setdefault(key, []).append(entry)
+        self._segments = segments
+        self._open_segment(segments[-1] if segments else 1)
+
+    def _scan(self, segment: int):
+        """Yield (key, entry, body) for every complete entry in a segment"""
+        with open(self._segment_path(segment), "rb") as f:
+            offset = 0
+            while True:
+                header = f.read(_ENTRY.size)
+                if len(header) < _ENTRY.size:
+                    return
+                length, timestamp, version, kind = _ENTRY.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    # Torn write at the tail of the last segment
+                    return
+                entity, entity_id, body = json.loads(payload)
+                yield (entity, entity_id), (timestamp, version, kind, segment, offset), body
+                offset += _ENTRY.size + length
+
+    def _open_segment(self, segment: int) -> None:
+        if self._active is not None:
+            self._active.close()
+        if segment not in self._segments:
+            self._segments.append(segment)
+        self._active_segment = segment
+        self._active = open(self._segment_path(segment), "ab", buffering=64 * 1024)
+
+    def close(self) -> None:
+        """Flush and close the active segment"""
+        with self._lock:
+            if self._active is not None:
+                self._active.close()
+                self._active = None
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._active is not None:
+                self._active.flush()
+
+    def record_create(self, record: Dict[str, Any]) -> None:
+        """Log a newly created record as a snapshot"""
+        self._append(record["entity"], record["id"], record["version"], SNAPSHOT, self._snapshot_body(record))
+
+    def record_update(self, record: Dict[str, Any], patch: Dict[str, Any]) -> None:
+        """Log an update as the applied patch, or as a snapshot when one is due"""
+        key = (record["entity"], str(record["id"]))
+        with self._lock:
+            entries = self._index.get(key, [])
+            since_snapshot = 0
+            for entry in reversed(entries):
+                if entry[2] == SNAPSHOT:
+                    break
+                since_snapshot += 1
+            if not entries or since_snapshot + 1 >= self.snapshot_interval:
+                self._append(key[0], key[1], record["version"], SNAPSHOT, self._snapshot_body(record))
+            else:
+                # Only what the store applied: it ignores reserved fields in a patch
+                body = {k: v for k, v in patch.items() if k not in RESERVED_FIELDS}
+                self._append(key[0], key[1], record["version"], DIFF, body)
+
+    def record_delete(self, entity: str, entity_id: str, version: int) -> None:
+        """Log a deletion"""
+        self._append(entity, entity_id, version, DELETE, None)
+
+    @staticmethod
+    def _snapshot_body(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in record.items() if k not in _META_FIELDS}
+
+    def _append(self, entity: str, entity_id: str, version: int, kind: int, body: Optional[Dict[str, Any]]) -> None:
+        if body is not None and self.cipher is not None:
+            body = self.cipher.encrypt_data(entity, body)
+        payload = json.dumps([entity, str(entity_id), body], separators=(",", ":")).encode("utf-8")
+        timestamp = time.time_ns() // 1000
+        with self._lock:
+            offset = self._active.tell()
+            if offset and offset + _ENTRY.size + len(payload) > self.segment_bytes:
+                self._open_segment(self._active_segment + 1)
+                offset = 0
+            self._active.write(_ENTRY.pack(len(payload), timestamp, version, kind))
+            self._active.write(payload)
+            self._index.setdefault((entity, str(entity_id)), []).append(
+                (timestamp, version, kind, self._active_segment, offset)
+            )
+
+    def _read_body(self, entry: Entry) -> Optional[Dict[str, Any]]:
+        _, _, _, segment, offset = entry
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            length = _ENTRY.unpack(f.read(_ENTRY.size))[0]
+            entity, _, body = json.loads(f.read(length))
+        if body is not None and self.cipher is not None:
+            self.cipher.decrypt_data(entity, body)
+        return body
+
+    def changes(self, entity: str, entity_id: str) -> List[Dict[str, Any]]:
+        """List every logged change of a record, oldest first"""
+        with self._lock:
+            self._active.flush()
+            return [
+                {
+                    "version": entry[1],
+                    "timestamp": from_timestamp_us(entry[0]),
+                    "type": _KIND_NAMES[entry[2]],
+                    "changes": self._read_body(entry)
+                }
+                for entry in self._index.get((entity, str(entity_id)), [])
+            ]
+
+    def as_of(self, entity: str, entity_id: str, at: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Reconstruct a record as it was at ``at`` (ISO timestamp), or None if it did not exist"""
+        cutoff = to_timestamp_us(at)
+        with self._lock:
+            self._active.flush()
+            entries = [entry for entry in self._index.get((entity, str(entity_id)), []) if entry[0] <= cutoff]
+            start = None
+            for position in range(len(entries) - 1, -1, -1):
+                if entries[position][2] == SNAPSHOT:
+                    start = position
+                    break
+            if start is None:
+                return None
+
+            state: Optional[Dict[str, Any]] = None
+            for entry in entries[start:]:
+                kind = entry[2]
+                if kind == DELETE:
+                    state = None
+                    continue
+                body = self._read_body(entry)
+                state = body if kind == SNAPSHOT else merge_patch(state or {}, body)
+                state["version"] = entry[1]
+                state["updated_at"] = from_timestamp_us(entry[0]) if entry[1] > 1 else None
+
+        if state is None:
+            return None
+        return {"id": str(entity_id), "entity": entity, **state}
+
+    def needs_compaction(self) -> bool:
+        return len(self._segments) - 1 >= self.compact_segments
+
+    def compact(self) -> None:
+        """Merge sealed segments into one and drop entries past the retention window.
+
+        Only sealed segments are rewritten, so appends to the active segment
+        carry on while the merged file is built; the lock is held just for the
+        final swap.
+        """
+        if not self._compacting.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                sealed = [segment for segment in self._segments if segment != self._active_segment]
+            if not sealed:
+                return
+
+            cutoff = time.time_ns() // 1000 - int(self.retention_seconds * 1_000_000)
+            grouped: Dict[Tuple[str, str], List[Tuple[Entry, Any]]] = {}
+            for segment in sealed:
+                for key, entry, body in self._scan(segment):
+                    grouped.setdefault(key, []).append((entry, body))
+
+            target = sealed[0]
+            tmp_path = f"{self._segment_path(target)}.tmp"
+            merged: Dict[Tuple[str, str], List[Entry]] = {}
+            with open(tmp_path, "wb") as f:
+                for key, items in grouped.items():
+                    keep_from = 0
+                    for position, (entry, _) in enumerate(items):
+                        if entry[0] > cutoff:
+                            break
+                        if entry[2] == SNAPSHOT:
+                            keep_from = position
+                    for entry, body in items[keep_from:]:
+                        timestamp, version, kind, _, _ = entry
+                        payload = json.dumps([key[0], key[1], body], separators=(",", ":")).encode("utf-8")
+                        offset = f.tell()
+                        f.write(_ENTRY.pack(len(payload), timestamp, version, kind))
+                        f.write(payload)
+                        merged.setdefault(key, []).append((timestamp, version, kind, target, offset))
+
+            sealed_set = set(sealed)
+            with self._lock:
+                os.replace(tmp_path, self._segment_path(target))
+                for segment in sealed[1:]:
+                    os.remove(self._segment_path(segment))
+                self._segments = [segment for segment in self._segments if segment not in sealed_set or segment == target]
+                for key in set(self._index) | set(merged):
+                    live = [entry for entry in self._index.get(key, []) if entry[3] not in sealed_set]
+                    entries = merged.get(key, []) + live
+                    if entries:
+                        self._index[key] = entries
+                    else:
+                        self._index.pop(key, None)
+        finally:
+            self._compacting.release()
@@ -0,0 +1,122 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from cryptography.exceptions import InvalidTag
+
+from app.core.crypto import FieldCipher
+from app.utils.records import json_default
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    result TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_expiry ON idempotency_keys (expires_at);
+"""
+
+
+def request_fingerprint(request: Dict[str, Any]) -> str:
+    """Hash a request so a reused key can be matched against the request it was first used with"""
+    payload = {k: v for k, v in request.items() if k != "idempotency_key"}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """TTL store of request results keyed by Idempotency-Key.
+
+    The newest ``max_entries`` results are kept in an in-memory LRU; every
+    result is also written to a local SQLite file so replays survive restarts.
+    Results are stored as JSON text; with a ``cipher`` the SQLite copy is
+    sealed, bound to its key, since results carry record data.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(
+        self,
+        path: Optional[str],
+        ttl_seconds: float = 24 * 3600,
+        max_entries: int = 10000,
+        cipher: Optional[FieldCipher] = None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.cipher = cipher
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        """Return (fingerprint, result) for a live key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT expires_at, fingerprint, result FROM idempotency_keys WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                result = self._open(key, row[2]) if row is not None else None
+                if result is not None:
+                    entry = (row[0], row[1], result)
+                    self._remember(key, entry)
+            if entry is None:
+                return None
+            if entry[0] < now:
+                self._memory.pop(key, None)
+                return None
+            self._memory.move_to_end(key)
+        return entry[1], json.loads(entry[2])
+
+    def put(self, key: str, fingerprint: str, result: Any) -> None:
+        """Store the result of the first execution of a key"""
+        entry = (time.time() + self.ttl_seconds, fingerprint, json.dumps(result, default=json_default))
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                stored = entry[2]
+                if self.cipher is not None:
+                    stored = self.cipher.seal_bytes(f"idempotency\0{key}", stored.encode("utf-8"))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, result, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, entry[1], stored, entry[0])
+                )
+                self._writes += 1
+                if self._writes % self.PURGE_EVERY == 0:
+                    self._conn.execute("DELETE FROM idempotency_keys WHERE expires_at < ?", (time.time(),))
+
+    def _open(self, key: str, stored: Any) -> Optional[str]:
+        """Result text of a stored row; a sealed row this cipher cannot open counts as missing"""
+        if not isinstance(stored, bytes):
+            return stored
+        if self.cipher is None:
+            return None
+        try:
+            return self.cipher.open_bytes(f"idempotency\0{key}", stored).decode("utf-8")
+        except InvalidTag:
+            return None
+
+    def _remember(self, key: str, entry: Tuple[float, str, str]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,151 @@
+from typing import Any, Dict, List, Optional, TextIO
+import atexit
+import itertools
+import queue
+import sys
+import threading
+import time
+from loguru import logger
+
+from app.core.config import Settings
+
+
+class Capped:
+    """Defers ``str()`` of a logged payload until a sink formats it, truncated to ``limit`` characters"""
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = str(self.value)
+        if self.limit and len(text) > self.limit:
+            return f"{text[:self.limit]}... [{len(text) - self.limit} more chars]"
+        return text
+
+    __repr__ = __str__
+
+
+class BackgroundWriter:
+    """File-like loguru sink that hands formatted lines to a daemon thread.
+
+    Callers pay for formatting and a queue put; the writes and flushes
+    happen on the writer thread, in batches when lines arrive faster than
+    the stream takes them. Unlike loguru's ``enqueue``, records are not
+    pickled.
+    """
+
+    BATCH_DELAY_SECONDS = 0.005
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._drain, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, message: str) -> None:
+        self._queue.put(message)
+
+    def _drain(self) -> None:
+        while True:
+            batch: List[Optional[str]] = [self._queue.get()]
+            # Let a burst accumulate so a busy caller is not interrupted once per line
+            time.sleep(self.BATCH_DELAY_SECONDS)
+            while len(batch) < 4096:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.stream.write("".join(line for line in batch if line is not None))
+            self.stream.flush()
+            if None in batch:
+                return
+
+    def close(self) -> None:
+        """Write out every queued line and stop the thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+class OperationSampler:
+    """Per-operation log sampling.
+
+    A rate ``r`` keeps every ``round(1 / r)``-th call of an operation,
+    starting with the first; 1 keeps all of them and 0 none. Counting
+    instead of drawing random numbers keeps the check to a dict lookup and
+    a counter step.
+    """
+
+    def __init__(self, default_rate: float = 1.0, rates: Optional[Dict[str, float]] = None):
+        self._default_interval = self._interval(default_rate)
+        self._intervals = {operation: self._interval(rate) for operation, rate in (rates or {}).items()}
+        self._counters: Dict[str, "itertools.count[int]"] = {}
+
+    @staticmethod
+    def _interval(rate: float) -> int:
+        return 0 if rate <= 0 else max(1, round(1 / rate))
+
+    def should_log(self, operation: str) -> bool:
+        interval = self._intervals.get(operation, self._default_interval)
+        if interval <= 1:
+            return interval == 1
+        counter = self._counters.get(operation)
+        if counter is None:
+            counter = self._counters.setdefault(operation, itertools.count())
+        return next(counter) % interval == 0
+
+
+_writer: Optional[BackgroundWriter] = None
+_settings = Settings()
+_sampler = OperationSampler(_settings.LOG_SAMPLE_RATE, _settings.LOG_SAMPLE_RATES)
+_max_payload_chars = _settings.LOG_MAX_PAYLOAD_CHARS
+
+
+def configure_logging(settings: Optional[Settings] = None, sink: TextIO = sys.stderr) -> None:
+    """Replace loguru's default sink with the sinks, sampling and caps from Settings.
+
+    With LOG_ENQUEUE, ``sink`` is written by a BackgroundWriter thread and
+    the rotating LOG_FILE sink uses loguru's own queue, so the calling
+    thread never waits on log I/O. Call ``stop_logging`` at shutdown to
+    flush.
+    """
+    global _writer, _sampler, _max_payload_chars
+    settings = settings or Settings()
+    options = {
+        "level": settings.LOG_LEVEL,
+        "serialize": settings.LOG_SERIALIZE,
+        "backtrace": False,
+        "diagnose": False
+    }
+    logger.remove()
+    stop_logging()
+    if settings.LOG_ENQUEUE:
+        _writer = BackgroundWriter(sink)
+        sink = _writer
+    logger.add(sink, **options)
+    if settings.LOG_FILE:
+        logger.add(settings.LOG_FILE, rotation=settings.LOG_ROTATION, enqueue=settings.LOG_ENQUEUE, **options)
+    _sampler = OperationSampler(settings.LOG_SAMPLE_RATE, settings.LOG_SAMPLE_RATES)
+    _max_payload_chars = settings.LOG_MAX_PAYLOAD_CHARS
+
+
+def stop_logging() -> None:
+    """Flush and stop the background writer, if one is running"""
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def should_log(operation: str) -> bool:
+    """Whether this call of ``operation`` is sampled for logging"""
+    return _sampler.should_log(operation)
+
+
+def capped(value: Any) -> Capped:
+    """Wrap a payload so it is rendered lazily and cut to LOG_MAX_PAYLOAD_CHARS"""
+    return Capped(value, _max_payload_chars)
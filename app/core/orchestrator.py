@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 import asyncio
 from loguru import logger
@@ -9,24 +9,74 @@ from app.agents.query_agent import DataQueryAgent
 from app.agents.update_agent import DataUpdateAgent
 from app.agents.security_agent import DataSecurityAgent
 from app.agents.analytics_agent import DataAnalyticsAgent
-from app.utils.exceptions import OrchestrationError
+from app.core.config import Settings
+from app.core.crypto import FieldCipher, load_cipher
+from app.core.database import RecordStore
+from app.core.events import ChangeEventHub
+from app.core.history import ChangeLog
+from app.core.idempotency import IdempotencyStore, request_fingerprint
+from app.core.log import capped
+from app.utils.exceptions import ConflictError, NotFoundError, OrchestrationError
+from app.utils.trigram_index import TrigramIndexSet
+from app.utils.validation import WORKFLOW_MANAGED_ENTITIES, is_entity_name
 
 class OrchestrationAgent:
     def __init__(self):
         self.agents = {}
         self.workflow_history = []
         self.active_workflows = {}
+        self.settings = Settings()
+        self.store: Optional[RecordStore] = None
+        self.cipher: Optional[FieldCipher] = None
+        self.history: Optional[ChangeLog] = None
+        self.idempotency: Optional[IdempotencyStore] = None
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.text_indexes: Optional[TrigramIndexSet] = None
+        self.events = ChangeEventHub(self.settings.CDC_RETENTION_EVENTS, self.settings.CDC_SUBSCRIBER_BUFFER)
 
     async def initialize_agents(self) -> None:
         """Initialize all agents"""
         try:
+            self.cipher = load_cipher(self.settings)
+            self.store = RecordStore(self.settings.DATABASE_URL, cipher=self.cipher)
+            self.text_indexes = TrigramIndexSet(
+                self.settings.TEXT_INDEX_PATH,
+                self.settings.TEXT_SEARCH_FIELDS,
+                cipher=self.cipher
+            )
+            self.idempotency = IdempotencyStore(
+                self.settings.IDEMPOTENCY_DB_PATH,
+                ttl_seconds=self.settings.IDEMPOTENCY_TTL_SECONDS,
+                max_entries=self.settings.IDEMPOTENCY_MAX_ENTRIES,
+                cipher=self.cipher
+            )
+            self.history = ChangeLog(
+                self.settings.HISTORY_PATH,
+                snapshot_interval=self.settings.HISTORY_SNAPSHOT_INTERVAL,
+                segment_bytes=self.settings.HISTORY_SEGMENT_BYTES,
+                retention_seconds=self.settings.HISTORY_RETENTION_DAYS * 24 * 3600,
+                compact_segments=self.settings.HISTORY_COMPACT_SEGMENTS,
+                cipher=self.cipher
+            )
+
             # Initialize agents with their respective API keys
             self.agents = {
-                "ingestion": DataIngestionAgent(os.getenv("OPENAI_API_KEY")),
-                "query": DataQueryAgent(os.getenv("OPENAI_API_KEY")),
-                "update": DataUpdateAgent(os.getenv("GROQ_API_KEY")),
-                "security": DataSecurityAgent(os.getenv("JWT_SECRET_KEY")),
-                "analytics": DataAnalyticsAgent(os.getenv("COHERE_API_KEY"))
+                "ingestion": DataIngestionAgent(
+                    os.getenv("OPENAI_API_KEY"),
+                    store=self.store,
+                    text_indexes=self.text_indexes,
+                    history=self.history
+                ),
+                "query": DataQueryAgent(os.getenv("OPENAI_API_KEY"), store=self.store, text_indexes=self.text_indexes),
+                "update": DataUpdateAgent(
+                    os.getenv("GROQ_API_KEY"),
+                    store=self.store,
+                    text_indexes=self.text_indexes,
+                    history=self.history
+                ),
+                "security": DataSecurityAgent(os.getenv("JWT_SECRET_KEY"), cipher=self.cipher),
+                "analytics": DataAnalyticsAgent(os.getenv("COHERE_API_KEY"), store=self.store)
             }
 
             # Initialize each agent
@@ -45,6 +95,9 @@ class OrchestrationAgent:
     async def shutdown_agents(self) -> None:
         """Shutdown all agents"""
         try:
+            for task in list(self._background):
+                task.cancel()
+
             # Cleanup tasks for each agent
             cleanup_tasks = []
             for name, agent in self.agents.items():
@@ -52,6 +105,16 @@ class OrchestrationAgent:
                 cleanup_tasks.append(agent.cleanup())
             
             await asyncio.gather(*cleanup_tasks)
+            if self.text_indexes is not None:
+                await asyncio.to_thread(self.text_indexes.save_all, self.store.change_mark if self.store else None)
+            if self.store is not None:
+                self.store.close()
+            if self.cipher is not None:
+                self.cipher.close()
+            if self.history is not None:
+                self.history.close()
+            if self.idempotency is not None:
+                self.idempotency.close()
             logger.info("All agents shut down successfully")
         
         except Exception as e:
@@ -59,30 +122,115 @@ class OrchestrationAgent:
             raise OrchestrationError(f"Failed to shut down agents: {str(e)}")
 
     async def process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a request using the appropriate agents"""
+        """Process a request, honouring its `idempotency_key` if one is given.
+
+        The first request with a key runs normally and its result is stored.
+        Replays return the stored result without running any agent, and
+        duplicates that arrive while the first is still running wait for its
+        outcome. Failures are not stored, so a failed request can be retried
+        with the same key.
+        """
+        key = request.get("idempotency_key")
+        if not key or self.idempotency is None:
+            return await self._execute_request(request)
+
+        fingerprint = request_fingerprint(request)
+        # Claim the key before the first await, so a duplicate arriving while
+        # the stored-result lookup runs waits instead of executing again
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            if inflight[0] != fingerprint:
+                raise ConflictError(f"Idempotency-Key {key} is in use by a different request")
+            return await asyncio.shield(inflight[1])
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the outcome as retrieved even when no duplicate ever waits on it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = (fingerprint, future)
         try:
-            workflow_id = f"wf_{len(self.workflow_history) + 1}"
-            workflow = {
-                "workflow_id": workflow_id,
-                "start_time": datetime.utcnow().isoformat(),
-                "request": request,
-                "status": "in_progress"
-            }
+            stored = await asyncio.to_thread(self.idempotency.get, key)
+            if stored is not None:
+                if stored[0] != fingerprint:
+                    raise ConflictError(f"Idempotency-Key {key} was already used for a different request")
+                result = stored[1]
+            else:
+                result = await self._execute_request(request)
+                await asyncio.to_thread(self.idempotency.put, key, fingerprint, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _execute_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Process a request using the appropriate agents.
+
+        With `background` set the request runs as a background task and only
+        its workflow id is returned; poll get_workflow_status for the result.
+        """
+        workflow_id = f"wf_{len(self.workflow_history) + 1}"
+        workflow = {
+            "workflow_id": workflow_id,
+            "start_time": datetime.utcnow().isoformat(),
+            "request": request,
+            "status": "in_progress"
+        }
+
+        self.active_workflows[workflow_id] = workflow
+        self.workflow_history.append(workflow)
 
-            self.active_workflows[workflow_id] = workflow
-            self.workflow_history.append(workflow)
+        if request.get("background"):
+            task = asyncio.create_task(self._run_workflow(workflow, request))
+            self._background.add(task)
+            task.add_done_callback(self._forget_background)
+            return {"workflow_id": workflow_id, "status": "in_progress"}
+        return await self._run_workflow(workflow, request)
 
+    def _forget_background(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        # The outcome is recorded on the workflow; mark the exception as retrieved
+        if not task.cancelled():
+            task.exception()
+
+    async def _run_workflow(self, workflow: Dict[str, Any], request: Dict[str, Any]) -> Any:
+        """Dispatch a request to its handler and record the outcome on its workflow"""
+        try:
             operation = request.get("operation")
+            if "entity" in request and not is_entity_name(request["entity"]):
+                raise OrchestrationError(f"Invalid entity name: {request['entity']!r}")
+            if operation in ("create", "update", "delete") and request.get("entity") in WORKFLOW_MANAGED_ENTITIES:
+                raise OrchestrationError(f"{request['entity']} records can only be changed by their workflow")
             if operation == "create":
                 result = await self._handle_create(request)
+            elif operation == "place_order":
+                result = await self._handle_place_order(request)
             elif operation == "read":
                 result = await self._handle_read(request)
+            elif operation in ("version", "page_tag"):
+                result = await self._handle_conditional(request)
             elif operation == "update":
                 result = await self._handle_update(request)
             elif operation == "delete":
                 result = await self._handle_delete(request)
             elif operation == "list":
                 result = await self._handle_list(request)
+            elif operation == "export":
+                result = await self._handle_export(request)
+            elif operation == "history":
+                result = await self._handle_history(request)
+            elif operation == "lookup":
+                result = await self._handle_lookup(request)
+            elif operation == "search":
+                result = await self._handle_search(request)
+            elif operation == "semantic_search":
+                result = await self._handle_semantic_search(request)
+            elif operation == "analytics":
+                result = await self._handle_analytics(request)
             else:
                 raise OrchestrationError(f"Unknown operation: {operation}")
 
@@ -93,21 +241,36 @@ class OrchestrationAgent:
             return result
 
         except Exception as e:
-            if workflow_id in self.active_workflows:
-                workflow = self.active_workflows[workflow_id]
-                workflow["status"] = "failed"
-                workflow["error"] = str(e)
-                workflow["end_time"] = datetime.utcnow().isoformat()
+            workflow["status"] = "failed"
+            workflow["error"] = str(e)
+            workflow["end_time"] = datetime.utcnow().isoformat()
 
-            logger.error(f"Error processing request: {str(e)}")
+            if isinstance(e, (ConflictError, NotFoundError)):
+                raise
+            logger.error("Error processing request: {error}", error=capped(e))
             raise OrchestrationError(f"Failed to process request: {str(e)}")
 
     async def _handle_create(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Handle create operation"""
         result = await self.agents["ingestion"].process(request)
         await self.agents["analytics"].process({"operation": "log_creation", "data": result})
+        await self._index_record(result)
+        self.events.publish("created", result)
         return result
 
+    async def _handle_place_order(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle place_order operation: the order and its stock changes commit together"""
+        result = await self.agents["ingestion"].process(request)
+        order = result["order"]
+        await self.agents["analytics"].process({"operation": "log_creation", "data": order})
+        await self._index_record(order)
+        self.events.publish("created", order)
+        for product in result["products"]:
+            await self.agents["analytics"].process({"operation": "log_update", "data": product})
+            await self._index_record(product)
+            self.events.publish("updated", product)
+        return order
+
     async def _handle_read(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Handle read operation"""
         return await self.agents["query"].process(request)
@@ -116,18 +279,62 @@ class OrchestrationAgent:
         """Handle update operation"""
         result = await self.agents["update"].process(request)
         await self.agents["analytics"].process({"operation": "log_update", "data": result})
+        await self._index_record(result)
+        self.events.publish("updated", result)
         return result
 
     async def _handle_delete(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Handle delete operation"""
         result = await self.agents["update"].process({"operation": "delete", **request})
         await self.agents["analytics"].process({"operation": "log_deletion", "data": result})
+        await self.agents["query"].process({
+            "operation": "unindex",
+            "entity": result["entity"],
+            "ids": [result["id"]]
+        })
+        self.events.publish("deleted", result)
         return result
 
+    async def _handle_conditional(self, request: Dict[str, Any]) -> Any:
+        """Handle the cheap version/page_tag lookups behind conditional GETs"""
+        return await self.agents["query"].process(request)
+
     async def _handle_list(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Handle list operation"""
         return await self.agents["query"].process({"operation": "list", **request})
 
+    async def _handle_export(self, request: Dict[str, Any]) -> Any:
+        """Handle export operation"""
+        return await self.agents["query"].process(request)
+
+    async def _handle_history(self, request: Dict[str, Any]) -> Any:
+        """Handle history operation"""
+        return await self.agents["update"].process(request)
+
+    async def _handle_lookup(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Handle blind-index lookup operation"""
+        return await self.agents["query"].process(request)
+
+    async def _handle_search(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Handle full-text search operation"""
+        return await self.agents["query"].process(request)
+
+    async def _handle_semantic_search(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Handle semantic search operation"""
+        return await self.agents["query"].process(request)
+
+    async def _handle_analytics(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle analytics report operation"""
+        return await self.agents["analytics"].process({"operation": "analytics", "config": request.get("config", {})})
+
+    async def _index_record(self, record: Dict[str, Any]) -> None:
+        """Refresh a record's embedding in the query agent's vector index"""
+        await self.agents["query"].process({
+            "operation": "index",
+            "entity": record["entity"],
+            "records": [record]
+        })
+
     async def get_workflow_status(self, workflow_id: str) -> Dict[str, Any]:
         """Get the status of a specific workflow"""
         workflow = self.active_workflows.get(workflow_id)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 class BaseError(Exception):
     """Base error class for all custom exceptions"""
     pass
@@ -6,6 +8,10 @@ class ValidationError(BaseError):
     """Raised when data validation fails"""
     pass
 
+class IngestionError(BaseError):
+    """Raised when ingestion processing fails"""
+    pass
+
 class QueryError(BaseError):
     """Raised when query processing fails"""
     pass
@@ -25,3 +31,17 @@ class AnalyticsError(BaseError):
 class OrchestrationError(BaseError):
     """Raised when orchestration fails"""
     pass
+
+class NotFoundError(BaseError):
+    """Raised when a requested record does not exist"""
+    pass
+
+class ConflictError(BaseError):
+    """Raised when a write conflicts with the current state of a record"""
+    def __init__(self, message: str, current_version: Optional[int] = None):
+        super().__init__(message)
+        self.current_version = current_version
+
+class OffsetExpiredError(BaseError):
+    """Raised when a change stream cannot resume from the requested offset"""
+    pass
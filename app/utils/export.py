@@ -0,0 +1,239 @@
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Type, Union, get_args, get_origin
+import asyncio
+import csv
+import io
+import time
+import orjson
+from loguru import logger
+from pydantic import BaseModel
+
+from app.utils.records import ColumnarPage
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Columns every export starts and ends with, around the entity's data fields
+LEADING_COLUMNS = ["id"]
+TRAILING_COLUMNS = ["version", "created_at", "updated_at"]
+
+
+def page_columns(page: ColumnarPage, fields: List[str]) -> List[List[Any]]:
+    """Columns of a page in ``fields`` order; fields absent from the page come out as None"""
+    return [list(page.columns[field]) if field in page.columns else [None] * len(page) for field in fields]
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode("utf-8")
+    return value
+
+
+def encode_csv(pages: Iterable[ColumnarPage], fields: List[str], kinds: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+    """Encode pages as CSV: the header, then one chunk of bytes per page"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+    for page in pages:
+        columns = page_columns(page, fields)
+        writer.writerows(zip(*([_csv_value(value) for value in column] for column in columns)))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def encode_ndjson(pages: Iterable[ColumnarPage], fields: List[str], kinds: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+    """Encode pages as newline-delimited JSON objects"""
+    for page in pages:
+        columns = page_columns(page, fields)
+        yield b"".join(orjson.dumps(dict(zip(fields, row))) + b"\n" for row in zip(*columns))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last ``drain``"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# Parquet column kinds by Python annotation; anything else is stored as JSON text
+_COLUMN_KINDS = {str: "string", int: "int64", float: "float64", bool: "bool"}
+
+# Kinds of the bookkeeping columns, which no entity schema declares
+RECORD_COLUMN_KINDS = {"id": "string", "version": "int64", "created_at": "string", "updated_at": "string"}
+
+
+def column_kinds(schema: Optional[Type[BaseModel]]) -> Dict[str, str]:
+    """Parquet column kind of every field of an entity schema, plus the record columns"""
+    kinds = dict(RECORD_COLUMN_KINDS)
+    for name, field in (schema.model_fields.items() if schema else ()):
+        if name in kinds:
+            continue
+        annotation = field.annotation
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if get_origin(annotation) is Union and len(args) == 1:
+            annotation = args[0]
+        kinds[name] = _COLUMN_KINDS.get(annotation, "json")
+    return kinds
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return orjson.dumps(value, default=str).decode("utf-8")
+
+
+def _int(value: Any) -> int:
+    if isinstance(value, bool):
+        raise TypeError("bool is not an integer")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value} is not an integer")
+    return int(value)
+
+
+def _float(value: Any) -> float:
+    if isinstance(value, bool):
+        raise TypeError("bool is not a number")
+    return float(value)
+
+
+def _bool(value: Any) -> bool:
+    if not isinstance(value, bool):
+        raise TypeError(f"{value!r} is not a boolean")
+    return value
+
+
+# Converters from stored values to each column kind's Python type
+_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "string": _text, "json": _text, "int64": _int, "float64": _float, "bool": _bool
+}
+
+
+def encode_parquet(
+    pages: Iterable[ColumnarPage],
+    fields: List[str],
+    kinds: Optional[Dict[str, str]] = None
+) -> Iterator[bytes]:
+    """Encode pages as Parquet, one row group per page.
+
+    The schema is fixed up front from ``kinds`` (see ``column_kinds``);
+    fields without a kind are stored as text. Nested values are stored as
+    JSON text, and values that do not convert to their column's type are
+    written as null and counted in a warning rather than failing the
+    stream. Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    kinds = {field: (kinds or {}).get(field, "json") for field in fields}
+    schema = pa.schema([pa.field(field, pa.type_for_alias("string" if kind == "json" else kind)) for field, kind in kinds.items()])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    mismatches: Dict[str, int] = {}
+    try:
+        for page in pages:
+            data = {}
+            for field, column in zip(fields, page_columns(page, fields)):
+                convert = _CONVERTERS[kinds[field]]
+                values = []
+                for value in column:
+                    try:
+                        values.append(None if value is None else convert(value))
+                    except (TypeError, ValueError):
+                        mismatches[field] = mismatches.get(field, 0) + 1
+                        values.append(None)
+                data[field] = values
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+        if mismatches:
+            logger.warning("Parquet export wrote nulls for values of the wrong type: {mismatches}", mismatches=mismatches)
+    yield sink.drain()
+
+
+ENCODERS: Dict[str, Callable[..., Iterator[bytes]]] = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+    "parquet": encode_parquet
+}
+
+
+class ExportStream:
+    """Lazily encoded export of an entity.
+
+    Pages are fetched and encoded one at a time in a worker thread, so memory
+    is bounded by one page whatever the table size. Iterate it with
+    ``async for``; throughput is logged when the stream is exhausted.
+    """
+
+    def __init__(
+        self,
+        entity: str,
+        export_format: str,
+        fields: List[str],
+        pages: Iterator[ColumnarPage],
+        kinds: Optional[Dict[str, str]] = None
+    ):
+        self.entity = entity
+        self.format = export_format
+        self.fields = fields
+        self.kinds = kinds
+        self.media_type = EXPORT_FORMATS[export_format]
+        self.filename = f"{entity}.{export_format}"
+        self.rows = 0
+        self.bytes = 0
+        self._pages = pages
+
+    def __str__(self) -> str:
+        return f"{self.format} export of {self.entity}: {self.rows} rows, {self.bytes} bytes"
+
+    def _counted(self, pages: Iterator[ColumnarPage]) -> Iterator[ColumnarPage]:
+        for page in pages:
+            self.rows += len(page)
+            yield page
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        chunks = ENCODERS[self.format](self._counted(self._pages), self.fields, self.kinds)
+        started = time.perf_counter()
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            if chunk:
+                self.bytes += len(chunk)
+                yield chunk
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        logger.info(
+            f"Exported {self.rows} {self.entity} rows as {self.format} in {elapsed:.2f}s "
+            f"({self.rows / elapsed:.0f} rows/s, {self.bytes / elapsed / 1e6:.1f} MB/s)"
+        )
+
+
+def export_fields(schema_fields: Optional[List[str]], fields: Optional[List[str]]) -> List[str]:
+    """Resolve the projection of an export: the requested fields, or every known field"""
+    if fields:
+        return list(fields)
+    return LEADING_COLUMNS + list(schema_fields or []) + TRAILING_COLUMNS
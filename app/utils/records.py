@@ -0,0 +1,161 @@
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+import orjson
+
+# Fields stored on the record itself rather than in its data payload
+RECORD_FIELDS = ("id", "entity", "version", "created_at", "updated_at", "deleted_at")
+
+
+class Record(Mapping):
+    """Compact in-process representation of a stored record.
+
+    Bookkeeping columns live in slots and only client fields go in ``data``,
+    so a page of records does not repeat a full dict per row. It reads like
+    the wire dict (``record["name"]``, ``record.get("email")``) for the agents
+    and indexes that consume it; ``to_dict`` builds the wire format at the
+    API edge.
+    """
+
+    __slots__ = RECORD_FIELDS + ("data",)
+
+    def __init__(
+        self,
+        id: str,
+        entity: str,
+        data: Dict[str, Any],
+        version: int,
+        created_at: Optional[str] = None,
+        updated_at: Optional[str] = None,
+        deleted_at: Optional[str] = None
+    ):
+        self.id = id
+        self.entity = entity
+        self.data = data
+        self.version = version
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.deleted_at = deleted_at
+
+    @property
+    def status(self) -> str:
+        return "deleted" if self.deleted_at else "active"
+
+    def __getitem__(self, key: str) -> Any:
+        if key in RECORD_FIELDS:
+            return getattr(self, key)
+        if key == "status":
+            return self.status
+        return self.data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.to_dict())
+
+    def __len__(self) -> int:
+        return len(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"Record({self.entity}:{self.id} v{self.version})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Build the wire format of the record"""
+        if self.deleted_at:
+            return {
+                "id": self.id,
+                "entity": self.entity,
+                "version": self.version,
+                "deleted_at": self.deleted_at,
+                "status": "deleted"
+            }
+        return {
+            "id": self.id,
+            "entity": self.entity,
+            **self.data,
+            "version": self.version,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "status": "active"
+        }
+
+
+class ColumnarPage:
+    """A page of records stored column-wise: one list (or int array) per field.
+
+    Meant for large list and export paths, where per-row dicts dominate
+    memory. Data fields missing from a row are stored as None.
+    """
+
+    __slots__ = ("entity", "columns", "length")
+
+    def __init__(self, entity: str):
+        self.entity = entity
+        self.length = 0
+        self.columns: Dict[str, Any] = {
+            "id": [],
+            "version": array("q"),
+            "created_at": [],
+            "updated_at": []
+        }
+
+    def __len__(self) -> int:
+        return self.length
+
+    def append(self, entity_id: str, data: Dict[str, Any], version: int, created_at: str, updated_at: Optional[str]) -> None:
+        columns = self.columns
+        columns["id"].append(entity_id)
+        columns["version"].append(version)
+        columns["created_at"].append(created_at)
+        columns["updated_at"].append(updated_at)
+        for field, value in data.items():
+            column = columns.get(field)
+            if column is None:
+                column = columns[field] = [None] * self.length
+            column.append(value)
+        self.length += 1
+        for column in columns.values():
+            if len(column) < self.length:
+                column.append(None)
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """Build the wire format: one dict per row"""
+        meta = {"id", "version", "created_at", "updated_at"}
+        data_columns = [(field, column) for field, column in self.columns.items() if field not in meta]
+        columns = self.columns
+        return [
+            {
+                "id": columns["id"][i],
+                "entity": self.entity,
+                **{field: column[i] for field, column in data_columns if column[i] is not None},
+                "version": columns["version"][i],
+                "created_at": columns["created_at"][i],
+                "updated_at": columns["updated_at"][i],
+                "status": "active"
+            }
+            for i in range(self.length)
+        ]
+
+
+def json_default(value: Any) -> Any:
+    """``default`` hook for json/orjson: encodes records, falls back to ``str`` like ``default=str``"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, ColumnarPage):
+        return value.to_rows()
+    return str(value)
+
+
+def to_wire(value: Any) -> Any:
+    """Convert agent results into plain JSON-compatible values at the API edge"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, ColumnarPage):
+        return value.to_rows()
+    if isinstance(value, (bytes, bytearray)):
+        return orjson.loads(value)
+    if isinstance(value, dict):
+        return {key: to_wire(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_wire(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
@@ -0,0 +1,113 @@
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import json
+import sqlite3
+import pandas as pd
+
+# Look-back window of each time range, and the timestamp prefix activity is bucketed by
+TIME_RANGES = {
+    "daily": (timedelta(days=1), 13),
+    "weekly": (timedelta(days=7), 10),
+    "monthly": (timedelta(days=30), 10)
+}
+REPORT_TYPES = ("summary", "activity")
+
+_METRICS = ["total_records", "active_records", "deleted_records", "creations", "updates", "deletions"]
+
+
+def normalize_report_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply defaults and drop empty keys so equivalent configs compare equal"""
+    normalized = {key: value for key, value in (config or {}).items() if value is not None}
+    normalized.setdefault("type", "summary")
+    normalized.setdefault("time_range", "daily")
+    if normalized["type"] not in REPORT_TYPES:
+        raise ValueError(f"Unknown report type: {normalized['type']}")
+    if normalized["time_range"] not in TIME_RANGES:
+        raise ValueError(f"Unknown time range: {normalized['time_range']}")
+    return normalized
+
+
+def report_cache_key(config: Dict[str, Any]) -> str:
+    """Stable key of a normalized report config"""
+    return json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def generate_report(database_path: str, config: Dict[str, Any], chunk_size: int = 100000) -> Dict[str, Any]:
+    """Build an analytics report from the records table.
+
+    Runs in a worker process, so it opens its own read-only connection and
+    returns plain data. Rows are aggregated ``chunk_size`` at a time.
+    Timestamps are compared as ISO strings, which order like the times
+    they encode.
+    """
+    window, bucket_width = TIME_RANGES[config["time_range"]]
+    since = (datetime.utcnow() - window).isoformat() + "Z"
+    sql = "SELECT entity, created_at, updated_at, deleted_at FROM records"
+    params = []
+    if config.get("entity"):
+        sql += " WHERE entity = ?"
+        params.append(config["entity"])
+
+    conn = sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)
+    try:
+        if config["type"] == "summary":
+            body = _summary(pd.read_sql_query(sql, conn, params=params, chunksize=chunk_size), since)
+        else:
+            body = _activity(pd.read_sql_query(sql, conn, params=params, chunksize=chunk_size), since, bucket_width)
+    finally:
+        conn.close()
+
+    return {
+        "report_type": config["type"],
+        "time_range": config["time_range"],
+        "entity": config.get("entity"),
+        "period_start": since,
+        **body,
+        "generated_at": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+def _summary(chunks, since: str) -> Dict[str, Any]:
+    totals: Optional[pd.DataFrame] = None
+    for chunk in chunks:
+        deleted = chunk["deleted_at"]
+        frame = pd.DataFrame({
+            "entity": chunk["entity"],
+            "total_records": 1,
+            "active_records": deleted.isna(),
+            "deleted_records": deleted.notna(),
+            "creations": chunk["created_at"] >= since,
+            "updates": chunk["updated_at"].fillna("") >= since,
+            "deletions": deleted.fillna("") >= since
+        })
+        part = frame.groupby("entity")[_METRICS].sum()
+        totals = part if totals is None else totals.add(part, fill_value=0)
+
+    if totals is None:
+        totals = pd.DataFrame(columns=_METRICS)
+    return {
+        "metrics": {metric: int(totals[metric].sum()) for metric in _METRICS},
+        "by_entity": {
+            entity: {metric: int(value) for metric, value in row.items()}
+            for entity, row in totals.iterrows()
+        }
+    }
+
+
+def _activity(chunks, since: str, bucket_width: int) -> Dict[str, Any]:
+    counts = {"creations": None, "updates": None, "deletions": None}
+    columns = {"creations": "created_at", "updates": "updated_at", "deletions": "deleted_at"}
+    for chunk in chunks:
+        for metric, column in columns.items():
+            values = chunk[column].dropna()
+            part = values[values >= since].str[:bucket_width].value_counts()
+            counts[metric] = part if counts[metric] is None else counts[metric].add(part, fill_value=0)
+
+    frame = pd.DataFrame({metric: series for metric, series in counts.items() if series is not None})
+    frame = frame.reindex(columns=list(columns)).fillna(0).sort_index()
+    return {
+        "buckets": [
+            {"bucket": bucket, **{metric: int(value) for metric, value in row.items()}}
+            for bucket, row in frame.iterrows()
+        ]
+    }
@@ -0,0 +1,383 @@
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+import heapq
+import io
+import json
+import os
+import struct
+import threading
+from cryptography.exceptions import InvalidTag
+
+from app.core.crypto import FieldCipher
+
+_MAGIC = b"TRGM1"
+_SEALED_MAGIC = b"TRGE1"
+_HEADER = struct.Struct("<5sQ")
+# Documents handled per lock acquisition by compaction and search verification
+_STEP = 2048
+
+
+def normalize_text(value: Any) -> str:
+    """Lowercase and collapse whitespace so queries and documents compare equally"""
+    return " ".join(str(value).lower().split())
+
+
+def trigrams(text: str) -> Iterable[str]:
+    """Yield the distinct trigrams of an already normalized string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _contains(postings: array, docnum: int) -> bool:
+    position = bisect_left(postings, docnum)
+    return position < len(postings) and postings[position] == docnum
+
+
+class TrigramIndex:
+    """Trigram inverted index for substring search over a fixed set of fields.
+
+    Documents get monotonically increasing numbers, so posting lists stay
+    sorted ``array('I')`` buffers that only ever append. Updates and deletes
+    leave stale postings behind; ``compact`` renumbers the live documents once
+    they pass ``compact_ratio`` of the index, on a background thread that
+    takes the lock for ``_STEP`` documents at a time so writers and searches
+    interleave with it. ``mark`` is an opaque high-water
+    mark saved with the index; an unreadable file is ignored, leaving an
+    empty index with no mark for the caller to rebuild. With a ``cipher``
+    the file is sealed, bound to ``context``.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        path: Optional[str] = None,
+        compact_ratio: float = 0.25,
+        cipher: Optional[FieldCipher] = None,
+        context: str = "trigram",
+        max_candidates: int = 10000
+    ):
+        self.fields = tuple(fields)
+        self.path = path
+        self.cipher = cipher
+        self.context = context
+        self.compact_ratio = compact_ratio
+        self.max_candidates = max_candidates
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        # Ids tombstoned while a compaction is copying documents, and a counter
+        # that tells it the index was cleared or reloaded underneath it
+        self._touched: Optional[Set[str]] = None
+        self._generation = 0
+        self._ids: List[Optional[str]] = []
+        self._docs: List[Optional[Tuple[str, ...]]] = []
+        self._docnums: Dict[str, int] = {}
+        self._postings: Dict[str, array] = {}
+        self.mark: Optional[str] = None
+        if path and os.path.exists(path):
+            try:
+                self.load()
+            except (OSError, ValueError, KeyError, struct.error, InvalidTag):
+                self.clear()
+
+    def __len__(self) -> int:
+        return len(self._docnums)
+
+    def upsert(self, record: Dict[str, Any]) -> None:
+        """Index a full record; fields it omits or sets to None index as empty"""
+        record_id = str(record["id"])
+        values = tuple(
+            normalize_text(record[field]) if record.get(field) is not None else ""
+            for field in self.fields
+        )
+        with self._lock:
+            previous = self._docnums.get(record_id)
+            if previous is not None:
+                if values == self._docs[previous]:
+                    return
+                self._tombstone(previous)
+            self._append(record_id, values)
+            self._maybe_compact()
+
+    def upsert_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Index several full records"""
+        for record in records:
+            self.upsert(record)
+
+    def remove(self, record_id: str) -> None:
+        """Drop a record from the index"""
+        with self._lock:
+            docnum = self._docnums.get(str(record_id))
+            if docnum is not None:
+                self._tombstone(docnum)
+                self._maybe_compact()
+
+    def clear(self) -> None:
+        """Drop every document and the mark"""
+        with self._lock:
+            self._ids = []
+            self._docs = []
+            self._docnums = {}
+            self._postings = {}
+            self.mark = None
+            self._generation += 1
+
+    def _append(self, record_id: str, values: Tuple[str, ...]) -> None:
+        docnum = len(self._ids)
+        self._ids.append(record_id)
+        self._docs.append(values)
+        self._docnums[record_id] = docnum
+        grams = set()
+        for value in values:
+            # Pad with spaces so values shorter than three characters still get postings
+            grams.update(trigrams(f" {value} "))
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+            postings.append(docnum)
+
+    def _tombstone(self, docnum: int) -> None:
+        record_id = self._ids[docnum]
+        del self._docnums[record_id]
+        self._ids[docnum] = None
+        self._docs[docnum] = None
+        if self._touched is not None:
+            self._touched.add(record_id)
+
+    def _maybe_compact(self) -> None:
+        dead = len(self._ids) - len(self._docnums)
+        if dead > 1024 and dead > len(self._ids) * self.compact_ratio:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self.compact, name="trigram-compact", daemon=True)
+                self._compactor.start()
+
+    def compact(self) -> None:
+        """Renumber live documents and drop stale postings.
+
+        Live documents are copied into fresh structures ``_STEP`` at a time,
+        releasing the lock in between. Documents that change after they were
+        copied are tombstoned in the copy, and documents appended meanwhile
+        are copied in the last step, which swaps the structures in.
+        """
+        with self._compact_lock:
+            with self._lock:
+                generation = self._generation
+                end = len(self._ids)
+                self._touched = set()
+            fresh = TrigramIndex(self.fields)
+            try:
+                for start in range(0, end, _STEP):
+                    with self._lock:
+                        if self._generation != generation:
+                            return
+                        for docnum in range(start, min(start + _STEP, end)):
+                            if self._ids[docnum] is not None:
+                                fresh._append(self._ids[docnum], self._docs[docnum])
+
+                with self._lock:
+                    if self._generation != generation:
+                        return
+                    for record_id in self._touched:
+                        docnum = fresh._docnums.get(record_id)
+                        if docnum is not None:
+                            fresh._tombstone(docnum)
+                    for docnum in range(end, len(self._ids)):
+                        if self._ids[docnum] is not None:
+                            fresh._append(self._ids[docnum], self._docs[docnum])
+                    self._ids = fresh._ids
+                    self._docs = fresh._docs
+                    self._docnums = fresh._docnums
+                    self._postings = fresh._postings
+            finally:
+                with self._lock:
+                    self._touched = None
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` records containing ``query`` in any indexed field.
+
+        Results rank prefix matches before word-start matches before other
+        substring matches, then earlier fields first, then shorter values.
+        Only the first ``max_candidates`` matching documents are ranked, and
+        they are verified ``_STEP`` at a time so a common term does not hold
+        the lock for the whole scan.
+        """
+        needle = normalize_text(query)
+        if not needle or limit <= 0:
+            return []
+        with self._lock:
+            # Compaction swaps these for new objects rather than renumbering them in place
+            ids, docs = self._ids, self._docs
+            candidates = self._candidates(self._postings, needle)
+
+        # Max-heap of the best ``limit`` matches, keyed by negated rank
+        best: List[Tuple[int, int, int, int]] = []
+        matched = 0
+        while matched < self.max_candidates:
+            with self._lock:
+                chunk = list(islice(candidates, _STEP))
+                if not chunk:
+                    break
+                for docnum in chunk:
+                    values = docs[docnum]
+                    if values is None:
+                        continue
+                    for field_position, value in enumerate(values):
+                        offset = value.find(needle)
+                        if offset < 0:
+                            continue
+                        if offset == 0:
+                            match = 0
+                        elif value[offset - 1] == " ":
+                            match = 1
+                        else:
+                            match = 2
+                        key = (-match, -field_position, -len(value), -docnum)
+                        if len(best) < limit:
+                            heapq.heappush(best, key)
+                        else:
+                            heapq.heappushpop(best, key)
+                        matched += 1
+                        break
+                    if matched >= self.max_candidates:
+                        break
+
+        with self._lock:
+            return [
+                {
+                    "id": ids[-docnum],
+                    "field": self.fields[-field_position],
+                    "score": round(len(needle) / max(-length, 1) / (1 - match), 4)
+                }
+                for match, field_position, length, docnum in sorted(best, reverse=True)
+                if ids[-docnum] is not None
+            ]
+
+    @staticmethod
+    def _candidates(postings: Dict[str, array], needle: str) -> Iterator[int]:
+        if len(needle) < 3:
+            # Too short for a full trigram: union the postings of trigrams containing it
+            docnums = set()
+            for gram, grams in postings.items():
+                if needle in gram:
+                    docnums.update(grams)
+            yield from sorted(docnums)
+            return
+
+        lists = []
+        for gram in trigrams(needle):
+            grams = postings.get(gram)
+            if grams is None:
+                return
+            lists.append(grams)
+        lists.sort(key=len)
+        shortest, rest = lists[0], lists[1:]
+        for docnum in shortest:
+            if all(_contains(grams, docnum) for grams in rest):
+                yield docnum
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Persist the index as a JSON header followed by one packed uint32 posting buffer.
+
+        With a cipher the whole file is sealed, since the header holds the
+        normalized field values and the vocabulary their trigrams.
+        """
+        path = path or self.path
+        if not path:
+            return
+        # Compact before taking the lock: compaction takes it step by step itself
+        self.compact()
+        with self._lock:
+            vocabulary = sorted(self._postings)
+            header = json.dumps({
+                "fields": self.fields,
+                "mark": self.mark,
+                "ids": self._ids,
+                "docs": self._docs,
+                "vocabulary": vocabulary,
+                "lengths": [len(self._postings[gram]) for gram in vocabulary]
+            }, separators=(",", ":")).encode("utf-8")
+            buffer = io.BytesIO()
+            buffer.write(_HEADER.pack(_MAGIC, len(header)))
+            buffer.write(header)
+            for gram in vocabulary:
+                self._postings[gram].tofile(buffer)
+
+        data = buffer.getvalue()
+        if self.cipher is not None:
+            data = _SEALED_MAGIC + self.cipher.seal_bytes(self.context, data)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def load(self, path: Optional[str] = None) -> None:
+        """Load an index written by ``save``"""
+        path = path or self.path
+        with open(path, "rb") as f:
+            data = f.read()
+        if data.startswith(_SEALED_MAGIC):
+            if self.cipher is None:
+                raise ValueError(f"Trigram index file is encrypted: {path}")
+            data = self.cipher.open_bytes(self.context, data[len(_SEALED_MAGIC):])
+        magic, header_size = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError(f"Not a trigram index file: {path}")
+        header = json.loads(data[_HEADER.size:_HEADER.size + header_size])
+        if tuple(header["fields"]) != self.fields:
+            raise ValueError(f"Index fields {header['fields']} do not match {list(self.fields)}")
+        packed = array("I")
+        packed.frombytes(data[_HEADER.size + header_size:])
+
+        with self._lock:
+            self._generation += 1
+            self.mark = header.get("mark")
+            self._ids = header["ids"]
+            self._docs = [tuple(values) if values is not None else None for values in header["docs"]]
+            self._docnums = {record_id: docnum for docnum, record_id in enumerate(self._ids) if record_id is not None}
+            self._postings = {}
+            offset = 0
+            for gram, length in zip(header["vocabulary"], header["lengths"]):
+                self._postings[gram] = packed[offset:offset + length]
+                offset += length
+
+
+class TrigramIndexSet:
+    """Per-entity trigram indexes shared by the agents that maintain and query them"""
+
+    def __init__(
+        self,
+        directory: Optional[str],
+        fields_by_entity: Dict[str, Sequence[str]],
+        cipher: Optional[FieldCipher] = None
+    ):
+        self.directory = directory
+        self.fields_by_entity = fields_by_entity
+        self.cipher = cipher
+        self._indexes: Dict[str, TrigramIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, entity: str) -> Optional[TrigramIndex]:
+        """Get the index for an entity, or None if the entity has no searchable fields"""
+        fields = self.fields_by_entity.get(entity)
+        if not fields:
+            return None
+        with self._lock:
+            index = self._indexes.get(entity)
+            if index is None:
+                path = os.path.join(self.directory, f"{entity}.trgm") if self.directory else None
+                index = self._indexes[entity] = TrigramIndex(
+                    fields, path, cipher=self.cipher, context=f"trigram\0{entity}"
+                )
+            return index
+
+    def save_all(self, mark: Optional[Callable[[str], Optional[str]]] = None) -> None:
+        """Persist every loaded index, stamping it with ``mark(entity)`` when given"""
+        with self._lock:
+            indexes = list(self._indexes.items())
+        for entity, index in indexes:
+            if mark is not None:
+                index.mark = mark(entity)
+            index.save()
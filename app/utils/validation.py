@@ -1,6 +1,7 @@
 from typing import Any, Dict, Optional
 from pydantic import BaseModel, ValidationError
 from datetime import datetime
+import re
 
 class BaseSchema(BaseModel):
     """Base schema for all data models"""
@@ -30,7 +31,13 @@ class OrderSchema(BaseSchema):
     customer_id: str
     products: Dict[str, int]  # product_id: quantity
     total_amount: float
-    status: str
+    order_status: str
+
+class OrderPlacementSchema(BaseModel):
+    """Schema for placing an order; totals and status are filled in by the store"""
+    customer_id: str
+    products: Dict[str, int]  # product_id: quantity
+    order_id: Optional[str] = None
 
 # Schema registry
 SCHEMAS = {
@@ -40,6 +47,17 @@ SCHEMAS = {
     "order": OrderSchema
 }
 
+# Entities whose rows only their workflows may change (an order's lines hold
+# product stock), so generic creates, updates and deletes are refused
+WORKFLOW_MANAGED_ENTITIES = {"order"}
+
+# Entity names double as index file names, so they are kept to plain identifiers
+ENTITY_NAME_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9_]{0,63}$")
+
+def is_entity_name(value: Any) -> bool:
+    """Whether a value is a well-formed entity name"""
+    return isinstance(value, str) and bool(ENTITY_NAME_PATTERN.match(value))
+
 def validate_data_schema(data: Dict[str, Any], schema_name: str = "default") -> bool:
     """Validate data against a schema"""
     try:
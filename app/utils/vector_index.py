@@ -0,0 +1,313 @@
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Sequence, Tuple
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+# Record fields that carry bookkeeping rather than searchable content
+NON_TEXT_FIELDS = {"id", "entity", "created_at", "updated_at", "deleted_at", "status", "version"}
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class Embedder(Protocol):
+    """Interface for pluggable text embedders"""
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return a (len(texts), dim) float32 matrix"""
+        ...
+
+
+class HashingEmbedder:
+    """Offline embedder using the hashing trick over words and character trigrams"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = list(words)
+        for word in words:
+            padded = f" {word} "
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts into L2-normalized float32 vectors"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                matrix[row, (value >> 1) % self.dim] += sign
+        return normalize(matrix)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize the rows of a matrix, leaving zero rows untouched"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def record_text(record: Dict[str, Any], exclude: Iterable[str] = ()) -> str:
+    """Build the text that represents a record in the embedding space, leaving out ``exclude``"""
+    excluded = NON_TEXT_FIELDS.union(exclude)
+    return " ".join(
+        str(value) for field, value in record.items()
+        if field not in excluded and isinstance(value, (str, int, float)) and value != ""
+    )
+
+
+class VectorIndex:
+    """Memory-mapped float32 vector index with cosine top-k search.
+
+    Vectors live in a ``<path>.vectors`` memmap that grows by doubling; slot
+    ids and IVF centroids are stored next to it. With ``partitions > 0`` the
+    index trains k-means centroids once enough vectors exist and only scans the
+    ``nprobe`` closest partitions per query. ``mark`` is an opaque
+    high-water mark persisted with the metadata, recording how far the
+    index has been brought up to date with its source.
+    """
+
+    SEARCH_BLOCK_ROWS = 65536
+    TRAIN_ITERATIONS = 10
+
+    def __init__(
+        self,
+        path: Optional[str],
+        dim: int,
+        partitions: int = 0,
+        nprobe: int = 4,
+        initial_capacity: int = 1024
+    ):
+        self.path = path
+        self.dim = dim
+        self.partitions = partitions
+        self.nprobe = max(1, nprobe)
+        self.initial_capacity = initial_capacity
+        self._lock = threading.RLock()
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._assignments = np.full(0, -1, dtype=np.int32)
+        self._centroids: Optional[np.ndarray] = None
+        self.mark: Optional[str] = None
+        if not self.load():
+            self._ensure_capacity(initial_capacity)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def is_partitioned(self) -> bool:
+        return self._centroids is not None
+
+    def _vectors_file(self) -> str:
+        return f"{self.path}.vectors"
+
+    def _meta_file(self) -> str:
+        return f"{self.path}.meta.json"
+
+    def _centroids_file(self) -> str:
+        return f"{self.path}.centroids.npy"
+
+    def _allocate(self, used: int, capacity: int) -> np.ndarray:
+        """Allocate vector storage, copying the first ``used`` rows of the current one"""
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_file = f"{self._vectors_file()}.tmp"
+            vectors = np.memmap(tmp_file, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+            if used:
+                vectors[:used] = self._vectors[:used]
+                vectors.flush()
+            old = getattr(self, "_vectors", None)
+            if isinstance(old, np.memmap):
+                old.flush()
+                del old
+            os.replace(tmp_file, self._vectors_file())
+            return np.memmap(self._vectors_file(), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        if used:
+            vectors[:used] = self._vectors[:used]
+        return vectors
+
+    def _ensure_capacity(self, needed: int) -> None:
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        self._vectors = self._allocate(len(self._ids), capacity)
+        assignments = np.full(capacity, -1, dtype=np.int32)
+        assignments[:len(self._ids)] = self._assignments[:len(self._ids)]
+        self._assignments = assignments
+
+    def load(self) -> bool:
+        """Load a previously flushed index from disk, returning False if there is none"""
+        if not self.path or not os.path.exists(self._meta_file()):
+            return False
+        with self._lock:
+            with open(self._meta_file(), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dim"] != self.dim:
+                raise ValueError(f"Index dimension {meta['dim']} does not match embedder dimension {self.dim}")
+            capacity = meta["capacity"]
+            self._vectors = np.memmap(self._vectors_file(), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+            self._ids = meta["ids"]
+            self._slots = {record_id: slot for slot, record_id in enumerate(self._ids) if record_id is not None}
+            self._free = [slot for slot, record_id in enumerate(self._ids) if record_id is None]
+            self._assignments = np.full(capacity, -1, dtype=np.int32)
+            self._assignments[:len(meta["assignments"])] = meta["assignments"]
+            self._centroids = np.load(self._centroids_file()) if os.path.exists(self._centroids_file()) else None
+            self.mark = meta.get("mark")
+        return True
+
+    def flush(self) -> None:
+        """Persist vectors and metadata"""
+        if not self.path:
+            return
+        with self._lock:
+            self._vectors.flush()
+            meta = {
+                "dim": self.dim,
+                "capacity": int(self._vectors.shape[0]),
+                "ids": self._ids,
+                "assignments": self._assignments[:len(self._ids)].tolist(),
+                "mark": self.mark
+            }
+            tmp_file = f"{self._meta_file()}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_file, self._meta_file())
+            if self._centroids is not None:
+                np.save(self._centroids_file(), self._centroids)
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Insert or replace vectors for the given ids"""
+        vectors = normalize(vectors)
+        with self._lock:
+            slots = []
+            for record_id in ids:
+                slot = self._slots.get(record_id)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        slot = len(self._ids)
+                        self._ensure_capacity(slot + 1)
+                        self._ids.append(None)
+                    self._ids[slot] = record_id
+                    self._slots[record_id] = slot
+                slots.append(slot)
+
+            slots = np.asarray(slots, dtype=np.int64)
+            self._vectors[slots] = vectors
+            if self._centroids is not None:
+                self._assignments[slots] = np.argmax(vectors @ self._centroids.T, axis=1)
+            elif self.partitions and len(self._slots) >= self.partitions * 39:
+                self.train()
+
+    def remove(self, ids: Sequence[str]) -> None:
+        """Remove vectors for the given ids, freeing their slots for reuse"""
+        with self._lock:
+            for record_id in ids:
+                slot = self._slots.pop(record_id, None)
+                if slot is None:
+                    continue
+                self._ids[slot] = None
+                self._vectors[slot] = 0.0
+                self._assignments[slot] = -1
+                self._free.append(slot)
+
+    def clear(self) -> None:
+        """Drop every vector and the trained centroids, keeping the allocated storage"""
+        with self._lock:
+            self._slots = {}
+            self._ids = []
+            self._free = []
+            self._assignments[:] = -1
+            self._centroids = None
+            self.mark = None
+            if self.path and os.path.exists(self._centroids_file()):
+                os.remove(self._centroids_file())
+
+    def train(self) -> None:
+        """Train IVF centroids with spherical k-means and reassign all vectors"""
+        with self._lock:
+            live = np.fromiter(self._slots.values(), dtype=np.int64)
+            if not self.partitions or len(live) < self.partitions:
+                return
+            rng = np.random.default_rng(0)
+            sample = live if len(live) <= self.partitions * 256 else rng.choice(live, self.partitions * 256, replace=False)
+            data = np.asarray(self._vectors[np.sort(sample)])
+            centroids = data[rng.choice(len(data), self.partitions, replace=False)].copy()
+            for _ in range(self.TRAIN_ITERATIONS):
+                labels = np.argmax(data @ centroids.T, axis=1)
+                for partition in range(self.partitions):
+                    members = data[labels == partition]
+                    if len(members):
+                        centroids[partition] = members.sum(axis=0)
+                centroids = normalize(centroids)
+
+            self._centroids = centroids
+            used = len(self._ids)
+            for start in range(0, used, self.SEARCH_BLOCK_ROWS):
+                block = np.asarray(self._vectors[start:start + self.SEARCH_BLOCK_ROWS])
+                self._assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            self._assignments[self._free] = -1
+
+    def search(self, queries: np.ndarray, k: int = 10) -> List[List[Tuple[str, float]]]:
+        """Return the top-k (id, cosine score) pairs for each query vector"""
+        queries = normalize(queries)
+        with self._lock:
+            used = len(self._ids)
+            if not self._slots or k <= 0:
+                return [[] for _ in range(len(queries))]
+            if self._centroids is not None:
+                return [self._search_partitions(query, k, used) for query in queries]
+            return self._search_flat(queries, k, used)
+
+    def _search_flat(self, queries: np.ndarray, k: int, used: int) -> List[List[Tuple[str, float]]]:
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_slots = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, used, self.SEARCH_BLOCK_ROWS):
+            stop = min(start + self.SEARCH_BLOCK_ROWS, used)
+            scores = queries @ np.asarray(self._vectors[start:stop]).T
+            free = [slot - start for slot in self._free if start <= slot < stop]
+            if free:
+                scores[:, free] = -np.inf
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_slots = np.concatenate([best_slots, np.broadcast_to(np.arange(start, stop), scores.shape)], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_slots = np.take_along_axis(best_slots, top, axis=1)
+        return [self._ranked(best_slots[row], best_scores[row], k) for row in range(len(queries))]
+
+    def _search_partitions(self, query: np.ndarray, k: int, used: int) -> List[Tuple[str, float]]:
+        probes = np.argsort(-(self._centroids @ query))[:self.nprobe]
+        candidates = np.flatnonzero(np.isin(self._assignments[:used], probes))
+        if not len(candidates):
+            return []
+        scores = np.asarray(self._vectors[candidates]) @ query
+        return self._ranked(candidates, scores, k)
+
+    def _ranked(self, slots: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        order = np.argsort(-scores)[:k]
+        return [
+            (self._ids[slots[i]], float(scores[i]))
+            for i in order
+            if np.isfinite(scores[i]) and self._ids[slots[i]] is not None
+        ]
@@ -0,0 +1,139 @@
+"""Measure the per-record cost of field-level encryption and blind-index lookups.
+
+Customers carry the default encrypted fields (email, phone, address), and
+email has a blind index. Cases measured:
+  encrypt   - FieldCipher.encrypt_data with cached key handles, against
+              deriving the keys and building the handles for every record
+  decrypt   - decrypt_many on a page, inline and spread over worker threads
+  store     - RecordStore insert and page reads, without and with a cipher
+  lookup    - finding one customer by email through the blind index,
+              against decrypting every row and comparing
+Run from the repository root:
+    python benchmarks/bench_field_crypto.py [records]
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import Settings
+from app.core.crypto import FieldCipher
+from app.core.database import RecordStore
+
+settings = Settings()
+MASTER_KEY = os.urandom(32)
+
+
+def make_customers(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "customer_id": f"C{i:07d}",
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "phone": f"+1555{i:07d}",
+            "address": f"{i} Market Street, Springfield"
+        }
+        for i in range(count)
+    ]
+
+
+def make_cipher(workers: int = 1) -> FieldCipher:
+    return FieldCipher(
+        MASTER_KEY,
+        settings.ENCRYPTED_FIELDS,
+        settings.BLIND_INDEX_FIELDS,
+        workers=workers,
+        batch_min=settings.ENCRYPTION_BATCH_MIN
+    )
+
+
+def timed(run: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def report(name: str, seconds: float, count: int, baseline: float = 0.0) -> None:
+    line = f"  {name:<28} {seconds * 1e6 / count:8.1f} us/record"
+    if baseline:
+        line += f"  {seconds / baseline:6.2f}x"
+    print(line)
+
+
+def bench_cipher(customers: List[Dict[str, Any]]) -> None:
+    count = len(customers)
+    cipher = make_cipher()
+    print("encrypt")
+    cached = timed(lambda: [cipher.encrypt_data("customer", data) for data in customers])
+    report("cached handles", cached, count)
+    report("handles built per record", timed(
+        lambda: [make_cipher().encrypt_data("customer", data) for data in customers]
+    ), count, cached)
+    report("blind index (email)", timed(
+        lambda: [cipher.blind_index("customer", "email", data["email"]) for data in customers]
+    ), count)
+
+    sealed = [cipher.encrypt_data("customer", data) for data in customers]
+    print("decrypt")
+    inline = timed(lambda: cipher.decrypt_many("customer", [dict(data) for data in sealed]))
+    report("inline", inline, count)
+    for workers in (2, 4):
+        pooled = make_cipher(workers)
+        report(f"{workers} worker threads", timed(
+            lambda: pooled.decrypt_many("customer", [dict(data) for data in sealed])
+        ), count, inline)
+        pooled.close()
+
+
+def bench_store(customers: List[Dict[str, Any]], directory: str) -> None:
+    count = len(customers)
+    stores = {
+        "plaintext": RecordStore(f"sqlite:///{os.path.join(directory, 'plain.db')}"),
+        "encrypted": RecordStore(f"sqlite:///{os.path.join(directory, 'encrypted.db')}", cipher=make_cipher(4))
+    }
+    baselines: Dict[str, float] = {}
+    for name, store in stores.items():
+        print(f"store ({name})")
+        insert = timed(lambda: [store.insert("customer", data, data["customer_id"]) for data in customers])
+        read = timed(lambda: [store.list("customer", skip, 1000) for skip in range(0, count, 1000)])
+        get = timed(lambda: [store.get("customer", data["customer_id"]) for data in customers[:1000]])
+        report("insert", insert, count, baselines.get("insert", 0.0))
+        report("list pages of 1000", read, count, baselines.get("list", 0.0))
+        report("get", get, min(count, 1000), baselines.get("get", 0.0))
+        baselines.update(insert=insert, list=read, get=get)
+
+    store = stores["encrypted"]
+    target = customers[count // 2]["email"].upper()
+    lookups = 100
+
+    def scan():
+        found = []
+        for page in store.iter_pages("customer", page_size=settings.EXPORT_CHUNK_SIZE):
+            found.extend(i for i, email in enumerate(page.columns["email"]) if email.lower() == target.lower())
+        return found
+
+    print("lookup by email (encrypted)")
+    indexed = timed(lambda: [store.lookup("customer", "email", target) for _ in range(lookups)]) / lookups
+    full_scan = timed(scan)
+    print(f"  {'blind index':<28} {indexed * 1e3:8.3f} ms")
+    print(f"  {'decrypt and scan':<28} {full_scan * 1e3:8.3f} ms  {full_scan / indexed:8.0f}x")
+    for store in stores.values():
+        if store.cipher is not None:
+            store.cipher.close()
+        store.close()
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    customers = make_customers(count)
+    print(f"{count} customers, {os.cpu_count()} CPUs")
+    bench_cipher(customers)
+    with tempfile.TemporaryDirectory() as directory:
+        bench_store(customers, directory)
+
+
+if __name__ == "__main__":
+    main()
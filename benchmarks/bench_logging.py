@@ -0,0 +1,97 @@
+"""Measure the caller-side cost of one BaseAgent.log_operation call.
+
+Cases:
+  f-string sync     - the previous implementation: eager f-string, synchronous sink
+  lazy sync         - structured, capped record, synchronous sink, every call logged
+  enqueued          - as above through the background writer thread
+  sampled 1%        - enqueued with the operation sampled at 0.01
+  level disabled    - LOG_LEVEL=WARNING, so INFO records are dropped before formatting
+  slow sink sync    - lazy sync to a sink whose flush takes 200us (a pipe to a busy collector)
+  slow sink enq.    - the same sink behind the background writer
+
+Every sink writes to a temporary file and flushes per record, as loguru
+does for streams. Time spent on the background writer thread is not
+included. Run from the repository root:
+    python benchmarks/bench_logging.py [calls]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+
+from app.agents.base_agent import BaseAgent
+from app.core.config import Settings
+from app.core.log import configure_logging, stop_logging
+
+PAYLOAD = {
+    "id": "0" * 32,
+    "entity": "customer",
+    "customer_id": "C0000001",
+    "name": "Customer 1",
+    "email": "customer1@example.com",
+    "phone": "+15550000001",
+    "address": "1 Market Street, Springfield " * 4,
+    "version": 3,
+    "created_at": "2025-01-30T12:00:00.000000Z",
+    "updated_at": "2025-01-31T08:30:00.000000Z",
+    "status": "active"
+}
+
+
+class SlowStream:
+    """Stream whose flush blocks, like a pipe to a log collector that is falling behind"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, message):
+        self.stream.write(message)
+
+    def flush(self):
+        self.stream.flush()
+        time.sleep(0.0002)
+
+
+class LegacyAgent(BaseAgent):
+    def log_operation(self, operation, result):
+        logger.info(f"{self.name} - {operation}: {result}")
+        return result
+
+
+def timed(agent: BaseAgent, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        agent.log_operation("log_update", PAYLOAD)
+    return (time.perf_counter() - started) / calls
+
+
+def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    cases = {
+        "f-string sync": (LegacyAgent("Bench Agent"), Settings(LOG_ENQUEUE=False)),
+        "lazy sync": (BaseAgent("Bench Agent"), Settings(LOG_ENQUEUE=False)),
+        "enqueued": (BaseAgent("Bench Agent"), Settings()),
+        "sampled 1%": (BaseAgent("Bench Agent"), Settings(LOG_SAMPLE_RATES={"log_update": 0.01})),
+        "level disabled": (BaseAgent("Bench Agent"), Settings(LOG_LEVEL="WARNING")),
+        "slow sink sync": (BaseAgent("Bench Agent"), Settings(LOG_ENQUEUE=False)),
+        "slow sink enq.": (BaseAgent("Bench Agent"), Settings())
+    }
+
+    baseline = None
+    print(f"{calls} calls")
+    for name, (agent, settings) in cases.items():
+        with tempfile.TemporaryFile("w") as sink:
+            configure_logging(settings, sink=SlowStream(sink) if name.startswith("slow") else sink)
+            seconds = timed(agent, calls)
+            logger.remove()
+            stop_logging()
+        baseline = baseline or seconds
+        print(f"  {name:<16} {seconds * 1e6:8.2f} us/call  {baseline / seconds:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
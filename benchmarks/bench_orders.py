@@ -0,0 +1,99 @@
+"""Flash-sale benchmark for transactional order placement.
+
+A burst of concurrent orders hits one hot SKU with little stock, most of
+them also buying from a pool of cold SKUs. Orders go through the
+ingestion agent's ``place_order``, optionally from several agents each
+with its own connection to the same database file, which stands in for
+several server processes contending for the SQLite write lock.
+
+After the burst the benchmark checks that no stock went negative and
+that every product's remaining stock equals its initial stock minus what
+the committed orders bought. Run from the repository root:
+    python benchmarks/bench_orders.py [orders] [hot_stock] [writers]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.ingestion_agent import DataIngestionAgent
+from app.core.database import RecordStore
+from app.utils.exceptions import ConflictError
+
+COLD_SKUS = 20
+COLD_STOCK = 1000000
+
+
+def make_orders(count: int) -> List[Dict[str, int]]:
+    rng = random.Random(7)
+    orders = []
+    for _ in range(count):
+        lines = {"hot": rng.randint(1, 2)}
+        for sku in rng.sample(range(COLD_SKUS), rng.randint(0, 3)):
+            lines[f"cold-{sku:02d}"] = rng.randint(1, 5)
+        orders.append(lines)
+    return orders
+
+
+async def run(orders: List[Dict[str, int]], hot_stock: int, writers: int, path: str) -> None:
+    url = f"sqlite:///{path}"
+    seed = RecordStore(url)
+    seed.insert("customer", {"name": "Flash Buyer"}, "buyer")
+    seed.insert("product", {"name": "Hot item", "price": 9.99, "stock": hot_stock}, "hot")
+    for sku in range(COLD_SKUS):
+        seed.insert("product", {"name": f"Cold item {sku}", "price": 1.5, "stock": COLD_STOCK}, f"cold-{sku:02d}")
+    initial = {record["id"]: record["stock"] for record in seed.list("product", limit=COLD_SKUS + 1)}
+
+    agents = [DataIngestionAgent(store=RecordStore(url)) for _ in range(writers)]
+    outcomes: Counter = Counter()
+    sold: Counter = Counter()
+
+    async def place(index: int, lines: Dict[str, int]) -> None:
+        agent = agents[index % writers]
+        try:
+            await agent.process({"operation": "place_order", "customer_id": "buyer", "products": lines})
+        except ConflictError:
+            outcomes["sold out"] += 1
+        except Exception:
+            outcomes["failed"] += 1
+        else:
+            outcomes["placed"] += 1
+            sold.update(lines)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(place(index, lines) for index, lines in enumerate(orders)))
+    elapsed = time.perf_counter() - started
+
+    final = {record["id"]: record["stock"] for record in seed.list("product", limit=COLD_SKUS + 1)}
+    stored_orders = seed.list_columns("order", limit=len(orders) + 1)
+    for agent in agents:
+        agent.store.close()
+    seed.close()
+
+    print(f"{len(orders)} orders, hot stock {hot_stock}, {writers} writer connection(s)")
+    print(f"  {elapsed:.2f}s  {len(orders) / elapsed:8.0f} orders/s  {dict(outcomes)}")
+    negative = [sku for sku, stock in final.items() if stock < 0]
+    mismatched = [sku for sku in initial if final[sku] != initial[sku] - sold[sku]]
+    print(f"  hot stock left {final['hot']}, sold {sold['hot']}, orders stored {len(stored_orders)}")
+    if negative or mismatched or len(stored_orders) != outcomes["placed"]:
+        raise SystemExit(f"  INCONSISTENT: negative={negative} mismatched={mismatched}")
+    print("  stock consistent")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    hot_stock = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    orders = make_orders(count)
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(orders, hot_stock, writers, os.path.join(directory, "orders.db")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare the memory held by a 10k-row customer page in each in-process layout.
+
+Layouts measured:
+  dict      - one wire-format dict per row (what the store returned before Record)
+  Record    - one slotted Record per row, client fields in a small data dict
+  columnar  - ColumnarPage: one list per field, versions in an int array
+
+Each page is built from the same decoded SQLite row tuples, so the numbers
+cover only what the layout itself retains. Run from the repository root:
+    python benchmarks/bench_record_memory.py [rows]
+"""
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from typing import Any, Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.records import ColumnarPage, Record
+
+
+def make_rows(rows: int) -> List[Tuple[str, str, int, str, Any]]:
+    return [
+        (
+            f"{i:032x}",
+            json.dumps({
+                "customer_id": f"C{i:07d}",
+                "name": f"Customer {i}",
+                "email": f"customer{i}@example.com",
+                "phone": f"+1555{i:07d}",
+                "address": f"{i} Market Street, Springfield"
+            }, separators=(",", ":")),
+            1 + i % 5,
+            "2025-01-30T12:00:00.000000Z",
+            None
+        )
+        for i in range(rows)
+    ]
+
+
+def as_dicts(rows):
+    return [
+        {
+            "id": entity_id,
+            "entity": "customer",
+            **json.loads(data),
+            "version": version,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "status": "active"
+        }
+        for entity_id, data, version, created_at, updated_at in rows
+    ]
+
+
+def as_records(rows):
+    return [
+        Record(entity_id, "customer", json.loads(data), version, created_at, updated_at)
+        for entity_id, data, version, created_at, updated_at in rows
+    ]
+
+
+def as_columns(rows):
+    page = ColumnarPage("customer")
+    for entity_id, data, version, created_at, updated_at in rows:
+        page.append(entity_id, json.loads(data), version, created_at, updated_at)
+    return page
+
+
+def retained(build: Callable[[Any], Any], rows) -> int:
+    """Bytes still allocated once the page is built"""
+    gc.collect()
+    tracemalloc.start()
+    page = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del page
+    return size
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rows = make_rows(count)
+    cases = {"dict": as_dicts, "Record": as_records, "columnar": as_columns}
+
+    baseline = None
+    print(f"{count} rows")
+    for name, build in cases.items():
+        size = retained(build, rows)
+        baseline = baseline or size
+        print(f"  {name:<10} {size / 1024 / 1024:8.2f} MiB  {size / count:7.0f} B/row  {size / baseline:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
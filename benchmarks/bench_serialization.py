@@ -0,0 +1,66 @@
+"""Compare serialization cost of a 1k-row customer page.
+
+Paths measured:
+  jsonable_encoder  - FastAPI's default: jsonable_encoder + json.dumps (JSONResponse)
+  response_model    - validation and JSON dump through the generated CustomerRecord model
+  orjson            - pre-encoded bytes as returned by DataQueryAgent for list pages
+
+Run from the repository root:
+    python benchmarks/bench_serialization.py [rows] [repeat]
+"""
+import json
+import os
+import sys
+import timeit
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.api.api_v1.models import RECORD_MODELS
+
+
+def make_page(rows: int) -> List[dict]:
+    return [
+        {
+            "id": f"{i:032x}",
+            "entity": "customer",
+            "customer_id": f"C{i:07d}",
+            "name": f"Customer {i}",
+            "email": f"customer{i}@example.com",
+            "phone": f"+1555{i:07d}",
+            "address": f"{i} Market Street, Springfield",
+            "version": 1 + i % 5,
+            "created_at": "2025-01-30T12:00:00.000000Z",
+            "updated_at": None,
+            "status": "active"
+        }
+        for i in range(rows)
+    ]
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    page = make_page(rows)
+    adapter = TypeAdapter(List[RECORD_MODELS["customer"]])
+
+    cases = {
+        "jsonable_encoder": lambda: json.dumps(jsonable_encoder(page)).encode("utf-8"),
+        "response_model": lambda: adapter.dump_json(adapter.validate_python(page), exclude_unset=True),
+        "orjson": lambda: orjson.dumps(page)
+    }
+
+    baseline = None
+    print(f"{rows} rows, best of 5 x {repeat} runs")
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=repeat, repeat=5)) / repeat
+        baseline = baseline or seconds
+        print(f"  {name:<18} {seconds * 1000:8.3f} ms/page  {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,21 @@
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from loguru import logger
 import os
 
-from app.core.config import Settings
-from app.api.api_v1.api import api_router
-from app.core.orchestrator import OrchestrationAgent
-
-# Load environment variables
+# Load environment variables before any app import: Settings reads them
+# when app.core.config is first imported
 load_dotenv()
 
-# Initialize Orchestration Agent
-orchestrator = OrchestrationAgent()
+from app.core.config import Settings
+from app.core.log import configure_logging, stop_logging
+from app.api.api_v1.api import api_router, orchestrator
+
+# Install log sinks from settings
+configure_logging()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -26,13 +28,16 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down AI-Driven CRUD Management System")
     await orchestrator.shutdown_agents()
+    await logger.complete()
+    stop_logging()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI-Driven CRUD Management System",
     description="A collaborative AI agent system for efficient database management",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Load settings
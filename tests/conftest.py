@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+# Settings read the environment when app.core.config is first imported, so
+# every data path must point at a scratch directory before any app import.
+_DATA_DIR = tempfile.mkdtemp(prefix="crud-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_DATA_DIR}/app.db",
+    "VECTOR_INDEX_PATH": os.path.join(_DATA_DIR, "vectors"),
+    "TEXT_INDEX_PATH": os.path.join(_DATA_DIR, "text"),
+    "HISTORY_PATH": os.path.join(_DATA_DIR, "history"),
+    "IDEMPOTENCY_DB_PATH": os.path.join(_DATA_DIR, "idempotency.db"),
+    "JWT_SECRET_KEY": "test-secret-key-that-is-at-least-32-bytes-long"
+})
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.database import RecordStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecordStore(f"sqlite:///{tmp_path}/records.db")
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/api/v1/token", data={"username": "admin", "password": "admin"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def unique_id():
+    return uuid.uuid4().hex[:12]
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.agents import analytics_agent
+from app.agents.analytics_agent import DataAnalyticsAgent
+from app.utils.exceptions import AnalyticsError
+
+
+@pytest.fixture
+def agent(store, monkeypatch):
+    """An analytics agent whose reports run on a thread and are counted"""
+    agent = DataAnalyticsAgent(store=store)
+    agent._executor = ThreadPoolExecutor(max_workers=2)
+    agent.runs = []
+
+    def generate_report(database_path, config):
+        agent.runs.append(config)
+        time.sleep(0.01)
+        if config.get("entity") == "broken":
+            raise RuntimeError("report failed")
+        return {"config": config, "run": len(agent.runs)}
+
+    monkeypatch.setattr(analytics_agent, "generate_report", generate_report)
+    yield agent
+    asyncio.run(agent.cleanup())
+
+
+def report(agent, *configs):
+    async def run():
+        return await asyncio.gather(*(
+            agent.process({"operation": "analytics", "config": config}) for config in configs
+        ))
+
+    return asyncio.run(run())
+
+
+def test_equivalent_configs_share_one_report(agent):
+    first, second = report(agent, {}, {"type": "summary", "time_range": "daily", "entity": None})
+    third, = report(agent, {"time_range": "daily"})
+
+    assert len(agent.runs) == 1
+    assert first == second == third
+
+
+def test_reports_are_recomputed_after_the_ttl(agent):
+    agent.settings.ANALYTICS_CACHE_TTL_SECONDS = 0
+    report(agent, {})
+    report(agent, {})
+    assert len(agent.runs) == 2
+
+    agent.settings.ANALYTICS_CACHE_TTL_SECONDS = 3600
+    report(agent, {"type": "activity"})
+    report(agent, {"type": "activity"})
+    assert len(agent.runs) == 3
+
+
+def test_failed_reports_are_not_cached(agent):
+    for _ in range(2):
+        with pytest.raises(AnalyticsError):
+            report(agent, {"entity": "broken"})
+    assert len(agent.runs) == 2
+    assert agent._reports == {}
+
+
+def test_background_report_is_a_202_with_a_workflow_to_poll(client, auth_headers):
+    response = client.post(
+        "/api/v1/analytics/report", headers=auth_headers, params={"background": "true"}, json={"type": "summary"}
+    )
+    assert response.status_code == 202
+    workflow_id = response.json()["workflow_id"]
+    assert response.headers["Location"] == f"/api/v1/workflow/{workflow_id}"
+
+    deadline = time.monotonic() + 60
+    while True:
+        workflow = client.get(f"/api/v1/workflow/{workflow_id}", headers=auth_headers).json()
+        if workflow["status"] != "in_progress" or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert workflow["status"] == "completed", workflow
+    assert "total_records" in str(workflow["result"])
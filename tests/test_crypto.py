@@ -0,0 +1,176 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from app.core.crypto import FieldCipher
+from app.core.database import RecordStore
+from app.core.history import ChangeLog
+from app.core.idempotency import IdempotencyStore
+from app.utils.trigram_index import TrigramIndex
+
+EMAIL = "ann.lee@example.com"
+ADDRESS = "12 Harbour Road"
+
+
+def make_cipher(master_key=None):
+    return FieldCipher(
+        master_key or os.urandom(32),
+        {"customer": ["email", "phone", "address"]},
+        {"customer": ["email"]},
+        workers=1
+    )
+
+
+@pytest.fixture
+def cipher():
+    cipher = make_cipher()
+    yield cipher
+    cipher.close()
+
+
+@pytest.fixture
+def secure_store(tmp_path, cipher):
+    store = RecordStore(f"sqlite:///{tmp_path}/records.db", cipher=cipher)
+    yield store
+    store.close()
+
+
+def files_under(directory):
+    return b"".join(
+        open(os.path.join(root, name), "rb").read()
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+def test_values_round_trip_and_stay_bound_to_their_field(cipher):
+    for value in (EMAIL, 42, {"street": ADDRESS}, ["a", 1]):
+        sealed = cipher.encrypt_value("customer", "email", value)
+        assert sealed != value
+        assert cipher.decrypt_value("customer", "email", sealed) == value
+
+    sealed = cipher.encrypt_value("customer", "email", EMAIL)
+    with pytest.raises(InvalidTag):
+        cipher.decrypt_value("customer", "phone", sealed)
+    assert cipher.decrypt_value("customer", "email", "written before encryption") == "written before encryption"
+
+
+def test_batches_encrypt_across_workers_and_round_trip():
+    cipher = FieldCipher(os.urandom(32), {"customer": ["email", "phone"]}, workers=3, batch_min=4)
+    records = [{"name": f"C{i}", "email": f"c{i}@example.com", "phone": None} for i in range(10)]
+
+    sealed = cipher.encrypt_many("customer", records)
+    assert [data["name"] for data in sealed] == [data["name"] for data in records]
+    assert all(data["email"] != record["email"] and data["phone"] is None for data, record in zip(sealed, records))
+    assert records[0]["email"] == "c0@example.com"
+    assert cipher._executor is not None
+    assert cipher.decrypt_many("customer", sealed) == records
+    cipher.close()
+
+
+def test_other_keys_cannot_read_values(cipher):
+    sealed = cipher.encrypt_value("customer", "email", EMAIL)
+    with pytest.raises(InvalidTag):
+        make_cipher().decrypt_value("customer", "email", sealed)
+
+
+def test_store_keeps_encrypted_fields_sealed_at_rest(secure_store, tmp_path):
+    secure_store.insert("customer", {"name": "Ann", "email": EMAIL, "address": ADDRESS}, "c1")
+
+    record = secure_store.get("customer", "c1")
+    assert record["email"] == EMAIL and record["address"] == ADDRESS
+    assert [list(page.columns["email"]) for page in secure_store.iter_pages("customer")] == [[EMAIL]]
+    raw = sqlite3.connect(f"{tmp_path}/records.db").execute("SELECT data FROM records").fetchone()[0]
+    assert EMAIL not in raw and ADDRESS not in raw and "Ann" in raw
+
+
+def test_blind_index_lookup_follows_updates_and_deletes(secure_store):
+    secure_store.insert("customer", {"name": "Ann", "email": EMAIL}, "c1")
+    secure_store.insert("customer", {"name": "Bob", "email": "bob@example.com"}, "c2")
+
+    assert [record.id for record in secure_store.lookup("customer", "email", f"  {EMAIL.upper()} ")] == ["c1"]
+
+    secure_store.update("customer", "c1", {"email": "ann@new.example.com"}, expected_version=1)
+    assert secure_store.lookup("customer", "email", EMAIL) == []
+    assert [record.id for record in secure_store.lookup("customer", "email", "ann@new.example.com")] == ["c1"]
+
+    secure_store.delete("customer", "c2")
+    assert secure_store.lookup("customer", "email", "bob@example.com") == []
+
+
+def test_history_bodies_are_sealed_at_rest(secure_store, cipher, tmp_path):
+    history = ChangeLog(str(tmp_path / "history"), snapshot_interval=5, cipher=cipher)
+    record = secure_store.insert("customer", {"name": "Ann", "email": EMAIL}, "c1")
+    history.record_create(record)
+    record = secure_store.update("customer", "c1", {"address": ADDRESS}, expected_version=1)
+    history.record_update(record, {"address": ADDRESS})
+    history.flush()
+
+    at_rest = files_under(tmp_path / "history")
+    assert EMAIL.encode() not in at_rest and ADDRESS.encode() not in at_rest
+    assert history.changes("customer", "c1")[1]["changes"] == {"address": ADDRESS}
+    assert history.as_of("customer", "c1")["email"] == EMAIL
+    history.close()
+
+
+def test_idempotent_results_are_sealed_at_rest(cipher, tmp_path):
+    path = str(tmp_path / "idempotency.db")
+    store = IdempotencyStore(path, cipher=cipher)
+    store.put("k1", "fingerprint", {"id": "c1", "email": EMAIL})
+    store.close()
+    assert EMAIL.encode() not in files_under(tmp_path)
+
+    reopened = IdempotencyStore(path, cipher=cipher)
+    assert reopened.get("k1") == ("fingerprint", {"id": "c1", "email": EMAIL})
+    reopened.close()
+
+    without_key = IdempotencyStore(path)
+    assert without_key.get("k1") is None
+    without_key.close()
+
+
+def test_trigram_index_files_are_sealed_at_rest(cipher, tmp_path):
+    path = str(tmp_path / "customer.trgm")
+    index = TrigramIndex(["name", "address"], path, cipher=cipher, context="trigram\0customer")
+    index.upsert({"id": "c1", "name": "Ann", "address": ADDRESS})
+    index.save()
+    assert b"harbour" not in files_under(tmp_path)
+
+    loaded = TrigramIndex(["name", "address"], path, cipher=cipher, context="trigram\0customer")
+    assert [hit["id"] for hit in loaded.search("harbour")] == ["c1"]
+    assert len(TrigramIndex(["name", "address"], path)) == 0
+    assert len(TrigramIndex(["name", "address"], path, cipher=make_cipher(), context="trigram\0customer")) == 0
+
+
+def test_keys_from_dotenv_reach_settings():
+    # A fresh interpreter, since Settings read the environment at first import
+    script = (
+        "import os, dotenv\n"
+        "dotenv.load_dotenv = lambda *a, **k: os.environ.setdefault('ENCRYPTION_KEY', 'from-dotenv')\n"
+        "import main\n"
+        "print(main.settings.ENCRYPTION_KEY)\n"
+    )
+    env = {key: value for key, value in os.environ.items() if key != "ENCRYPTION_KEY"}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", script], cwd=root, env=env, capture_output=True, text=True)
+    assert result.stdout.strip().splitlines()[-1] == "from-dotenv", result.stderr
+
+
+def test_encrypted_fields_stay_out_of_embeddings(secure_store, tmp_path):
+    import asyncio
+
+    from app.agents.query_agent import DataQueryAgent
+
+    secure_store.insert("customer", {"name": "Ann", "email": EMAIL, "address": ADDRESS}, "c1")
+    agent = DataQueryAgent(store=secure_store)
+    agent.settings.VECTOR_INDEX_PATH = str(tmp_path / "vectors")
+    asyncio.run(agent.initialize())
+    asyncio.run(agent.process({"operation": "index", "entity": "customer", "records": [secure_store.get("customer", "c1")]}))
+
+    assert agent._record_text("customer", secure_store.get("customer", "c1")) == "Ann"
+    hits = asyncio.run(agent.process({"operation": "semantic_search", "entity": "customer", "query": "Ann"}))
+    assert hits[0]["id"] == "c1" and hits[0]["score"] > 0.999
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.core.events import ChangeEventHub
+from app.utils.exceptions import OffsetExpiredError
+
+
+def publish(hub, entity, entity_id, event_type="created"):
+    return hub.publish(event_type, {"entity": entity, "id": entity_id, "version": 1})
+
+
+def drain(subscription):
+    """Collect every event the subscription can deliver right now"""
+    async def run():
+        events = []
+        while True:
+            try:
+                event = await subscription.get(timeout=0.01)
+            except asyncio.TimeoutError:
+                return events
+            events.append(event)
+            if event is None:
+                return events
+
+    return asyncio.run(run())
+
+
+def test_slow_subscriber_is_evicted_with_its_resume_offset():
+    hub = ChangeEventHub(buffer_size=2)
+    subscription = hub.subscribe()
+    for i in range(3):
+        publish(hub, "customer", f"c{i}")
+
+    assert subscription.evicted
+    assert hub.subscriber_count == 0
+    assert drain(subscription) == [None]
+    assert subscription.last_offset == 0
+
+    resumed = hub.subscribe(after_offset=subscription.last_offset)
+    assert [event["id"] for event in drain(resumed)] == ["c0", "c1", "c2"]
+
+
+def test_resume_replays_the_backlog_before_live_events():
+    hub = ChangeEventHub()
+    for i in range(3):
+        publish(hub, "customer", f"c{i}")
+
+    subscription = hub.subscribe(after_offset=1)
+    publish(hub, "customer", "c3")
+    events = drain(subscription)
+    assert [event["offset"] for event in events] == [2, 3, 4]
+    assert subscription.last_offset == 4
+
+    assert drain(hub.subscribe(after_offset=4)) == []
+
+
+def test_offsets_outside_the_retained_ring_have_expired():
+    hub = ChangeEventHub(retention=2)
+    for i in range(4):
+        publish(hub, "customer", f"c{i}")
+
+    # Offsets 3 and 4 are retained, so resuming after 2 still works
+    assert [event["offset"] for event in drain(hub.subscribe(after_offset=2))] == [3, 4]
+    with pytest.raises(OffsetExpiredError):
+        hub.subscribe(after_offset=1)
+    with pytest.raises(OffsetExpiredError):
+        hub.subscribe(after_offset=5)
+
+
+def test_entity_filter_applies_to_backlog_and_live_events():
+    hub = ChangeEventHub(buffer_size=1)
+    publish(hub, "customer", "c1")
+    publish(hub, "product", "p1")
+
+    subscription = hub.subscribe("product", after_offset=0)
+    publish(hub, "customer", "c2")
+    publish(hub, "product", "p2", "updated")
+
+    # Customer events never reach the product subscriber's buffer, so it is not evicted
+    assert not subscription.evicted
+    assert [(event["type"], event["id"]) for event in drain(subscription)] == [("created", "p1"), ("updated", "p2")]
+
+
+def test_expired_offsets_are_a_410(client, auth_headers):
+    response = client.get("/api/v1/changes/stream", headers=auth_headers, params={"offset": 10 ** 9})
+    assert response.status_code == 410
@@ -0,0 +1,81 @@
+import asyncio
+import io
+import json
+import os
+
+import pytest
+
+from app.agents.query_agent import DataQueryAgent
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def export(store, entity, export_format="parquet", **request):
+    agent = DataQueryAgent(store=store)
+
+    async def run():
+        stream = await agent.process({
+            "operation": "export", "entity": entity, "format": export_format, "chunk_size": 1, **request
+        })
+        return b"".join([chunk async for chunk in stream])
+
+    return asyncio.run(run())
+
+
+def test_parquet_keeps_dict_keys_that_first_appear_on_later_pages(store):
+    store.insert("order", {"customer_id": "c1", "products": {"p1": 1}, "total_amount": 5}, "o1")
+    store.insert("order", {"customer_id": "c1", "products": {"p2": 3}, "total_amount": 7.5}, "o2")
+
+    table = pq.read_table(io.BytesIO(export(store, "order"))).to_pydict()
+    assert [json.loads(value) for value in table["products"]] == [{"p1": 1}, {"p2": 3}]
+    assert table["total_amount"] == [5.0, 7.5]
+    assert table["version"] == [1, 1]
+
+
+def test_parquet_types_come_from_the_schema_not_the_first_page(store):
+    store.insert("product", {"name": "Pen", "description": "Blue", "price": 2, "stock": None}, "p1")
+    store.insert("product", {"name": "Ink", "description": "Black", "price": 3.5, "stock": 4}, "p2")
+    store.insert("product", {"name": "Pad", "description": 42, "price": 1, "stock": "lots"}, "p3")
+
+    schema = pq.read_schema(io.BytesIO(export(store, "product")))
+    assert str(schema.field("stock").type) == "int64"
+    assert str(schema.field("price").type) == "double"
+
+    table = pq.read_table(io.BytesIO(export(store, "product"))).to_pydict()
+    assert table["stock"] == [None, 4, None]
+    assert table["price"] == [2.0, 3.5, 1.0]
+    assert table["description"] == ["Blue", "Black", "42"]
+
+
+def test_parquet_export_of_an_empty_entity_has_the_schema_columns(store):
+    schema = pq.read_schema(io.BytesIO(export(store, "customer")))
+    assert schema.names[0] == "id"
+    assert "email" in schema.names
+
+
+def test_encrypted_filters_fail_before_the_walk_starts(tmp_path):
+    from app.core.crypto import FieldCipher
+    from app.core.database import RecordStore
+
+    cipher = FieldCipher(os.urandom(32), {"customer": ["email", "phone"]}, {"customer": ["email"]})
+    store = RecordStore(f"sqlite:///{tmp_path}/records.db", cipher=cipher)
+    store.insert("customer", {"name": "Ann", "email": "ann@example.com", "phone": "555"}, "c1")
+
+    with pytest.raises(ValueError):
+        store.iter_pages("customer", filters={"phone": "555"})
+    pages = store.iter_pages("customer", filters={"email": "ANN@example.com"})
+    assert [list(page.columns["id"]) for page in pages] == [["c1"]]
+    store.close()
+    cipher.close()
+
+
+@pytest.mark.parametrize("request_body", [
+    {"filters": {"name": {"$ne": None}}},
+    {"filters": ["name", "Ann"]},
+    {"chunk_size": -1},
+    {"fields": "name"},
+    {"fields": ["name", 1]}
+])
+def test_bad_export_arguments_are_a_400(client, auth_headers, request_body):
+    response = client.post("/api/v1/export", headers=auth_headers, json={"entity": "customer", **request_body})
+    assert response.status_code == 400, response.text
@@ -0,0 +1,120 @@
+import os
+
+import pytest
+
+from app.core.history import ChangeLog, from_timestamp_us, to_timestamp_us
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = ChangeLog(str(tmp_path / "history"), snapshot_interval=3)
+    yield history
+    history.close()
+
+
+def write_versions(store, history, names):
+    """Create a customer and apply one update per extra name, logging each write"""
+    record = store.insert("customer", {"name": names[0], "city": "Oslo"}, "c1")
+    history.record_create(record)
+    for name in names[1:]:
+        record = store.update("customer", "c1", {"name": name}, expected_version=record["version"])
+        history.record_update(record, {"name": name})
+    return record
+
+
+def test_timestamps_round_trip_exactly():
+    for value in (0, 1_700_000_000_123_457, 1_700_000_000_999_999):
+        assert to_timestamp_us(from_timestamp_us(value)) == value
+
+
+def test_updates_between_snapshots_are_stored_as_diffs(store, history):
+    write_versions(store, history, ["v1", "v2", "v3", "v4", "v5"])
+    types = [change["type"] for change in history.changes("customer", "c1")]
+    assert types == ["snapshot", "diff", "diff", "snapshot", "diff"]
+    assert history.changes("customer", "c1")[1]["changes"] == {"name": "v2"}
+
+
+def test_as_of_replays_every_version(store, history):
+    write_versions(store, history, ["v1", "v2", "v3", "v4", "v5"])
+    for change in history.changes("customer", "c1"):
+        state = history.as_of("customer", "c1", change["timestamp"])
+        assert state["version"] == change["version"]
+        assert state["name"] == f"v{change['version']}"
+        assert state["city"] == "Oslo"
+
+
+def test_as_of_before_create_and_after_delete_is_none(store, history):
+    write_versions(store, history, ["v1", "v2"])
+    created = history.changes("customer", "c1")[0]["timestamp"]
+    history.record_delete("customer", "c1", 3)
+
+    assert history.as_of("customer", "c1", "2000-01-01T00:00:00Z") is None
+    assert history.as_of("customer", "c1", created)["name"] == "v1"
+    assert history.as_of("customer", "c1") is None
+
+
+def test_reopened_log_rebuilds_its_index(store, history, tmp_path):
+    write_versions(store, history, ["v1", "v2", "v3"])
+    history.close()
+
+    reopened = ChangeLog(str(tmp_path / "history"), snapshot_interval=3)
+    assert [change["version"] for change in reopened.changes("customer", "c1")] == [1, 2, 3]
+    assert reopened.as_of("customer", "c1")["name"] == "v3"
+    reopened.close()
+
+
+def test_torn_tail_entry_is_ignored(store, history, tmp_path):
+    write_versions(store, history, ["v1", "v2"])
+    history.close()
+    segment = os.path.join(tmp_path / "history", "seg-00000001.log")
+    with open(segment, "ab") as f:
+        f.write(b"\x40\x00\x00\x00partial")
+
+    reopened = ChangeLog(str(tmp_path / "history"), snapshot_interval=3)
+    assert reopened.as_of("customer", "c1")["name"] == "v2"
+    reopened.close()
+
+
+def test_compaction_merges_segments_and_keeps_current_state(store, tmp_path):
+    history = ChangeLog(str(tmp_path / "history"), snapshot_interval=3, segment_bytes=200, retention_seconds=0)
+    write_versions(store, history, [f"v{i}" for i in range(1, 11)])
+    history.flush()
+    assert len(history._segments) > 2
+
+    history.compact()
+
+    changes = history.changes("customer", "c1")
+    assert changes[0]["type"] == "snapshot"
+    assert len(changes) < 10
+    assert history.as_of("customer", "c1")["name"] == "v10"
+    assert len(history._segments) <= 2
+
+    history.record_update(store.update("customer", "c1", {"name": "v11"}, expected_version=10), {"name": "v11"})
+    assert history.as_of("customer", "c1")["name"] == "v11"
+    history.close()
+
+    reopened = ChangeLog(str(tmp_path / "history"), snapshot_interval=3)
+    assert reopened.as_of("customer", "c1")["name"] == "v11"
+    reopened.close()
+
+
+def test_compaction_keeps_entries_inside_the_retention_window(store, tmp_path):
+    history = ChangeLog(str(tmp_path / "history"), snapshot_interval=3, segment_bytes=200)
+    write_versions(store, history, [f"v{i}" for i in range(1, 11)])
+    history.compact()
+
+    changes = history.changes("customer", "c1")
+    assert [change["version"] for change in changes] == list(range(1, 11))
+    for change in changes:
+        assert history.as_of("customer", "c1", change["timestamp"])["name"] == f"v{change['version']}"
+    history.close()
+
+
+def test_diffs_leave_out_fields_the_store_ignored(store, history):
+    record = write_versions(store, history, ["v1"])
+    patch = {"name": "v2", "deleted_at": "2020-01-01T00:00:00", "status": "deleted"}
+    record = store.update("customer", "c1", patch, expected_version=record["version"])
+    history.record_update(record, patch)
+
+    assert history.changes("customer", "c1")[1]["changes"] == {"name": "v2"}
+    assert "deleted_at" not in history.as_of("customer", "c1")
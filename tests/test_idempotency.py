@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.idempotency import IdempotencyStore
+from app.core.orchestrator import OrchestrationAgent
+from app.utils.exceptions import ConflictError
+
+
+@pytest.fixture
+def orchestrator(tmp_path):
+    orchestrator = OrchestrationAgent()
+    orchestrator.idempotency = IdempotencyStore(str(tmp_path / "idempotency.db"))
+    orchestrator.executions = []
+
+    async def execute(request):
+        orchestrator.executions.append(request)
+        await asyncio.sleep(0.01)
+        if request.get("fail"):
+            raise ValueError("boom")
+        return {"id": f"r{len(orchestrator.executions)}"}
+
+    orchestrator._execute_request = execute
+    yield orchestrator
+    orchestrator.idempotency.close()
+
+
+def request(**extra):
+    return {"operation": "create", "entity": "customer", "idempotency_key": "k1", **extra}
+
+
+def test_concurrent_duplicates_execute_once(orchestrator):
+    async def run():
+        return await asyncio.gather(*(orchestrator.process_request(request()) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(orchestrator.executions) == 1
+    assert all(result == {"id": "r1"} for result in results)
+
+
+def test_duplicate_during_a_slow_stored_lookup_does_not_execute_again(orchestrator):
+    lookup = orchestrator.idempotency.get
+    calls = []
+
+    def slow_get(key):
+        # The duplicate reads before the first request stores its result and answers after it has
+        calls.append(key)
+        stored = lookup(key)
+        if len(calls) > 1:
+            time.sleep(0.2)
+        return stored
+
+    orchestrator.idempotency.get = slow_get
+
+    async def run():
+        first = asyncio.create_task(orchestrator.process_request(request()))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(orchestrator.process_request(request()))
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(run()) == [{"id": "r1"}, {"id": "r1"}]
+    assert len(orchestrator.executions) == 1
+
+
+def test_replay_returns_the_stored_result(orchestrator):
+    first = asyncio.run(orchestrator.process_request(request()))
+    replay = asyncio.run(orchestrator.process_request(request()))
+    assert replay == first
+    assert len(orchestrator.executions) == 1
+    assert orchestrator._inflight == {}
+
+
+def test_reused_key_with_a_different_request_conflicts(orchestrator):
+    asyncio.run(orchestrator.process_request(request()))
+    with pytest.raises(ConflictError):
+        asyncio.run(orchestrator.process_request(request(data={"name": "other"})))
+
+
+def test_failures_are_not_stored(orchestrator):
+    with pytest.raises(ValueError):
+        asyncio.run(orchestrator.process_request(request(fail=True)))
+    assert orchestrator._inflight == {}
+    with pytest.raises(ValueError):
+        asyncio.run(orchestrator.process_request(request(fail=True)))
+    assert len(orchestrator.executions) == 2
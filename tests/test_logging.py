@@ -0,0 +1,17 @@
+from app.core.config import Settings
+from app.core.log import OperationSampler
+
+
+def test_audit_events_are_not_sampled_by_default():
+    settings = Settings()
+    sampler = OperationSampler(settings.LOG_SAMPLE_RATE, settings.LOG_SAMPLE_RATES)
+    for operation in ("log_creation", "log_update", "log_deletion"):
+        assert all(sampler.should_log(operation) for _ in range(200))
+
+
+def test_configured_rate_keeps_every_nth_call():
+    sampler = OperationSampler(1.0, {"log_update": 0.1, "noisy": 0})
+    kept = [sampler.should_log("log_update") for _ in range(30)]
+    assert kept.count(True) == 3 and kept[0]
+    assert not any(sampler.should_log("noisy") for _ in range(10))
+    assert sampler.should_log("log_creation")
@@ -0,0 +1,163 @@
+import pytest
+
+from app.utils.exceptions import ConflictError, NotFoundError
+
+
+def test_insert_starts_at_version_one(store):
+    record = store.insert("customer", {"name": "Ann"}, "c1")
+    assert record["version"] == 1
+    assert store.get("customer", "c1")["name"] == "Ann"
+
+
+def test_insert_existing_id_conflicts(store):
+    store.insert("customer", {"name": "Ann"}, "c1")
+    with pytest.raises(ConflictError):
+        store.insert("customer", {"name": "Other"}, "c1")
+
+
+def test_update_with_matching_version_bumps_it(store):
+    store.insert("customer", {"name": "Ann"}, "c1")
+    updated = store.update("customer", "c1", {"name": "Anne"}, expected_version=1)
+    assert updated["version"] == 2
+    assert updated["name"] == "Anne"
+
+
+def test_stale_update_conflicts_and_reports_current_version(store):
+    store.insert("customer", {"name": "Ann"}, "c1")
+    store.update("customer", "c1", {"name": "Anne"}, expected_version=1)
+    with pytest.raises(ConflictError) as error:
+        store.update("customer", "c1", {"name": "Lost"}, expected_version=1)
+    assert error.value.current_version == 2
+    assert store.get("customer", "c1")["name"] == "Anne"
+
+
+def test_update_of_missing_record_is_not_found(store):
+    with pytest.raises(NotFoundError):
+        store.update("customer", "missing", {"name": "X"}, expected_version=1)
+
+
+def test_stale_delete_conflicts(store):
+    store.insert("customer", {"name": "Ann"}, "c1")
+    store.update("customer", "c1", {"name": "Anne"})
+    with pytest.raises(ConflictError) as error:
+        store.delete("customer", "c1", expected_version=1)
+    assert error.value.current_version == 2
+    store.get("customer", "c1")
+
+
+def test_recreating_deleted_record_continues_version_sequence(store):
+    store.insert("customer", {"name": "Ann"}, "c1")
+    deleted = store.delete("customer", "c1")
+    revived = store.insert("customer", {"name": "Ann"}, "c1")
+    assert revived["version"] == deleted["version"] + 1
+
+
+def _create_customer(client, auth_headers, customer_id):
+    response = client.post(
+        "/api/v1/customer",
+        json={"customer_id": customer_id, "name": "Ann", "email": "ann@example.com"},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    return response
+
+
+def test_put_without_if_match_is_428(client, auth_headers, unique_id):
+    _create_customer(client, auth_headers, unique_id)
+    response = client.put(f"/api/v1/customer/{unique_id}", json={"name": "Anne"}, headers=auth_headers)
+    assert response.status_code == 428
+
+
+def test_put_with_current_etag_succeeds(client, auth_headers, unique_id):
+    etag = _create_customer(client, auth_headers, unique_id).headers["ETag"]
+    response = client.put(
+        f"/api/v1/customer/{unique_id}",
+        json={"name": "Anne"},
+        headers={**auth_headers, "If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+
+
+def test_put_with_stale_etag_is_412_with_current_etag(client, auth_headers, unique_id):
+    etag = _create_customer(client, auth_headers, unique_id).headers["ETag"]
+    client.put(f"/api/v1/customer/{unique_id}", json={"name": "Anne"}, headers={**auth_headers, "If-Match": etag})
+    response = client.put(
+        f"/api/v1/customer/{unique_id}",
+        json={"name": "Lost"},
+        headers={**auth_headers, "If-Match": etag}
+    )
+    assert response.status_code == 412
+    assert response.headers["ETag"] == '"2"'
+
+
+def test_delete_with_stale_etag_is_412_with_current_etag(client, auth_headers, unique_id):
+    etag = _create_customer(client, auth_headers, unique_id).headers["ETag"]
+    client.put(f"/api/v1/customer/{unique_id}", json={"name": "Anne"}, headers={**auth_headers, "If-Match": etag})
+    response = client.delete(f"/api/v1/customer/{unique_id}", headers={**auth_headers, "If-Match": etag})
+    assert response.status_code == 412
+    assert response.headers["ETag"] == '"2"'
+
+
+def test_weak_etag_is_rejected_for_if_match(client, auth_headers, unique_id):
+    _create_customer(client, auth_headers, unique_id)
+    response = client.put(
+        f"/api/v1/customer/{unique_id}",
+        json={"name": "Anne"},
+        headers={**auth_headers, "If-Match": 'W/"1"'}
+    )
+    assert response.status_code == 412
+
+
+def _list_customers(client, auth_headers, if_none_match=None):
+    headers = {**auth_headers, "If-None-Match": if_none_match} if if_none_match else auth_headers
+    # One page holding every customer, so any write to the entity lands in it
+    return client.get("/api/v1/customers", params={"limit": 100000}, headers=headers)
+
+
+def test_get_with_current_etag_is_304_until_the_record_changes(client, auth_headers, unique_id):
+    etag = _create_customer(client, auth_headers, unique_id).headers["ETag"]
+    response = client.get(f"/api/v1/customer/{unique_id}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    client.put(f"/api/v1/customer/{unique_id}", json={"name": "Anne"}, headers={**auth_headers, "If-Match": etag})
+    response = client.get(f"/api/v1/customer/{unique_id}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+    assert response.json()["name"] == "Anne"
+
+
+def test_page_etag_changes_on_insert_update_and_delete(client, auth_headers, unique_id):
+    tags = [_list_customers(client, auth_headers).headers["ETag"]]
+    assert _list_customers(client, auth_headers, tags[0]).status_code == 304
+
+    etag = _create_customer(client, auth_headers, unique_id).headers["ETag"]
+    tags.append(_list_customers(client, auth_headers).headers["ETag"])
+    etag = client.put(
+        f"/api/v1/customer/{unique_id}", json={"name": "Anne"}, headers={**auth_headers, "If-Match": etag}
+    ).headers["ETag"]
+    tags.append(_list_customers(client, auth_headers).headers["ETag"])
+    client.delete(f"/api/v1/customer/{unique_id}", headers={**auth_headers, "If-Match": etag})
+    tags.append(_list_customers(client, auth_headers).headers["ETag"])
+
+    # Deleting the new row restores the original page, and with it the original tag
+    assert tags[0] != tags[1] != tags[2] != tags[3] == tags[0]
+    for stale in tags[1:3]:
+        response = _list_customers(client, auth_headers, stale)
+        assert response.status_code == 200
+        assert response.headers["ETag"] == tags[-1]
+
+
+@pytest.mark.parametrize("if_none_match", ["*", '"0", {etag}', 'W/"0", W/{etag}'])
+def test_if_none_match_star_and_list_forms(client, auth_headers, unique_id, if_none_match):
+    etag = _create_customer(client, auth_headers, unique_id).headers["ETag"]
+    response = client.get(
+        f"/api/v1/customer/{unique_id}",
+        headers={**auth_headers, "If-None-Match": if_none_match.format(etag=etag)}
+    )
+    assert response.status_code == 304
+
+    page_tag = _list_customers(client, auth_headers).headers["ETag"]
+    assert _list_customers(client, auth_headers, if_none_match.format(etag=page_tag)).status_code == 304
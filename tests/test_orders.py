@@ -0,0 +1,140 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.agents.ingestion_agent import DataIngestionAgent
+from app.core.database import RecordStore
+from app.utils.exceptions import ConflictError, NotFoundError
+
+
+@pytest.fixture
+def catalog(store):
+    store.insert("customer", {"name": "Ann"}, "c1")
+    store.insert("product", {"name": "Pen", "price": 2.5, "stock": 5}, "p1")
+    store.insert("product", {"name": "Ink", "price": 4.0, "stock": 1}, "p2")
+    return store
+
+
+def stock(store, product_id):
+    return store.get("product", product_id)["stock"]
+
+
+def test_order_takes_stock_and_totals_its_lines(catalog):
+    order, products = catalog.place_order("c1", {"p1": 2, "p2": 1}, "o1")
+
+    assert order["total_amount"] == 9.0
+    assert order["order_status"] == "placed"
+    assert order["status"] == "active"
+    assert catalog.get("order", "o1")["order_status"] == "placed"
+    assert [product["stock"] for product in products] == [3, 0]
+    assert [product["version"] for product in products] == [2, 2]
+
+
+def test_short_stock_on_any_line_rolls_back_the_whole_order(catalog):
+    with pytest.raises(ConflictError):
+        catalog.place_order("c1", {"p1": 2, "p2": 2}, "o1")
+
+    assert stock(catalog, "p1") == 5
+    assert stock(catalog, "p2") == 1
+    with pytest.raises(NotFoundError):
+        catalog.get("order", "o1")
+
+
+def test_missing_product_or_customer_is_not_found(catalog):
+    with pytest.raises(NotFoundError):
+        catalog.place_order("c1", {"p1": 1, "p9": 1})
+    with pytest.raises(NotFoundError):
+        catalog.place_order("c9", {"p1": 1})
+    assert stock(catalog, "p1") == 5
+
+
+def test_reused_order_id_conflicts_without_taking_stock(catalog):
+    catalog.place_order("c1", {"p1": 1}, "o1")
+    with pytest.raises(ConflictError):
+        catalog.place_order("c1", {"p1": 1}, "o1")
+    assert stock(catalog, "p1") == 4
+
+
+def test_concurrent_orders_through_the_agent_never_oversell(catalog):
+    agent = DataIngestionAgent(store=catalog)
+
+    async def run():
+        return await asyncio.gather(
+            *(agent.process({"operation": "place_order", "customer_id": "c1", "products": {"p1": 1}}) for _ in range(20)),
+            return_exceptions=True
+        )
+
+    outcomes = asyncio.run(run())
+    placed = [outcome for outcome in outcomes if isinstance(outcome, dict)]
+    assert len(placed) == 5
+    assert all(isinstance(outcome, ConflictError) for outcome in outcomes if not isinstance(outcome, dict))
+    assert stock(catalog, "p1") == 0
+
+
+def test_concurrent_orders_over_separate_connections_never_oversell(catalog, tmp_path):
+    stores = [RecordStore(f"sqlite:///{tmp_path}/records.db") for _ in range(4)]
+    placed = []
+
+    def buyer(store):
+        for _ in range(10):
+            try:
+                store.place_order("c1", {"p1": 1})
+                placed.append(1)
+            except ConflictError:
+                pass
+
+    threads = [threading.Thread(target=buyer, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for store in stores:
+        store.close()
+
+    assert len(placed) == 5
+    assert stock(catalog, "p1") == 0
+    assert len(catalog.list("order", 0, 100)) == 5
+
+
+def test_api_order_keeps_its_status_next_to_the_record_status(client, auth_headers, unique_id):
+    customer = client.post("/api/v1/customer", headers=auth_headers, json={
+        "customer_id": f"c-{unique_id}", "name": "Ann", "email": f"{unique_id}@example.com"
+    }).json()
+    product = client.post("/api/v1/product", headers=auth_headers, json={
+        "product_id": f"p-{unique_id}", "name": "Pen", "description": "Blue", "price": 2.0, "stock": 3
+    }).json()
+
+    response = client.post("/api/v1/order", headers=auth_headers, json={
+        "customer_id": customer["id"], "products": {product["id"]: 2}
+    })
+    assert response.status_code == 200, response.text
+    order = client.get(f"/api/v1/order/{response.json()['id']}", headers=auth_headers).json()
+    assert order["order_status"] == "placed"
+    assert order["status"] == "active"
+    assert client.get(f"/api/v1/product/{product['id']}", headers=auth_headers).json()["stock"] == 1
+
+
+def test_api_order_indexes_the_order_and_its_products(client, auth_headers, unique_id, monkeypatch):
+    from app.api.api_v1.api import orchestrator
+
+    customer = client.post("/api/v1/customer", headers=auth_headers, json={
+        "customer_id": f"c-{unique_id}", "name": "Ann", "email": f"{unique_id}@example.com"
+    }).json()
+    product = client.post("/api/v1/product", headers=auth_headers, json={
+        "product_id": f"p-{unique_id}", "name": "Pen", "description": "Blue", "price": 2.0, "stock": 3
+    }).json()
+    indexed = []
+    index = orchestrator._index_record
+
+    async def recording_index(record):
+        indexed.append((record["entity"], record["id"], record.get("stock")))
+        await index(record)
+
+    monkeypatch.setattr(orchestrator, "_index_record", recording_index)
+    order = client.post("/api/v1/order", headers=auth_headers, json={
+        "customer_id": customer["id"], "products": {product["id"]: 2}
+    }).json()
+
+    assert indexed == [("order", order["id"], None), ("product", product["id"], 1)]
+    assert order["id"] in orchestrator.agents["query"].vector_indexes["order"]._slots
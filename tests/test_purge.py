@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+from app.agents.update_agent import DataUpdateAgent
+from app.core.crypto import FieldCipher
+from app.core.database import RecordStore
+
+
+def tombstone(store, entity_id, deleted_at):
+    """Delete a customer and backdate its tombstone"""
+    store.insert("customer", {"name": f"Customer {entity_id}"}, entity_id)
+    store.delete("customer", entity_id)
+    with store._lock:
+        store._conn.execute("UPDATE records SET deleted_at = ? WHERE id = ?", (deleted_at, entity_id))
+
+
+def count(store, table):
+    with store._lock:
+        return store._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_purge_only_removes_tombstones_older_than_the_cutoff(store):
+    tombstone(store, "old", "2024-01-01T00:00:00Z")
+    tombstone(store, "new", "2024-03-01T00:00:00Z")
+    store.insert("customer", {"name": "Live"}, "live")
+
+    assert store.purge_tombstones("2024-02-01T00:00:00Z") == 1
+    with store._lock:
+        remaining = {row[0] for row in store._conn.execute("SELECT id FROM records")}
+    assert remaining == {"new", "live"}
+
+
+def test_archive_switch_decides_whether_purged_rows_are_kept(store):
+    tombstone(store, "kept", "2024-01-01T00:00:00Z")
+    assert store.purge_tombstones("2024-02-01T00:00:00Z", archive=True) == 1
+    with store._lock:
+        archived = store._conn.execute("SELECT id, deleted_at, archived_at FROM records_archive").fetchall()
+    assert [row[:2] for row in archived] == [("kept", "2024-01-01T00:00:00Z")]
+    assert archived[0][2]
+
+    tombstone(store, "dropped", "2024-01-01T00:00:00Z")
+    assert store.purge_tombstones("2024-02-01T00:00:00Z", archive=False) == 1
+    assert count(store, "records_archive") == 1
+    assert count(store, "records") == 0
+
+
+def test_purge_takes_at_most_one_batch_per_call(store):
+    for i in range(5):
+        tombstone(store, f"c{i}", "2024-01-01T00:00:00Z")
+
+    assert store.purge_tombstones("2024-02-01T00:00:00Z", batch_size=5) == 5
+    assert store.purge_tombstones("2024-02-01T00:00:00Z", batch_size=5) == 0
+
+    for i in range(5):
+        tombstone(store, f"d{i}", "2024-01-01T00:00:00Z")
+    assert [store.purge_tombstones("2024-02-01T00:00:00Z", batch_size=2) for _ in range(4)] == [2, 2, 1, 0]
+
+
+def test_purge_drops_the_blind_indexes_of_purged_rows(tmp_path):
+    cipher = FieldCipher(os.urandom(32), {"customer": ["email"]}, {"customer": ["email"]}, workers=1)
+    store = RecordStore(f"sqlite:///{tmp_path}/records.db", cipher=cipher)
+    store.insert("customer", {"name": "Ann", "email": "ann@example.com"}, "c1")
+    store.insert("customer", {"name": "Bob", "email": "bob@example.com"}, "c2")
+    store.delete("customer", "c1")
+    # A tombstone keeps its digests until it is purged
+    assert count(store, "blind_indexes") == 2
+
+    assert store.purge_tombstones("9999-01-01T00:00:00Z") == 1
+    with store._lock:
+        assert [row[0] for row in store._conn.execute("SELECT id FROM blind_indexes")] == ["c2"]
+    assert [record.id for record in store.lookup("customer", "email", "bob@example.com")] == ["c2"]
+    store.close()
+    cipher.close()
+
+
+def test_compaction_loop_purges_in_batches_until_a_short_one(store):
+    for i in range(5):
+        tombstone(store, f"c{i}", "2024-01-01T00:00:00Z")
+    calls = []
+    purge = store.purge_tombstones
+
+    def recording_purge(*args):
+        calls.append(args)
+        return purge(*args)
+
+    store.purge_tombstones = recording_purge
+    agent = DataUpdateAgent(store=store)
+    agent.settings.TOMBSTONE_COMPACTION_INTERVAL_SECONDS = 0
+    agent.settings.TOMBSTONE_COMPACTION_BATCH_PAUSE_SECONDS = 0
+    agent.settings.TOMBSTONE_COMPACTION_BATCH_SIZE = 5
+    agent.settings.TOMBSTONE_ARCHIVE = False
+
+    async def run():
+        await agent.initialize()
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        await agent.cleanup()
+
+    asyncio.run(run())
+    assert [args[1:] for args in calls[:2]] == [(5, False), (5, False)]
+    assert count(store, "records") == 0
+    assert count(store, "records_archive") == 0
@@ -0,0 +1,67 @@
+from app.api.api_v1.api import api_router
+
+
+def route_methods(path):
+    return {method for route in api_router.routes if route.path == path for method in route.methods}
+
+
+def test_orders_have_no_generic_update_or_delete_routes():
+    assert route_methods("/order/{entity_id}") == {"GET"}
+    assert {"GET", "PUT", "DELETE"} <= route_methods("/customer/{entity_id}")
+
+
+def test_generic_order_writes_are_rejected(client, auth_headers):
+    assert client.put("/api/v1/order/o1", headers={**auth_headers, "If-Match": '"1"'}, json={}).status_code == 405
+    assert client.delete("/api/v1/order/o1", headers=auth_headers).status_code == 405
+
+
+def test_read_routes_authorize_from_the_token_role(client, auth_headers, unique_id):
+    client.post("/api/v1/customer", headers=auth_headers, json={
+        "customer_id": f"c-{unique_id}", "name": f"Searchable {unique_id}", "email": f"{unique_id}@example.com"
+    })
+
+    assert client.get("/api/v1/customers/search", headers=auth_headers, params={"q": unique_id}).status_code == 200
+    assert client.get("/api/v1/customers/semantic-search", headers=auth_headers, params={"q": unique_id}).status_code == 200
+    export = client.post("/api/v1/export", headers=auth_headers, json={"entity": "customer", "format": "ndjson"})
+    assert export.status_code == 200
+    assert unique_id.encode() in export.content
+    assert client.get("/api/v1/customers/search", params={"q": unique_id}).status_code == 401
+
+
+def test_update_with_null_for_a_required_field_is_a_422(client, auth_headers, unique_id):
+    etag = client.post("/api/v1/customer", headers=auth_headers, json={
+        "customer_id": f"c-{unique_id}", "name": "Ann", "email": f"{unique_id}@example.com", "phone": "+15550100123"
+    }).headers["ETag"]
+
+    response = client.put(f"/api/v1/customer/c-{unique_id}", headers={**auth_headers, "If-Match": etag}, json={"name": None})
+    assert response.status_code == 422
+    response = client.put(f"/api/v1/customer/c-{unique_id}", headers={**auth_headers, "If-Match": etag}, json={"phone": None})
+    assert response.status_code == 200, response.text
+    assert response.json()["name"] == "Ann"
+
+
+def test_process_cannot_create_update_or_delete_orders(client, auth_headers):
+    for operation in ("create", "update", "delete"):
+        response = client.post("/api/v1/process", headers=auth_headers, json={
+            "operation": operation, "entity": "order", "id": "o1", "data": {"total_amount": 0}
+        })
+        assert response.status_code == 400, response.text
+
+
+def test_process_authorizes_each_operation_for_the_user_role(client, auth_headers, unique_id):
+    from app.api.api_v1.api import get_current_user
+
+    client.app.dependency_overrides[get_current_user] = lambda: {"username": "viewer", "role": "viewer"}
+    try:
+        create = client.post("/api/v1/process", json={
+            "operation": "create", "entity": "customer", "data": {"customer_id": f"c-{unique_id}", "name": "Ann"}
+        })
+        delete = client.post("/api/v1/process", json={"operation": "delete", "entity": "customer", "id": "c1"})
+        search = client.post("/api/v1/process", json={"operation": "search", "entity": "customer", "query": "ann"})
+    finally:
+        client.app.dependency_overrides.clear()
+
+    assert create.status_code == 403
+    assert delete.status_code == 403
+    assert search.status_code == 200, search.text
+    assert client.get(f"/api/v1/customer/c-{unique_id}", headers=auth_headers).status_code == 404
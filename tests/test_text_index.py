@@ -0,0 +1,124 @@
+import asyncio
+
+from app.agents.query_agent import DataQueryAgent
+from app.utils import trigram_index
+from app.utils.trigram_index import TrigramIndex, TrigramIndexSet
+
+
+def test_values_shorter_than_a_trigram_are_searchable():
+    index = TrigramIndex(["name"])
+    index.upsert({"id": "c1", "name": "Al"})
+    assert [hit["id"] for hit in index.search("al")] == ["c1"]
+
+
+def test_omitted_fields_are_indexed_as_empty():
+    index = TrigramIndex(["name", "email"])
+    index.upsert({"id": "c1", "name": "Ann", "email": "ann@example.com"})
+    index.upsert({"id": "c1", "name": "Ann"})
+    assert index.search("example") == []
+    assert [hit["id"] for hit in index.search("ann")] == ["c1"]
+
+
+def test_mark_survives_save_and_load(tmp_path):
+    path = str(tmp_path / "customer.trgm")
+    index = TrigramIndex(["name"], path)
+    index.upsert({"id": "c1", "name": "Ann"})
+    index.mark = "2024-01-01T00:00:00Z"
+    index.save()
+
+    loaded = TrigramIndex(["name"], path)
+    assert loaded.mark == "2024-01-01T00:00:00Z"
+    assert [hit["id"] for hit in loaded.search("ann")] == ["c1"]
+
+
+def test_unreadable_index_file_starts_empty(tmp_path):
+    path = tmp_path / "customer.trgm"
+    path.write_bytes(b"not an index")
+    index = TrigramIndex(["name"], str(path))
+    assert len(index) == 0
+    assert index.mark is None
+
+
+def test_compaction_runs_in_the_background_once_enough_documents_are_dead():
+    index = TrigramIndex(["name"])
+    for i in range(3000):
+        index.upsert({"id": f"c{i}", "name": f"Ann {i}"})
+    for i in range(2000):
+        index.remove(f"c{i}")
+
+    index._compactor.join()
+    assert len(index) == 1000 and len(index._ids) < 3000
+    assert index.search("ann 2999")[0]["id"] == "c2999"
+
+
+def test_compaction_keeps_writes_made_between_its_steps(monkeypatch):
+    index = TrigramIndex(["name"])
+    for i in range(4):
+        index.upsert({"id": f"c{i}", "name": f"Ann {i}"})
+    index.remove("c3")
+    writes = []
+
+    class WritesWhileCopying(TrigramIndex):
+        def _append(self, record_id, values):
+            super()._append(record_id, values)
+            if record_id == "c1" and not writes:
+                writes.append(record_id)
+                index.upsert({"id": "c0", "name": "Bob"})
+                index.remove("c1")
+                index.upsert({"id": "c9", "name": "Ann 9"})
+
+    monkeypatch.setattr(trigram_index, "TrigramIndex", WritesWhileCopying)
+    index.compact()
+
+    assert {hit["id"] for hit in index.search("ann")} == {"c2", "c9"}
+    assert [hit["id"] for hit in index.search("bob")] == ["c0"]
+    assert set(index._docnums) == {"c0", "c2", "c9"}
+
+
+def test_search_ranks_only_the_first_max_candidates_matches():
+    capped = TrigramIndex(["name"], max_candidates=5)
+    full = TrigramIndex(["name"])
+    for index in (capped, full):
+        for i in range(10):
+            index.upsert({"id": f"c{i}", "name": f"Jo Ann {i}"})
+        index.upsert({"id": "first", "name": "Ann"})
+
+    assert full.search("ann", limit=1)[0]["id"] == "first"
+    assert [hit["id"] for hit in capped.search("ann", limit=2)] == ["c0", "c1"]
+
+
+def start_agent(store, tmp_path):
+    text_indexes = TrigramIndexSet(str(tmp_path / "text"), {"customer": ["name"]})
+    agent = DataQueryAgent(store=store, text_indexes=text_indexes)
+    agent.settings.VECTOR_INDEX_PATH = str(tmp_path / "vectors")
+    asyncio.run(agent.initialize())
+    return agent, text_indexes
+
+
+def search(agent, query):
+    hits = asyncio.run(agent.process({"operation": "search", "entity": "customer", "query": query}))
+    return {hit["id"] for hit in hits}
+
+
+def test_missing_text_index_is_rebuilt_from_the_store(store, tmp_path):
+    store.insert("customer", {"name": "Ann Lee"}, "c1")
+    store.insert("customer", {"name": "Ann Roe"}, "c2")
+    store.delete("customer", "c2")
+
+    agent, _ = start_agent(store, tmp_path)
+    assert search(agent, "ann") == {"c1"}
+
+
+def test_text_index_catches_up_with_writes_made_while_it_was_closed(store, tmp_path):
+    store.insert("customer", {"name": "Ann Lee"}, "c1")
+    store.insert("customer", {"name": "Bob Lee"}, "c2")
+    _, text_indexes = start_agent(store, tmp_path)
+    text_indexes.save_all(store.change_mark)
+
+    store.update("customer", "c1", {"name": "Anne Lee"}, expected_version=1)
+    store.delete("customer", "c2")
+    store.insert("customer", {"name": "Cid Lee"}, "c3")
+
+    agent, _ = start_agent(store, tmp_path)
+    assert search(agent, "lee") == {"c1", "c3"}
+    assert search(agent, "anne") == {"c1"}
@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import pytest
+
+from app.agents.query_agent import DataQueryAgent
+from app.utils.exceptions import QueryError
+
+
+def start_agent(store, tmp_path):
+    agent = DataQueryAgent(store=store)
+    agent.settings.VECTOR_INDEX_PATH = str(tmp_path / "vectors")
+    asyncio.run(agent.initialize())
+    return agent
+
+
+def indexed_ids(agent, entity):
+    return set(agent._get_vector_index(entity)._slots)
+
+
+def test_missing_index_is_rebuilt_from_the_store(store, tmp_path):
+    for i in range(3):
+        store.insert("customer", {"name": f"Customer {i}"}, f"c{i}")
+    store.delete("customer", "c2")
+
+    agent = start_agent(store, tmp_path)
+    assert indexed_ids(agent, "customer") == {"c0", "c1"}
+
+    hits = asyncio.run(agent.process({"operation": "semantic_search", "entity": "customer", "query": "Customer 1"}))
+    assert hits[0]["id"] == "c1"
+
+
+def test_index_catches_up_with_writes_made_while_it_was_closed(store, tmp_path):
+    store.insert("customer", {"name": "Ann"}, "c1")
+    store.insert("customer", {"name": "Bob"}, "c2")
+    asyncio.run(start_agent(store, tmp_path).cleanup())
+
+    store.delete("customer", "c1")
+    store.insert("customer", {"name": "Cid"}, "c3")
+    store.update("customer", "c2", {"name": "Bobby"}, expected_version=1)
+
+    agent = start_agent(store, tmp_path)
+    assert indexed_ids(agent, "customer") == {"c2", "c3"}
+    assert agent._get_vector_index("customer").mark == store.change_mark("customer")
+
+
+def test_index_without_a_mark_is_rebuilt(store, tmp_path):
+    store.insert("customer", {"name": "Ann"}, "c1")
+    agent = start_agent(store, tmp_path)
+    index = agent._get_vector_index("customer")
+    index.upsert(["ghost"], agent.embedder.embed(["ghost"]))
+    index.mark = None
+    index.flush()
+
+    agent = start_agent(store, tmp_path)
+    assert indexed_ids(agent, "customer") == {"c1"}
+
+
+def test_server_serves_and_shuts_down_the_router_orchestrator():
+    import main
+    from app.api.api_v1 import api
+
+    assert main.orchestrator is api.orchestrator
+
+
+def test_search_never_creates_index_files(store, tmp_path):
+    agent = start_agent(store, tmp_path)
+
+    for entity in ("../../escaped", "nosuchentity"):
+        with pytest.raises(QueryError):
+            asyncio.run(agent.process({"operation": "semantic_search", "entity": entity, "query": "x"}))
+    assert asyncio.run(agent.process({"operation": "semantic_search", "entity": "customer", "query": "x"})) == []
+    assert not (tmp_path / "escaped.vectors").exists()
+    assert not os.path.exists(tmp_path / "vectors")
+
+
+def test_process_rejects_entity_names_that_are_not_identifiers(client, auth_headers):
+    response = client.post("/api/v1/process", headers=auth_headers, json={
+        "operation": "semantic_search", "entity": "../../escaped", "query": "x"
+    })
+    assert response.status_code == 400